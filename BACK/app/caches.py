@@ -0,0 +1,199 @@
+# app/caches.py
+
+"""
+Caches for repeated questions, invalidated whenever the index changes.
+
+- `RetrievalCache`: LRU/TTL cache of `retrieve_context` results keyed on the normalized
+  question and the current index version.
+- `SemanticAnswerCache`: optional cache of generated answers, returned when a new
+  question's embedding is close enough (cosine similarity) to a cached one.
+
+Ingestion calls `bump_index_version()` after changing the index, which makes every
+cached entry stale. API workers using the search service adopt the version it publishes
+with `set_index_version()` instead.
+"""
+
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+import numpy as np
+from app import config
+
+_version_lock = threading.Lock()
+index_version = 0
+index_listeners = []  # Callables notified with the new version after every change
+
+
+def bump_index_version():
+    """Mark the index as changed and drop cached entries built on the previous version."""
+    global index_version
+    with _version_lock:
+        index_version += 1
+        version = index_version
+    retrieval_cache.clear()
+    answer_cache.clear()
+    for listener in index_listeners:
+        listener(version)
+    return version
+
+
+def set_index_version(version):
+    """Adopt an index version published elsewhere, dropping cached entries if it changed."""
+    global index_version
+    with _version_lock:
+        changed = version != index_version
+        index_version = version
+    if changed:
+        retrieval_cache.clear()
+        answer_cache.clear()
+
+
+def normalize_question(question):
+    """Normalize a question for exact-match caching (case, accents form, spaces, final punctuation)."""
+    question = unicodedata.normalize("NFC", question).lower()
+    return " ".join(question.split()).strip(" ?!.")
+
+
+class TTLCache:
+    """Thread-safe LRU cache whose entries also expire after `ttl` seconds."""
+
+    def __init__(self, max_entries, ttl):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.saved_time = 0.0
+        self._entries = OrderedDict()  # key -> (expires_at, value)
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """Return the cached value, or None on a miss or an expired entry."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < time.time():
+                self._entries.pop(key, None)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.time() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "saved_time": self.saved_time,
+            "entries": len(self._entries),
+        }
+
+
+class RetrievalCache(TTLCache):
+    """
+    Cache of (retrieved_context, retrieval_duration) per normalized question, searched
+    collections, metadata filter and index version.
+
+    Only the question text is normalized: collection names and filters are matched exactly.
+    """
+
+    @staticmethod
+    def _key(question, collections, metadata_filter, version):
+        collections = tuple(sorted(set(collections))) if collections else None
+        return (normalize_question(question), collections, metadata_filter or None, version)
+
+    def lookup(self, question, collections=None, metadata_filter=None):
+        cached = self.get(self._key(question, collections, metadata_filter, index_version))
+        if cached is not None:
+            self.saved_time += cached[1]
+        return cached
+
+    def store(self, question, retrieved_context, retrieval_duration, version, collections=None, metadata_filter=None):
+        """Cache results computed against index `version` (read before retrieval started)."""
+        self.put(self._key(question, collections, metadata_filter, version), (retrieved_context, retrieval_duration))
+
+
+class SemanticAnswerCache:
+    """Cache of answers to documentary questions, matched by embedding similarity."""
+
+    def __init__(self, max_entries, ttl, threshold):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.threshold = threshold
+        self.hits = 0
+        self.misses = 0
+        self.saved_time = 0.0
+        self._entries = []  # dicts with vector, answer, context, prompt_tokens, cost, version, expires_at
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _unit(vector):
+        vector = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def lookup(self, vector):
+        """Return (entry, similarity) of the closest fresh answer above the threshold, or (None, best)."""
+        query = self._unit(vector)
+        now = time.time()
+        with self._lock:
+            self._entries = [entry for entry in self._entries
+                             if entry["expires_at"] >= now and entry["version"] == index_version]
+            if not self._entries:
+                self.misses += 1
+                return None, None
+            similarities = np.stack([entry["vector"] for entry in self._entries]) @ query
+            best = int(np.argmax(similarities))
+            similarity = float(similarities[best])
+            if similarity < self.threshold:
+                self.misses += 1
+                return None, similarity
+            self.hits += 1
+            entry = self._entries.pop(best)
+            self._entries.append(entry)  # Most recently used last
+            self.saved_time += entry["cost"]
+            return entry, similarity
+
+    def store(self, vector, answer, context, cost, version, prompt_tokens=None):
+        """Cache an answer computed against index `version`; `cost` is the time it took to produce."""
+        with self._lock:
+            self._entries.append({
+                "vector": self._unit(vector),
+                "answer": answer,
+                "context": context,
+                "prompt_tokens": prompt_tokens,
+                "cost": cost,
+                "version": version,
+                "expires_at": time.time() + self.ttl,
+            })
+            del self._entries[:-self.max_entries]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "saved_time": self.saved_time,
+            "entries": len(self._entries),
+        }
+
+
+retrieval_cache = RetrievalCache(config.RETRIEVAL_CACHE_SIZE, config.RETRIEVAL_CACHE_TTL)
+answer_cache = SemanticAnswerCache(config.ANSWER_CACHE_SIZE, config.ANSWER_CACHE_TTL, config.ANSWER_CACHE_THRESHOLD)
@@ -0,0 +1,122 @@
+# app/config.py
+"""
+Runtime configuration for the back-end.
+
+Every setting has a sensible default and can be overridden with an environment
+variable of the same name prefixed by `RAG_` (e.g. `RAG_EXTRACTION_WORKERS=4`).
+"""
+
+import os
+
+
+def _env_bool(name, default):
+    """Read a boolean flag from the environment."""
+    value = os.environ.get(name)
+    if value is None:
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+
+def _env_int(name, default):
+    """Read an integer setting from the environment."""
+    value = os.environ.get(name)
+    return int(value) if value else default
+
+
+# PDF extraction
+PARALLEL_EXTRACTION = _env_bool("RAG_PARALLEL_EXTRACTION", True)
+EXTRACTION_WORKERS = _env_int("RAG_EXTRACTION_WORKERS", os.cpu_count() or 1)
+EXTRACTION_PAGES_PER_TASK = _env_int("RAG_EXTRACTION_PAGES_PER_TASK", 8)
+TABLE_PRECHECK = _env_bool("RAG_TABLE_PRECHECK", True)
+EXTRACTION_CACHE_ENABLED = _env_bool("RAG_EXTRACTION_CACHE_ENABLED", True)
+EXTRACTION_CACHE_DIR = os.environ.get("RAG_EXTRACTION_CACHE_DIR", "extraction_cache")
+SLOW_PAGE_SECONDS = float(os.environ.get("RAG_SLOW_PAGE_SECONDS", 2.0))
+
+# Semantic splitting
+SPACY_MODEL = os.environ.get("RAG_SPACY_MODEL", "fr_core_news_sm")
+SENTENCE_SEGMENTER = os.environ.get("RAG_SENTENCE_SEGMENTER", "parser")  # parser | senter | sentencizer
+CHUNK_SIZE = _env_int("RAG_CHUNK_SIZE", 500)
+SPLIT_BATCH_SIZE = _env_int("RAG_SPLIT_BATCH_SIZE", 64)
+SPLIT_N_PROCESS = _env_int("RAG_SPLIT_N_PROCESS", 1)
+
+# Embeddings
+EMBEDDING_MODEL = os.environ.get("RAG_EMBEDDING_MODEL", "sentence-transformers/all-MiniLM-L6-v2")
+EMBEDDING_BACKEND = os.environ.get("RAG_EMBEDDING_BACKEND", "torch")  # torch | onnx | onnx-int8
+ONNX_MODEL_DIR = os.environ.get("RAG_ONNX_MODEL_DIR", "onnx_model")
+ONNX_THREADS = _env_int("RAG_ONNX_THREADS", 0)  # 0 -> ONNX Runtime default
+EMBEDDING_CACHE_ENABLED = _env_bool("RAG_EMBEDDING_CACHE_ENABLED", True)
+EMBEDDING_CACHE_DIR = os.environ.get("RAG_EMBEDDING_CACHE_DIR", "embedding_cache")
+EMBEDDING_CACHE_MAX_ENTRIES = _env_int("RAG_EMBEDDING_CACHE_MAX_ENTRIES", 500_000)
+EMBEDDING_BATCH_SIZE = _env_int("RAG_EMBEDDING_BATCH_SIZE", 256)
+
+# Vector index
+INDEX_DIR = os.environ.get("RAG_INDEX_DIR", "faiss_index")
+INDEX_TYPE = os.environ.get("RAG_INDEX_TYPE", "flat")  # flat | ivf | hnsw | ivfpq | ivfsq
+INDEX_NLIST = _env_int("RAG_INDEX_NLIST", 0)  # 0 -> derived from the number of vectors
+INDEX_PQ_M = _env_int("RAG_INDEX_PQ_M", 16)
+INDEX_HNSW_M = _env_int("RAG_INDEX_HNSW_M", 32)
+INDEX_EF_CONSTRUCTION = _env_int("RAG_INDEX_EF_CONSTRUCTION", 200)
+INDEX_TRAIN_SAMPLE = _env_int("RAG_INDEX_TRAIN_SAMPLE", 50_000)
+SEARCH_NPROBE = _env_int("RAG_SEARCH_NPROBE", 16)
+SEARCH_EF = _env_int("RAG_SEARCH_EF", 64)
+DOCSTORE_FORMAT = os.environ.get("RAG_DOCSTORE_FORMAT", "sqlite")  # sqlite | pickle (LangChain save_local)
+SHARD_BY = os.environ.get("RAG_SHARD_BY", "collection")  # collection | file (uploads without a collection get their own)
+DEFAULT_COLLECTION = os.environ.get("RAG_DEFAULT_COLLECTION", "default")
+SHARD_SEARCH_WORKERS = _env_int("RAG_SHARD_SEARCH_WORKERS", 4)
+INDEX_KEEP_VERSIONS = _env_int("RAG_INDEX_KEEP_VERSIONS", 2)  # Snapshots kept per shard, current one included
+INDEX_MMAP = _env_bool("RAG_INDEX_MMAP", False)  # Memory-map published snapshots instead of reading them into RAM
+UPLOAD_FOLDER = os.environ.get("RAG_UPLOAD_FOLDER", "uploads")
+UPLOAD_CHUNK_SIZE = _env_int("RAG_UPLOAD_CHUNK_SIZE", 1 << 20)
+MAX_FINISHED_JOBS = _env_int("RAG_MAX_FINISHED_JOBS", 100)
+INGEST_CHECKPOINT_PAGES = _env_int("RAG_INGEST_CHECKPOINT_PAGES", 200)
+
+# Question answering
+LLM_HOST = os.environ.get("RAG_LLM_HOST")  # None -> Ollama default (OLLAMA_HOST or localhost:11434)
+LLM_TIMEOUT = _env_int("RAG_LLM_TIMEOUT", 300)
+LLM_MAX_CONCURRENCY = _env_int("RAG_LLM_MAX_CONCURRENCY", 4)
+LLM_MAX_QUEUE = _env_int("RAG_LLM_MAX_QUEUE", 32)
+LLM_BACKENDS = os.environ.get("RAG_LLM_BACKENDS")  # url[=model][@max_concurrency],... ; None -> LLM_HOST only
+LLM_RETRIES = _env_int("RAG_LLM_RETRIES", 1)
+LLM_HEALTH_INTERVAL = _env_int("RAG_LLM_HEALTH_INTERVAL", 10)
+LLM_EJECT_AFTER = _env_int("RAG_LLM_EJECT_AFTER", 3)  # Consecutive connection failures before a backend leaves rotation
+RETRIEVAL_WORKERS = _env_int("RAG_RETRIEVAL_WORKERS", 4)
+RETRIEVAL_MAX_QUEUE = _env_int("RAG_RETRIEVAL_MAX_QUEUE", 64)
+
+# Retrieval
+RETRIEVAL_K = _env_int("RAG_RETRIEVAL_K", 10)
+QUERY_BATCHING = _env_bool("RAG_QUERY_BATCHING", True)
+QUERY_BATCH_WINDOW_MS = _env_int("RAG_QUERY_BATCH_WINDOW_MS", 5)
+QUERY_BATCH_MAX_SIZE = _env_int("RAG_QUERY_BATCH_MAX_SIZE", 32)
+
+# Question caches
+RETRIEVAL_CACHE_SIZE = _env_int("RAG_RETRIEVAL_CACHE_SIZE", 1024)
+RETRIEVAL_CACHE_TTL = _env_int("RAG_RETRIEVAL_CACHE_TTL", 3600)
+ANSWER_CACHE_ENABLED = _env_bool("RAG_ANSWER_CACHE_ENABLED", False)
+ANSWER_CACHE_SIZE = _env_int("RAG_ANSWER_CACHE_SIZE", 256)
+ANSWER_CACHE_TTL = _env_int("RAG_ANSWER_CACHE_TTL", 86400)
+ANSWER_CACHE_THRESHOLD = float(os.environ.get("RAG_ANSWER_CACHE_THRESHOLD", 0.95))
+
+# Start-up
+WARMUP = _env_bool("RAG_WARMUP", True)
+
+# Prompt packing
+CHARS_PER_TOKEN = float(os.environ.get("RAG_CHARS_PER_TOKEN", 3.5))
+CONTEXT_TOKEN_BUDGET = _env_int("RAG_CONTEXT_TOKEN_BUDGET", 2000)
+CHUNK_DEDUP_THRESHOLD = float(os.environ.get("RAG_CHUNK_DEDUP_THRESHOLD", 0.8))
+HISTORY_TOKEN_BUDGET = _env_int("RAG_HISTORY_TOKEN_BUDGET", 1500)
+HISTORY_KEEP_MESSAGES = _env_int("RAG_HISTORY_KEEP_MESSAGES", 4)
+HISTORY_TRUNCATE_CHARS = _env_int("RAG_HISTORY_TRUNCATE_CHARS", 400)
+
+# Search service
+SEARCH_SERVICE_SOCKET = os.environ.get("RAG_SEARCH_SERVICE_SOCKET")  # None -> each worker loads its own models and index
+SEARCH_SERVICE_TIMEOUT = _env_int("RAG_SEARCH_SERVICE_TIMEOUT", 60)
+
+# Metrics
+METRICS_ENABLED = _env_bool("RAG_METRICS_ENABLED", True)
+
+# Logging
+LOG_FORMAT = os.environ.get("RAG_LOG_FORMAT", "auto")  # auto (console on a TTY, json otherwise) | console | json
+LOG_LEVEL = os.environ.get("RAG_LOG_LEVEL", "INFO").upper()
+LOG_QUEUE_SIZE = _env_int("RAG_LOG_QUEUE_SIZE", 10_000)
+PROMPT_LOG_SAMPLE_RATE = float(os.environ.get("RAG_PROMPT_LOG_SAMPLE_RATE", 1.0))
+PROMPT_LOG_MAX_CHARS = _env_int("RAG_PROMPT_LOG_MAX_CHARS", 300)
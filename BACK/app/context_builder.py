@@ -0,0 +1,90 @@
+# app/context_builder.py
+
+"""
+Token-budgeted packing of the prompt sent to the LLM.
+
+- Retrieved chunks are ranked by score, near-duplicate or overlapping chunks are
+  dropped, and chunks are added until the context token budget is reached.
+- Conversation history keeps its most recent messages verbatim, truncates older ones
+  and drops the oldest once the history token budget is reached.
+
+Token counts are estimated from character counts (`RAG_CHARS_PER_TOKEN`), which is
+accurate enough for budgeting without loading the LLM's tokenizer.
+"""
+
+import math
+import re
+from app import config
+
+TRUNCATION_MARK = " […]"
+
+
+def count_tokens(text):
+    """Estimated number of LLM tokens in a text."""
+    return math.ceil(len(text) / config.CHARS_PER_TOKEN)
+
+
+def count_conversation_tokens(conversation):
+    """Estimated number of tokens of a list of messages."""
+    return sum(count_tokens(msg["content"]) for msg in conversation)
+
+
+def _words(text):
+    return set(re.findall(r"\w+", text.lower()))
+
+
+def overlap(words_a, words_b):
+    """Share of the smaller chunk's words found in the other (1.0 = one contains the other)."""
+    if not words_a or not words_b:
+        return 0.0
+    return len(words_a & words_b) / min(len(words_a), len(words_b))
+
+
+def select_chunks(retrieved_context, token_budget=None, dedup_threshold=None):
+    """
+    Return the chunks to cite: best score first, without near-duplicates, within the budget.
+
+    Scores are FAISS L2 distances, so lower is better; chunks without a score keep
+    their retrieval order. `token_budget` and `dedup_threshold` default to the configured
+    values when None. The best chunk is always kept, so a budget of 0 cites only that one;
+    a threshold of 0 disables deduplication.
+    """
+    token_budget = config.CONTEXT_TOKEN_BUDGET if token_budget is None else token_budget
+    dedup_threshold = config.CHUNK_DEDUP_THRESHOLD if dedup_threshold is None else dedup_threshold
+    ranked = sorted(enumerate(retrieved_context), key=lambda item: (item[1].get("score", item[0]), item[0]))
+
+    selected, selected_words, used_tokens = [], [], 0
+    for _, chunk in ranked:
+        words = _words(chunk["page_content"])
+        if dedup_threshold and any(overlap(words, other) >= dedup_threshold for other in selected_words):
+            continue
+        tokens = count_tokens(chunk["page_content"])
+        if selected and used_tokens + tokens > token_budget:
+            break
+        selected.append(chunk)
+        selected_words.append(words)
+        used_tokens += tokens
+    return selected
+
+
+def compact_history(history, token_budget=None, keep_messages=None, truncate_chars=None):
+    """
+    Fit conversation history (list of {"role", "content"}) into a token budget.
+
+    The last `keep_messages` messages are kept verbatim, older ones are truncated to
+    `truncate_chars` characters, and the oldest messages are dropped while over budget.
+    """
+    token_budget = token_budget or config.HISTORY_TOKEN_BUDGET
+    keep_messages = config.HISTORY_KEEP_MESSAGES if keep_messages is None else keep_messages
+    truncate_chars = truncate_chars or config.HISTORY_TRUNCATE_CHARS
+
+    compacted = []
+    for i, msg in enumerate(history):
+        content = msg["content"]
+        if i < len(history) - keep_messages and len(content) > truncate_chars:
+            content = content[:truncate_chars].rstrip() + TRUNCATION_MARK
+        compacted.append({"role": msg["role"], "content": content})
+
+    while compacted and count_conversation_tokens(compacted) > token_budget:
+        compacted.pop(0)
+    return compacted
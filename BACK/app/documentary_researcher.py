@@ -4,62 +4,142 @@
 This file handles the indexing and retrieval processes for the RAG system.
 
 1. Indexing Process and Cleaning:
-   - Extracts text and tables from PDFs using `pdfplumber`.
+   - Extracts text and tables from PDFs using `pdfplumber` (see `app/pdf_extraction.py`),
+     optionally in parallel across a process pool by (file, page range).
    - Cleans the extracted text by normalizing spaces, removing headers/footers, and ensuring consistency.
    - Tags and labels document sections (e.g., headings, body text, tables) to enhance granularity.
    - Implements semantic splitting to split text into coherent chunks, ensuring logical boundaries like sentences or paragraphs using `spaCy`.
-   - Saves the indexed data into a FAISS vector store for efficient retrieval.
+     Page texts are streamed in batches through `nlp.pipe` with a pipeline trimmed to sentence segmentation.
+   - Streams pages -> chunks -> fixed-size embedding batches -> index, so memory stays bounded, and
+     checkpoints the index so an interrupted ingestion resumes where it stopped.
+   - Embeds chunks through a persistent content-addressed cache (`app/embedding_cache.py`) so unchanged chunks are never re-embedded.
+   - Saves the indexed data into a FAISS vector store for efficient retrieval, either exact or
+     approximate (IVF, HNSW, IVF-PQ, IVF-SQ8; see `app/vector_index.py`). Chunk texts and metadata
+     are kept in an on-disk SQLite docstore read lazily at query time (`app/sqlite_docstore.py`).
+   - Tracks every source file's content hash and chunk IDs in a manifest (`app/index_manifest.py`),
+     so unchanged files are skipped and modified or deleted files only replace their own vectors.
 
 2. Retrieval Process:
-   - Uses FAISS to retrieve the most relevant context for a given query.
+   - Uses FAISS to retrieve the most relevant context for a given query, searching the shards of the
+     index (one per collection, see `app/sharded_index.py`) in parallel and merging their top-k.
    - Returns top-k results with associated metadata, such as source and page number.
    - Prioritizes accuracy through dense embeddings and structured indexing.
 """
 
+import contextvars
 import os
+import shutil
+import uuid
 import warnings
 import time
-import pdfplumber
-import spacy
+import faiss
+import threading
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
 from langchain.schema import Document
-from langchain_community.vectorstores import FAISS
-from langchain_huggingface import HuggingFaceEmbeddings
+from app.pdf_extraction import clean_text, tag_sections, extract_text_from_pdf, extract_documents  # noqa: F401 (re-exported)
+from app.pdf_extraction import count_pages, iter_page_documents
+from app import config
+from app.embedding_backends import cache_model_name, create_embedding_model
+from app.embedding_cache import CachedEmbeddings
+from app.index_manifest import IndexManifest
+from app.sqlite_docstore import SQLiteDocstore
+from app.metadata_filters import filtered_search
+from app.vector_index import (add_to_vector_store, create_vector_store, delete_vectors, load_vector_store,
+                              needs_training, save_vector_store)
+from app.utils import metrics
 from app.utils.logger import logger, log_task
+from app.utils.progress import IngestionProgress
 
 warnings.filterwarnings("ignore", category=UserWarning)
 
-# Load the French language model for spaCy
-nlp = spacy.load("fr_core_news_sm")
+split_seconds = metrics.histogram("rag_split_seconds", "Time to split one batch of pages into chunks with spaCy.")
+split_chunks = metrics.counter("rag_split_chunks", "Chunks produced by semantic splitting.")
+embedding_batch_size = metrics.histogram(
+    "rag_embedding_batch_size", "Texts per embedding call.", ["kind"], buckets=metrics.SIZE_BUCKETS)
+embedding_batch_seconds = metrics.histogram("rag_embedding_batch_seconds", "Time per embedding call.", ["kind"])
+search_batch_size = metrics.histogram(
+    "rag_faiss_search_batch_size", "Questions per FAISS search.", buckets=metrics.SIZE_BUCKETS)
+search_seconds = metrics.histogram("rag_faiss_search_seconds", "Time per FAISS search, excluding query embedding.")
+
+# Components of the spaCy model that never influence sentence boundaries
+SENTENCE_UNUSED_COMPONENTS = ["morphologizer", "attribute_ruler", "lemmatizer", "ner"]
+
+
+def load_sentence_pipeline(model=None, segmenter=None):
+    """
+    Load a spaCy pipeline trimmed down to what sentence segmentation needs.
+
+    - "parser": tok2vec + dependency parser only. Boundaries are identical to the full pipeline.
+    - "senter": the lighter statistical sentence recognizer shipped with the model.
+    - "sentencizer": punctuation rules on a blank pipeline, fastest but boundaries may differ.
+    """
+    import spacy  # Imported lazily: only ingestion needs it
+
+    model = model or config.SPACY_MODEL
+    segmenter = segmenter or config.SENTENCE_SEGMENTER
+
+    if segmenter == "parser":
+        return spacy.load(model, exclude=SENTENCE_UNUSED_COMPONENTS)
+    if segmenter == "senter":
+        sentence_nlp = spacy.load(model, exclude=SENTENCE_UNUSED_COMPONENTS + ["parser"])
+        sentence_nlp.enable_pipe("senter")
+        return sentence_nlp
+    if segmenter == "sentencizer":
+        sentence_nlp = spacy.blank(model.split("_", 1)[0])
+        sentence_nlp.add_pipe("sentencizer")
+        return sentence_nlp
+    raise ValueError(f"Unknown sentence segmenter: {segmenter}")
+
+
+# The French language model for spaCy is loaded on first use, by ingestion only
+nlp = None
+_nlp_lock = threading.Lock()
+
+
+def get_nlp():
+    """Return the sentence segmentation pipeline, loading it on first call."""
+    global nlp
+    with _nlp_lock:
+        if nlp is None:
+            with log_task("Loading spaCy sentence pipeline"):
+                nlp = load_sentence_pipeline()
+        return nlp
 
 
 def initialize_embeddings():
-    """Initialize and return embeddings model."""
-    embeddings = HuggingFaceEmbeddings(model_name="sentence-transformers/all-MiniLM-L6-v2")
+    """Initialize and return embeddings model, behind the persistent embedding cache if enabled."""
+    embeddings = create_embedding_model()
+    if config.EMBEDDING_CACHE_ENABLED:
+        embeddings = CachedEmbeddings(
+            embeddings,
+            model_name=cache_model_name(),
+            cache_dir=config.EMBEDDING_CACHE_DIR,
+            max_entries=config.EMBEDDING_CACHE_MAX_ENTRIES,
+        )
     return embeddings
 
 
-def load_faiss_index(embeddings):
+def load_faiss_index(embeddings, index_dir=None, mmap=False):
     """Load FAISS index, raise FileNotFoundError if it does not exist."""
-    if not os.path.exists("faiss_index"):
-        logger.warning("FAISS index not found.")
+    index_dir = index_dir or config.INDEX_DIR
+    if not os.path.exists(index_dir):
+        logger.warning(f"FAISS index not found: {index_dir}")
         raise FileNotFoundError("FAISS index not found.")
-    index = FAISS.load_local("faiss_index", embeddings, allow_dangerous_deserialization=True)
+    index = load_vector_store(index_dir, embeddings, mmap=mmap)
     if not validate_faiss_index(index):  # Validate structure and health
         logger.error("FAISS index validation failed.")
         raise ValueError("FAISS index is corrupted or inconsistent.")
     return index
 
 
-def clean_text(text):
-    """Clean extracted text by normalizing spaces, removing headers/footers, and fixing line breaks."""
-    text = " ".join(text.split())  # Normalize spaces
-    text = text.replace("\n\n", "\n").replace("\n", " ").strip()  # Normalize line breaks
-    return text
-
-
-def tag_sections(content, page_number, file_path):
-    """Tag and label content for better granularity during indexing."""
-    return f"[Page {page_number} - Source: {os.path.basename(file_path)}]\n{content}"
+def warm_up(embeddings, faiss_index):
+    """Run a dummy embedding and search so the first real query does not pay cold-start costs."""
+    if faiss_index:
+        search_sharded(["Initialisation du service de recherche documentaire."], faiss_index)
+    else:
+        embeddings.embed_query("Initialisation du service de recherche documentaire.")
 
 
 def validate_faiss_index(index):
@@ -72,36 +152,8 @@ def validate_faiss_index(index):
         return False
 
 
-def extract_text_from_pdf(file_path):
-    """Extract text and tables from a PDF file using pdfplumber."""
-    documents = []
-    with pdfplumber.open(file_path) as pdf:
-        for i, page in enumerate(pdf.pages):
-            text = page.extract_text() or ""
-            tables = page.extract_tables()
-            clean_text_content = clean_text(text)
-            tagged_content = tag_sections(clean_text_content, page_number=i + 1, file_path=file_path)
-            
-            # Append text content as a Document object
-            documents.append(Document(
-                page_content=tagged_content,
-                metadata={"source": file_path, "page": i + 1}
-            ))
-
-            # Append tables as markdown-style text as a Document object
-            for table in tables:
-                table_md = "\n".join([" | ".join(map(str, row)) for row in table])
-                documents.append(Document(
-                    page_content=table_md,
-                    metadata={"source": file_path, "page": i + 1, "type": "table"}
-                ))
-    return documents
-
-
-def semantic_split(text, chunk_size=500):
-    """Split text into semantically meaningful chunks using spaCy."""
-    doc = nlp(text)
-    sentences = [sent.text for sent in doc.sents]  # Tokenize sentences
+def pack_sentences(sentences, chunk_size=500):
+    """Greedily pack consecutive sentences into chunks of at most `chunk_size` characters."""
     chunks = []
     current_chunk = ""
 
@@ -119,57 +171,351 @@ def semantic_split(text, chunk_size=500):
     return chunks
 
 
-def process_and_index_documents(file_paths, embeddings, faiss_index=None):
-    """Load, clean, semantically split, and index documents. Save index locally."""
-    documents = []
-    for file_path in file_paths:
-        docs = extract_text_from_pdf(file_path)
-        documents.extend(docs)
-        logger.info(f"Loaded document: {os.path.basename(file_path)}")
-
-    num_documents = len(documents)
-
-    with log_task("Splitting and indexing documents"):
-        split_docs = []
-        for doc in documents:
-            chunks = semantic_split(doc.page_content)  # Use semantic splitting
-            for chunk in chunks:
-                split_docs.append(Document(page_content=chunk, metadata=doc.metadata))
-
-        # Index documents with FAISS
-        if faiss_index is None:
-            faiss_index = FAISS.from_documents(split_docs, embeddings)
+def semantic_split_documents(documents, chunk_size=None, batch_size=None, n_process=None):
+    """
+    Split Documents into chunks, streaming all page texts through `nlp.pipe`.
+
+    Each page's sentences are packed into chunks by `pack_sentences`, with the
+    metadata of the originating Document attached to each chunk.
+    """
+    chunk_size = chunk_size or config.CHUNK_SIZE
+    batch_size = batch_size or config.SPLIT_BATCH_SIZE
+    n_process = n_process or config.SPLIT_N_PROCESS
+
+    split_docs = []
+    texts = ((doc.page_content, doc.metadata) for doc in documents)
+    with split_seconds.time():
+        for spacy_doc, metadata in get_nlp().pipe(texts, as_tuples=True, batch_size=batch_size, n_process=n_process):
+            sentences = [sent.text for sent in spacy_doc.sents]
+            for chunk in pack_sentences(sentences, chunk_size):
+                split_docs.append(Document(page_content=chunk, metadata=metadata))
+    split_chunks.inc(len(split_docs))
+    return split_docs
+
+
+def embed_in_batches(texts, embeddings, progress, batch_size=None):
+    """Embed texts in fixed-size batches, reporting `vectors_embedded` progress."""
+    batch_size = batch_size or config.EMBEDDING_BATCH_SIZE
+    vectors = []
+    for start in range(0, len(texts), batch_size):
+        batch = texts[start:start + batch_size]
+        embedding_batch_size.observe(len(batch), kind="documents")
+        with embedding_batch_seconds.time(kind="documents"):
+            vectors.extend(embeddings.embed_documents(batch))
+        progress.add("vectors_embedded", len(batch))
+    return vectors
+
+
+class StreamingIndexer:
+    """
+    Embed chunks in fixed-size batches and add them to a FAISS store as they arrive.
+
+    Chunks are embedded as soon as `EMBEDDING_BATCH_SIZE` of them are queued. A new store of
+    a trained index type is only created once `INDEX_TRAIN_SAMPLE` vectors (or all of them,
+    if fewer) are buffered, so that it is trained on a representative sample.
+    """
+
+    def __init__(self, embeddings, faiss_index, progress, index_dir=None):
+        self.embeddings = embeddings
+        self.faiss_index = faiss_index
+        self.progress = progress
+        self.index_dir = index_dir
+        self.pending = []  # Split chunks waiting for a full embedding batch
+        self.buffered = []  # (text, vector, metadata, chunk ID) not yet in the store
+        self.ids_by_source = {}
+        self.num_segments = 0
+
+    def add(self, chunks):
+        """Queue chunks, embedding and indexing every full batch."""
+        self.pending.extend(chunks)
+        batch_size = config.EMBEDDING_BATCH_SIZE
+        while len(self.pending) >= batch_size:
+            batch, self.pending = self.pending[:batch_size], self.pending[batch_size:]
+            self._embed(batch)
+
+    def can_checkpoint(self):
+        """False while vectors are still being buffered to train a new index."""
+        return self.faiss_index is not None or not needs_training()
+
+    def flush(self):
+        """Embed and index every queued chunk, creating the store if needed."""
+        if self.pending:
+            self._embed(self.pending)
+            self.pending = []
+        self._add_buffered(force=True)
+
+    def _embed(self, chunks):
+        self.progress.set_stage("embedding")
+        texts = [chunk.page_content for chunk in chunks]
+        vectors = embed_in_batches(texts, self.embeddings, self.progress)
+        chunk_ids = [str(uuid.uuid4()) for _ in chunks]
+        for chunk, chunk_id in zip(chunks, chunk_ids):
+            self.ids_by_source.setdefault(chunk.metadata["source"], []).append(chunk_id)
+        self.buffered.extend(zip(texts, vectors, [chunk.metadata for chunk in chunks], chunk_ids))
+        self.num_segments += len(chunks)
+        self._add_buffered(force=False)
+
+    def _add_buffered(self, force):
+        if not self.buffered or (not force and not self.can_checkpoint()
+                                 and len(self.buffered) < config.INDEX_TRAIN_SAMPLE):
+            return
+        self.progress.set_stage("indexing")
+        texts, vectors, metadatas, chunk_ids = (list(column) for column in zip(*self.buffered))
+        text_embeddings = list(zip(texts, vectors))
+        if self.faiss_index is None:
+            self.faiss_index = create_vector_store(text_embeddings, self.embeddings, metadatas=metadatas,
+                                                   ids=chunk_ids, index_dir=self.index_dir)
         else:
-            faiss_index.add_documents(split_docs)
-
-        faiss_index.save_local("faiss_index")
+            add_to_vector_store(self.faiss_index, text_embeddings, metadatas=metadatas, ids=chunk_ids)
+        self.buffered = []
+
+
+def save_index(faiss_index, manifest, index_dir=None):
+    """Save the index, then the manifest describing it."""
+    index_dir = index_dir or config.INDEX_DIR
+    save_vector_store(faiss_index, index_dir)
+    manifest.save(index_dir)
+
+
+def remove_orphan_vectors(faiss_index, manifest):
+    """Delete vectors saved by an interrupted run after its last manifest save."""
+    id_map = faiss_index.index_to_docstore_id
+    known_ids = manifest.all_chunk_ids()
+    if len(id_map) == len(known_ids):
+        return
+    orphan_ids = [chunk_id for _, chunk_id in id_map.items() if chunk_id not in known_ids]
+    if orphan_ids:
+        logger.warning(f"Removing {len(orphan_ids)} vector(s) missing from the ingestion manifest.")
+        delete_vectors(faiss_index, orphan_ids)
+
+
+def sync_index(file_paths, embeddings, faiss_index=None, remove_missing=False, progress=None, index_dir=None,
+               content_hashes=None):
+    """
+    Bring the FAISS index in line with `file_paths` using the ingestion manifest.
+
+    Unchanged files are skipped, modified files have their vectors replaced and, with
+    `remove_missing`, files absent from `file_paths` have their vectors removed.
+
+    Documents are streamed through the pipeline pages -> chunks -> embedding batches ->
+    index, so memory stays bounded whatever the corpus size. Every `INGEST_CHECKPOINT_PAGES`
+    pages the index and a manifest recording partially indexed files are saved; after a
+    crash, the next run resumes those files after their last checkpointed page.
+
+    The index and its manifest are saved in `index_dir` (default `INDEX_DIR`), e.g. one shard.
+    Stage progress is reported to `progress` (an `IngestionProgress`) if given; files already
+    hashed by the caller can be passed in `content_hashes` (file_path -> hash).
+    Returns the (possibly new, possibly None if empty) index and a summary dict.
+    """
+    progress = progress or IngestionProgress()
+    index_dir = index_dir or config.INDEX_DIR
+    manifest = IndexManifest.load(index_dir) if faiss_index is not None else None
+    if manifest is not None:
+        remove_orphan_vectors(faiss_index, manifest)
+    manifest = manifest or IndexManifest()
+    to_index, to_remove, unchanged = manifest.plan(file_paths, remove_missing=remove_missing,
+                                                   content_hashes=content_hashes)
+    summary = {
+        "num_documents": 0,
+        "num_segments": 0,
+        "indexed_files": [file_path for file_path, _ in to_index],
+        "removed_files": [file_path for file_path in to_remove if file_path not in dict(to_index)],
+        "unchanged_files": unchanged,
+    }
+    for file_path in unchanged:
+        logger.info(f"Skipping unchanged document: {os.path.basename(file_path)}")
+    if not to_index and not to_remove:
+        return faiss_index, summary
+
+    stale_ids = [chunk_id for file_path in to_remove for chunk_id in manifest.chunk_ids(file_path)]
+    for file_path in to_remove:
+        manifest.forget(file_path)
+    if faiss_index is not None and stale_ids:
+        # Persist deletions right away: they are already applied to the on-disk docstore
+        progress.set_stage("indexing")
+        delete_vectors(faiss_index, stale_ids)
+        if faiss_index.index.ntotal > 0:
+            save_index(faiss_index, manifest, index_dir)
+
+    content_hashes = dict(to_index)
+    file_order = list(content_hashes)
+    start_pages = {file_path: manifest.pages_done(file_path) for file_path in file_order}
+    for file_path, start_page in start_pages.items():
+        if start_page:
+            logger.info(f"Resuming {os.path.basename(file_path)} after page {start_page}.")
+    progress.set_total("pages_extracted", sum(count_pages(file_path, content_hashes[file_path])
+                                              for file_path in file_order) - sum(start_pages.values()))
+
+    indexer = StreamingIndexer(embeddings, faiss_index, progress, index_dir)
+    for file_path in file_order:
+        indexer.ids_by_source[file_path] = manifest.chunk_ids(file_path) if start_pages[file_path] else []
+    pages_done = dict(start_pages)
+    pages_since_checkpoint = 0
+    num_documents = 0
+
+    with log_task("Extracting, splitting and indexing documents"):
+        pages = iter_page_documents(file_order, start_pages=start_pages, content_hashes=content_hashes)
+        while True:
+            progress.set_stage("extracting")
+            page_batch = list(islice(pages, config.SPLIT_BATCH_SIZE))
+            if not page_batch:
+                break
+            progress.add("pages_extracted", len(page_batch))
+            documents = [doc for page_documents in page_batch for doc in page_documents]
+            num_documents += len(documents)
+
+            progress.set_stage("splitting")
+            chunks = semantic_split_documents(documents)  # Use batched semantic splitting
+            progress.add("chunks_split", len(chunks))
+            indexer.add(chunks)
+
+            # The first Document of a page is its text, carrying the source and page number
+            for page_documents in page_batch:
+                pages_done[page_documents[0].metadata["source"]] = page_documents[0].metadata["page"]
+            pages_since_checkpoint += len(page_batch)
+
+            if pages_since_checkpoint >= config.INGEST_CHECKPOINT_PAGES and indexer.can_checkpoint():
+                indexer.flush()
+                progress.set_stage("saving")
+                current = file_order.index(page_batch[-1][0].metadata["source"])
+                for position, file_path in enumerate(file_order[:current + 1]):
+                    manifest.record(file_path, content_hashes[file_path], indexer.ids_by_source[file_path],
+                                    pages_done=pages_done[file_path] if position == current else None)
+                save_index(indexer.faiss_index, manifest, index_dir)
+                logger.info(f"Checkpoint saved after page {pages_done[file_order[current]]} "
+                            f"of {os.path.basename(file_order[current])}.")
+                pages_since_checkpoint = 0
+        indexer.flush()
+
+    faiss_index = indexer.faiss_index
+    for file_path in file_order:
+        logger.info(f"Loaded document: {os.path.basename(file_path)}")
+        manifest.record(file_path, content_hashes[file_path], indexer.ids_by_source[file_path])
+
+    progress.set_stage("saving")
+    if faiss_index is None or faiss_index.index.ntotal == 0:
+        # Nothing left to search: drop the index so startup does not load an empty one
+        if faiss_index is not None and isinstance(faiss_index.docstore, SQLiteDocstore):
+            faiss_index.docstore.connection.close()
+        shutil.rmtree(index_dir, ignore_errors=True)
+        faiss_index = None
+        logger.info("FAISS index is empty and was removed.")
+    else:
+        save_index(faiss_index, manifest, index_dir)
         logger.info("FAISS index updated and saved successfully.")
-
-    logger.debug(f"Processed {num_documents} documents into {len(split_docs)} segments.")
-    return num_documents, len(split_docs)
-
-
-def retrieve_dense_results(question, faiss_index):
-    """Retrieve top dense results from FAISS index and format them as dictionaries with metadata."""
-    start_time = time.time()
-    dense_results_raw = faiss_index.as_retriever(k=10).invoke(question)
-    retrieval_duration = time.time() - start_time
-
-    dense_results = [
+    progress.finish()
+
+    summary["num_documents"] = num_documents
+    summary["num_segments"] = indexer.num_segments
+    logger.debug(f"Processed {num_documents} documents into {indexer.num_segments} segments.")
+    if isinstance(embeddings, CachedEmbeddings):
+        logger.debug(f"Embedding cache: {embeddings.stats()}")
+    return faiss_index, summary
+
+
+def embed_queries(questions, embeddings):
+    """Embed questions in one call, as a float32 matrix."""
+    embed = getattr(embeddings, "embed_queries", None) or embeddings.embed_documents
+    embedding_batch_size.observe(len(questions), kind="queries")
+    with embedding_batch_seconds.time(kind="queries"):
+        return np.asarray(embed(questions), dtype=np.float32)
+
+
+def search_vectors(faiss_index, vectors, k, metadata_filter=None):
+    """
+    Run one batched FAISS search of query vectors; returns (distances, positions).
+
+    With a `metadata_filter`, only the matching vectors are searched (see `app/metadata_filters.py`).
+    """
+    if faiss_index._normalize_L2:
+        vectors = vectors.copy()
+        faiss.normalize_L2(vectors)
+    search_batch_size.observe(len(vectors))
+    with search_seconds.time():
+        if metadata_filter:
+            return filtered_search(faiss_index, vectors, k, metadata_filter)
+        return faiss_index.index.search(vectors, k)
+
+
+# Shards are searched concurrently; FAISS releases the GIL while searching
+shard_search_pool = ThreadPoolExecutor(max_workers=config.SHARD_SEARCH_WORKERS, thread_name_prefix="shard-search")
+
+
+def search_sharded(questions, sharded_index, k=None, collections=None, metadata_filter=None):
+    """
+    Search the shards of a `ShardedIndex` in parallel and merge their top-k by distance.
+
+    Questions are embedded once and the same vectors are searched on every shard (or only
+    on `collections`), among the chunks matching `metadata_filter` if given. Returns, for
+    each question, its overall top-k (Document, distance) pairs, closest first, each
+    Document carrying its `collection` in its metadata.
+    """
+    k = k or config.RETRIEVAL_K
+    questions = list(questions)
+    shards = sharded_index.select(collections)
+    if not shards:
+        return [[] for _ in questions]
+    vectors = embed_queries(questions, sharded_index.embeddings)
+
+    def search_shard(shard):
+        name, faiss_index = shard
+        return name, faiss_index, search_vectors(faiss_index, vectors, k, metadata_filter)
+
+    if len(shards) == 1:
+        shard_results = [search_shard(shards[0])]
+    else:
+        # Each shard search runs in a copy of the caller's context, so its log lines keep the request ID
+        futures = [shard_search_pool.submit(contextvars.copy_context().run, search_shard, shard) for shard in shards]
+        shard_results = [future.result() for future in futures]
+
+    results = []
+    for row in range(len(questions)):
+        candidates = [
+            (float(distance), name, faiss_index, position)
+            for name, faiss_index, (distances, positions) in shard_results
+            for distance, position in zip(distances[row], positions[row])
+            if position != -1  # Fewer than k (matching) vectors in the shard
+        ]
+        candidates.sort(key=lambda candidate: candidate[0])
+        docs_and_scores = []
+        for distance, name, faiss_index, position in candidates[:k]:
+            doc = faiss_index.docstore.search(faiss_index.index_to_docstore_id[position])
+            doc = Document(page_content=doc.page_content, metadata={**doc.metadata, "collection": name})
+            docs_and_scores.append((doc, distance))
+        results.append(docs_and_scores)
+    return results
+
+
+def format_dense_results(docs_and_scores):
+    """Format (Document, distance) pairs as dictionaries with metadata."""
+    return [
         {
             "page_content": result.page_content,
             "metadata": {
                 "source": result.metadata.get("source", "Unknown"),
-                "page": result.metadata.get("page", "N/A")
+                "page": result.metadata.get("page", "N/A"),
+                "collection": result.metadata.get("collection"),
+                "type": result.metadata.get("type", "text")
             },
+            "score": score,
             "source_type": "Dense"
         }
-        for result in dense_results_raw
+        for result, score in docs_and_scores
     ]
+
+
+def retrieve_dense_results(question, faiss_index, collections=None, metadata_filter=None):
+    """Retrieve top dense results from the sharded FAISS index and format them as dictionaries with metadata."""
+    start_time = time.time()
+    dense_results_raw = search_sharded([question], faiss_index, collections=collections,
+                                       metadata_filter=metadata_filter)[0]
+    retrieval_duration = time.time() - start_time
+
+    dense_results = format_dense_results(dense_results_raw)
     return dense_results, retrieval_duration
 
 
-def retrieve_context(question, faiss_index):
-    """Retrieve context from dense retriever only."""
-    dense_results, dense_duration = retrieve_dense_results(question, faiss_index)
+def retrieve_context(question, faiss_index, collections=None, metadata_filter=None):
+    """Retrieve context from dense retriever only, optionally restricted to some collections and metadata."""
+    dense_results, dense_duration = retrieve_dense_results(question, faiss_index, collections, metadata_filter)
     return dense_results, dense_duration
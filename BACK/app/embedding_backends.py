@@ -0,0 +1,143 @@
+# app/embedding_backends.py
+
+"""
+Pluggable embedding backends, selected with `RAG_EMBEDDING_BACKEND`:
+
+- "torch":     `HuggingFaceEmbeddings` (sentence-transformers on PyTorch), the default.
+- "onnx":      the same model exported to ONNX and run with ONNX Runtime on CPU.
+- "onnx-int8": the ONNX model with dynamically quantized int8 weights.
+
+ONNX backends only need `onnxruntime` and `tokenizers` at runtime. Export (and optionally
+quantize) the model once, from the BACK directory, with:
+    python -m app.embedding_backends export --output onnx_model --quantize
+"""
+
+import argparse
+import os
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from app import config
+
+ONNX_MODEL_FILE = "model.onnx"
+ONNX_INT8_MODEL_FILE = "model.int8.onnx"
+TOKENIZER_FILE = "tokenizer.json"
+BACKENDS = ("torch", "onnx", "onnx-int8")
+
+
+class OnnxEmbeddings(Embeddings):
+    """Sentence-transformers style embeddings (mean pooling + L2 normalization) on ONNX Runtime."""
+
+    def __init__(self, model_dir, quantized=False, batch_size=32, max_length=256, num_threads=0):
+        import onnxruntime
+        from tokenizers import Tokenizer
+
+        model_file = ONNX_INT8_MODEL_FILE if quantized else ONNX_MODEL_FILE
+        model_path = os.path.join(model_dir, model_file)
+        if not os.path.exists(model_path):
+            raise FileNotFoundError(
+                f"{model_path} not found. Export it with `python -m app.embedding_backends export"
+                f" --output {model_dir}{' --quantize' if quantized else ''}`."
+            )
+
+        options = onnxruntime.SessionOptions()
+        options.intra_op_num_threads = num_threads
+        options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = onnxruntime.InferenceSession(model_path, options, providers=["CPUExecutionProvider"])
+        self.input_names = {model_input.name for model_input in self.session.get_inputs()}
+
+        self.tokenizer = Tokenizer.from_file(os.path.join(model_dir, TOKENIZER_FILE))
+        self.tokenizer.enable_truncation(max_length=max_length)
+        self.tokenizer.enable_padding()
+        self.batch_size = batch_size
+
+    def _embed_batch(self, texts):
+        encodings = self.tokenizer.encode_batch(texts)
+        input_ids = np.array([encoding.ids for encoding in encodings], dtype=np.int64)
+        attention_mask = np.array([encoding.attention_mask for encoding in encodings], dtype=np.int64)
+        inputs = {"input_ids": input_ids, "attention_mask": attention_mask}
+        if "token_type_ids" in self.input_names:
+            inputs["token_type_ids"] = np.array([encoding.type_ids for encoding in encodings], dtype=np.int64)
+
+        token_embeddings = self.session.run(None, inputs)[0]
+        mask = attention_mask[:, :, None].astype(np.float32)
+        pooled = (token_embeddings * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+        pooled /= np.clip(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12, None)
+        return pooled.tolist()
+
+    def embed_documents(self, texts):
+        texts = list(texts)
+        vectors = []
+        for start in range(0, len(texts), self.batch_size):
+            vectors.extend(self._embed_batch(texts[start:start + self.batch_size]))
+        return vectors
+
+    def embed_query(self, text):
+        return self._embed_batch([text])[0]
+
+
+def create_embedding_model(backend=None):
+    """Instantiate the configured embedding backend."""
+    backend = backend or config.EMBEDDING_BACKEND
+    if backend == "torch":
+        from langchain_huggingface import HuggingFaceEmbeddings
+        return HuggingFaceEmbeddings(model_name=config.EMBEDDING_MODEL)
+    if backend in ("onnx", "onnx-int8"):
+        return OnnxEmbeddings(config.ONNX_MODEL_DIR, quantized=backend == "onnx-int8",
+                              num_threads=config.ONNX_THREADS)
+    raise ValueError(f"Unknown embedding backend: {backend}")
+
+
+def cache_model_name(backend=None):
+    """Name used to key cached vectors, so vectors of different backends never mix."""
+    backend = backend or config.EMBEDDING_BACKEND
+    return config.EMBEDDING_MODEL if backend == "torch" else f"{config.EMBEDDING_MODEL}#{backend}"
+
+
+def export_onnx(model_name, output_dir, quantize=False):
+    """Export a sentence-transformers model to ONNX (requires torch and transformers), optionally int8."""
+    import torch
+    from transformers import AutoModel, AutoTokenizer
+
+    os.makedirs(output_dir, exist_ok=True)
+    tokenizer = AutoTokenizer.from_pretrained(model_name)
+    model = AutoModel.from_pretrained(model_name).eval()
+    tokenizer.save_pretrained(output_dir)  # Writes tokenizer.json for the fast tokenizer
+
+    sample = tokenizer(["Exemple de phrase à encoder."], return_tensors="pt")
+    input_names = ["input_ids", "attention_mask", "token_type_ids"]
+    dynamic_axes = {name: {0: "batch", 1: "sequence"} for name in input_names}
+    dynamic_axes["last_hidden_state"] = {0: "batch", 1: "sequence"}
+    with torch.no_grad():
+        torch.onnx.export(
+            model,
+            tuple(sample[name] for name in input_names),
+            os.path.join(output_dir, ONNX_MODEL_FILE),
+            input_names=input_names,
+            output_names=["last_hidden_state"],
+            dynamic_axes=dynamic_axes,
+            opset_version=14,
+        )
+
+    if quantize:
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+        quantize_dynamic(
+            os.path.join(output_dir, ONNX_MODEL_FILE),
+            os.path.join(output_dir, ONNX_INT8_MODEL_FILE),
+            weight_type=QuantType.QInt8,
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export the embedding model to ONNX.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    export_parser = subparsers.add_parser("export")
+    export_parser.add_argument("--model", default=config.EMBEDDING_MODEL)
+    export_parser.add_argument("--output", default=config.ONNX_MODEL_DIR)
+    export_parser.add_argument("--quantize", action="store_true", help="Also write an int8 model")
+    args = parser.parse_args()
+    export_onnx(args.model, args.output, args.quantize)
+    print(f"Exported {args.model} to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,211 @@
+# app/embedding_cache.py
+
+"""
+Persistent, content-addressed cache in front of an embeddings model.
+
+Vectors are keyed by a hash of the model name and the chunk text, stored as float32
+rows in a memory-mapped file (`vectors.f32`) and located through an offset index in
+SQLite (`index.sqlite`, key -> row and last use). Each call only writes the index rows
+it changed. The cache holds at most `max_entries` vectors; when it is full, the least
+recently used rows are evicted and their slots reused.
+
+Writes are ordered so that a crash never leaves a key pointing at another text's vector:
+evicted keys are deleted from the index before their rows are overwritten, and new keys
+are only inserted once their vectors are flushed to disk.
+
+Cache hits never touch the model, so rebuilding an unchanged corpus only costs reading
+vectors back from disk.
+"""
+
+import hashlib
+import os
+import sqlite3
+import threading
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from app.utils.logger import logger
+
+# Number of rows added to the vectors file each time it needs to grow
+GROWTH_ROWS = 4096
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS entries (key TEXT PRIMARY KEY, row INTEGER NOT NULL, last_used INTEGER NOT NULL);
+"""
+
+
+class CachedEmbeddings(Embeddings):
+    """Embeddings wrapper that serves document vectors from an on-disk cache when possible."""
+
+    def __init__(self, embeddings, model_name, cache_dir, max_entries):
+        self.embeddings = embeddings
+        self.model_name = model_name
+        self.cache_dir = cache_dir
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._vectors = None
+        self._dim = None
+        self._tick = 0
+        self._entries = {}  # key -> [row, last_used_tick]
+        self._free_rows = []
+        self._num_rows = 0
+        os.makedirs(cache_dir, exist_ok=True)
+        self._db = sqlite3.connect(self._index_path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript(SCHEMA)
+        self._load()
+
+    @property
+    def _index_path(self):
+        return os.path.join(self.cache_dir, "index.sqlite")
+
+    @property
+    def _vectors_path(self):
+        return os.path.join(self.cache_dir, "vectors.f32")
+
+    def _key(self, text):
+        """Content address of a chunk for the current model."""
+        return hashlib.blake2b(f"{self.model_name}\0{text}".encode("utf-8"), digest_size=16).hexdigest()
+
+    def _load(self):
+        """Open an existing cache; start empty if it is missing or was built for another model."""
+        meta = dict(self._db.execute("SELECT name, value FROM meta"))
+        if meta.get("model") not in (None, self.model_name):
+            logger.warning("Embedding cache was built for another model, starting empty.")
+            self._reset()
+            return
+        if "dim" not in meta or not os.path.exists(self._vectors_path):
+            self._reset()
+            return
+        try:
+            self._dim = int(meta["dim"])
+            self._entries = {key: [row, last_used] for key, row, last_used
+                             in self._db.execute("SELECT key, row, last_used FROM entries")}
+            self._tick = max((last_used for _, last_used in self._entries.values()), default=0)
+            self._num_rows = os.path.getsize(self._vectors_path) // (4 * self._dim)
+            self._vectors = np.memmap(self._vectors_path, dtype=np.float32, mode="r+", shape=(self._num_rows, self._dim))
+            used_rows = {row for row, _ in self._entries.values()}
+            self._free_rows = [row for row in range(self._num_rows) if row not in used_rows]
+        except (OSError, ValueError) as e:
+            logger.warning(f"Embedding cache could not be loaded, starting empty: {e}")
+            self._reset()
+
+    def _reset(self):
+        """Forget every entry; the vectors file is overwritten as rows are allocated again."""
+        self._entries, self._vectors, self._dim, self._num_rows, self._free_rows = {}, None, None, 0, []
+        if os.path.exists(self._vectors_path):
+            os.remove(self._vectors_path)
+        with self._db:
+            self._db.execute("DELETE FROM entries")
+            self._db.execute("DELETE FROM meta")
+            self._db.execute("INSERT INTO meta (name, value) VALUES ('model', ?)", (self.model_name,))
+
+    def _grow(self, needed):
+        """Extend the vectors file by whole blocks so that `needed` more rows are free."""
+        capacity_left = self.max_entries - self._num_rows
+        new_rows = min(max(needed - len(self._free_rows), GROWTH_ROWS), capacity_left)
+        if new_rows <= 0:
+            return
+        if self._vectors is not None:
+            self._vectors.flush()
+            del self._vectors
+        with open(self._vectors_path, "ab") as f:
+            f.truncate((self._num_rows + new_rows) * 4 * self._dim)
+        self._free_rows.extend(range(self._num_rows, self._num_rows + new_rows))
+        self._num_rows += new_rows
+        self._vectors = np.memmap(self._vectors_path, dtype=np.float32, mode="r+", shape=(self._num_rows, self._dim))
+
+    def _evict(self, needed):
+        """Free the `needed` least recently used rows, removing their keys from the index before any reuse."""
+        victims = sorted(self._entries.items(), key=lambda item: item[1][1])[:needed]
+        with self._db:
+            self._db.executemany("DELETE FROM entries WHERE key = ?", [(key,) for key, _ in victims])
+        for key, (row, _) in victims:
+            del self._entries[key]
+            self._free_rows.append(row)
+
+    def _allocate_rows(self, count):
+        """Return `count` free rows, growing the file or evicting entries as needed."""
+        if len(self._free_rows) < count:
+            self._grow(count)
+        if len(self._free_rows) < count:
+            self._evict(count - len(self._free_rows))
+        rows, self._free_rows = self._free_rows[:count], self._free_rows[count:]
+        return rows
+
+    def embed_documents(self, texts):
+        """Embed documents, calling the model only for texts that are not cached."""
+        texts = list(texts)
+        keys = [self._key(text) for text in texts]
+        results = [None] * len(texts)
+
+        with self._lock:
+            self._tick += 1
+            missing = {}
+            used = set()
+            for i, key in enumerate(keys):
+                entry = self._entries.get(key)
+                if entry is not None:
+                    entry[1] = self._tick
+                    used.add(key)
+                    results[i] = self._vectors[entry[0]].tolist()
+                else:
+                    missing.setdefault(key, []).append(i)
+            if used:
+                with self._db:
+                    self._db.executemany("UPDATE entries SET last_used = ? WHERE key = ?",
+                                         [(self._tick, key) for key in used])
+            self.hits += len(texts) - sum(len(positions) for positions in missing.values())
+            self.misses += sum(len(positions) for positions in missing.values())
+
+        if not missing:
+            return results
+
+        missing_keys = list(missing)
+        new_vectors = self.embeddings.embed_documents([texts[missing[key][0]] for key in missing_keys])
+        for key, vector in zip(missing_keys, new_vectors):
+            for i in missing[key]:
+                results[i] = vector
+
+        with self._lock:
+            if self._dim is None:
+                self._dim = len(new_vectors[0])
+                with self._db:
+                    self._db.execute("INSERT OR REPLACE INTO meta (name, value) VALUES ('dim', ?)", (str(self._dim),))
+            # Never store more than the cache can hold; keep the most recent vectors
+            storable = [key for key in missing_keys[-self.max_entries:] if key not in self._entries]
+            vectors_by_key = dict(zip(missing_keys, new_vectors))
+            rows = self._allocate_rows(len(storable))
+            if rows:
+                for key, row in zip(storable, rows):
+                    self._vectors[row] = np.asarray(vectors_by_key[key], dtype=np.float32)
+                # Vectors reach the disk before the keys pointing at them
+                self._vectors.flush()
+                with self._db:
+                    self._db.executemany("INSERT OR REPLACE INTO entries (key, row, last_used) VALUES (?, ?, ?)",
+                                         [(key, row, self._tick) for key, row in zip(storable, rows)])
+                for key, row in zip(storable, rows):
+                    self._entries[key] = [row, self._tick]
+
+        return results
+
+    def embed_query(self, text):
+        """Queries are embedded directly; they are rarely repeated verbatim at indexing time."""
+        return self.embeddings.embed_query(text)
+
+    def embed_queries(self, texts):
+        """Embed a batch of queries directly with the model, bypassing the cache."""
+        return self.embeddings.embed_documents(list(texts))
+
+    def stats(self):
+        """Return hit/miss counters and occupancy of the cache."""
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+        }
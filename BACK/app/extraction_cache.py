@@ -0,0 +1,97 @@
+# app/extraction_cache.py
+
+"""
+Persistent per-page cache of PDF extraction results.
+
+Pages are keyed by the SHA-256 of the PDF's content and their page number, so a document
+that was already extracted, even under another name, is never parsed again. The cleaned
+text and the raw table rows are stored (not the tagged Documents, whose text includes the
+file name), together with the time the page originally took, for reporting.
+
+The cache is a SQLite file (`extraction_cache/pages.sqlite`) shared by the extraction
+process pool workers; each process opens its own connection on first use.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+
+CACHE_FILE = "pages.sqlite"
+
+# Bump when the extraction output changes, so stale entries are ignored
+EXTRACTION_VERSION = 1
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (hash TEXT NOT NULL, version INTEGER NOT NULL, num_pages INTEGER NOT NULL,
+                                  PRIMARY KEY (hash, version));
+CREATE TABLE IF NOT EXISTS pages (hash TEXT NOT NULL, version INTEGER NOT NULL, page INTEGER NOT NULL,
+                                  text TEXT NOT NULL, tables TEXT NOT NULL,
+                                  text_seconds REAL NOT NULL, table_seconds REAL NOT NULL, tables_skipped INTEGER NOT NULL,
+                                  PRIMARY KEY (hash, version, page));
+"""
+
+
+class ExtractionCache:
+    """Page-level extraction results keyed by (PDF content hash, page number)."""
+
+    def __init__(self, cache_dir):
+        self.path = os.path.join(cache_dir, CACHE_FILE)
+        self._lock = threading.Lock()
+        self._connection = None
+        self._pid = None
+
+    def _db(self):
+        # Connections must not cross a fork: pool workers reopen their own
+        if self._connection is None or self._pid != os.getpid():
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            self._connection = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.executescript(SCHEMA)
+            self._pid = os.getpid()
+        return self._connection
+
+    def num_pages(self, content_hash):
+        """Number of pages of a cached PDF, or None if unknown."""
+        with self._lock:
+            row = self._db().execute("SELECT num_pages FROM files WHERE hash = ? AND version = ?",
+                                     (content_hash, EXTRACTION_VERSION)).fetchone()
+        return row[0] if row else None
+
+    def set_num_pages(self, content_hash, num_pages):
+        with self._lock:
+            db = self._db()
+            with db:
+                db.execute("INSERT OR REPLACE INTO files (hash, version, num_pages) VALUES (?, ?, ?)",
+                           (content_hash, EXTRACTION_VERSION, num_pages))
+
+    def get(self, content_hash, page_number):
+        """Return (text, tables) of a cached page, or None."""
+        with self._lock:
+            row = self._db().execute(
+                "SELECT text, tables FROM pages WHERE hash = ? AND version = ? AND page = ?",
+                (content_hash, EXTRACTION_VERSION, page_number),
+            ).fetchone()
+        return (row[0], json.loads(row[1])) if row else None
+
+    def put(self, content_hash, page_number, text, tables, timing):
+        """Store a page's text, tables and extraction timing (see `pdf_extraction.extract_page_content`)."""
+        with self._lock:
+            db = self._db()
+            with db:
+                db.execute(
+                    "INSERT OR REPLACE INTO pages VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    (content_hash, EXTRACTION_VERSION, page_number, text, json.dumps(tables, ensure_ascii=False),
+                     timing["text_seconds"], timing["table_seconds"], int(timing["tables_skipped"])),
+                )
+
+    def page_timings(self, content_hash):
+        """Original extraction timing of every cached page of a PDF, in page order."""
+        with self._lock:
+            rows = self._db().execute(
+                "SELECT page, text_seconds, table_seconds, tables_skipped FROM pages "
+                "WHERE hash = ? AND version = ? ORDER BY page",
+                (content_hash, EXTRACTION_VERSION),
+            ).fetchall()
+        return [{"page": page, "text_seconds": text_seconds, "table_seconds": table_seconds,
+                 "tables_skipped": bool(tables_skipped)} for page, text_seconds, table_seconds, tables_skipped in rows]
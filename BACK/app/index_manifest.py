@@ -0,0 +1,100 @@
+# app/index_manifest.py
+
+"""
+Ingestion manifest stored next to the FAISS index (`manifest.json`).
+
+For every indexed source file it records the file's content hash and the IDs of the
+chunks it produced. Files whose ingestion was interrupted also record `pages_done`, the
+number of leading pages already in the index, so ingestion can resume from there. These chunk IDs are also the vector IDs passed to FAISS
+(`index_to_docstore_id`), so a file's vectors can be deleted or replaced without
+touching the rest of the index.
+"""
+
+import hashlib
+import json
+import os
+
+MANIFEST_FILE = "manifest.json"
+
+
+def file_content_hash(file_path, block_size=1 << 20):
+    """Return the SHA-256 of a file, read in blocks."""
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class IndexManifest:
+    """Mapping of source file -> {"hash": content hash, "chunk_ids": [...]}."""
+
+    def __init__(self, files=None):
+        self.files = files or {}
+
+    @classmethod
+    def load(cls, index_dir):
+        """Load the manifest of an index directory, or return None if there is none."""
+        path = os.path.join(index_dir, MANIFEST_FILE)
+        if not os.path.exists(path):
+            return None
+        with open(path, "r", encoding="utf-8") as f:
+            return cls(json.load(f).get("files", {}))
+
+    def save(self, index_dir):
+        """Atomically write the manifest into the index directory."""
+        os.makedirs(index_dir, exist_ok=True)
+        path = os.path.join(index_dir, MANIFEST_FILE)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"files": self.files}, f, indent=1)
+        os.replace(tmp_path, path)
+
+    def plan(self, file_paths, remove_missing=False, content_hashes=None):
+        """
+        Compare files on disk against the manifest (`content_hashes` maps files already hashed to their hash).
+
+        Returns (to_index, to_remove, unchanged): `to_index` lists (file_path, hash) for
+        new, modified or partially indexed files, `to_remove` lists manifest entries whose
+        vectors must go (modified files and, with `remove_missing`, files absent from `file_paths`).
+        """
+        to_index, to_remove, unchanged = [], [], []
+        for file_path in file_paths:
+            content_hash = content_hashes[file_path] if content_hashes else file_content_hash(file_path)
+            entry = self.files.get(file_path)
+            if entry is not None and entry["hash"] == content_hash:
+                if "pages_done" in entry:  # Interrupted: resume, keeping the pages already indexed
+                    to_index.append((file_path, content_hash))
+                else:
+                    unchanged.append(file_path)
+                continue
+            if entry is not None:
+                to_remove.append(file_path)
+            to_index.append((file_path, content_hash))
+
+        if remove_missing:
+            present = set(file_paths)
+            to_remove.extend(path for path in self.files if path not in present)
+        return to_index, to_remove, unchanged
+
+    def chunk_ids(self, file_path):
+        """Return the chunk/vector IDs recorded for a file."""
+        return list(self.files.get(file_path, {}).get("chunk_ids", []))
+
+    def pages_done(self, file_path):
+        """Number of leading pages of a partially indexed file already in the index (0 otherwise)."""
+        return self.files.get(file_path, {}).get("pages_done", 0)
+
+    def all_chunk_ids(self):
+        """Return the IDs of every chunk recorded in the manifest."""
+        return {chunk_id for entry in self.files.values() for chunk_id in entry["chunk_ids"]}
+
+    def record(self, file_path, content_hash, chunk_ids, pages_done=None):
+        """Record the chunks produced by a file, or by its first `pages_done` pages if still in progress."""
+        self.files[file_path] = {"hash": content_hash, "chunk_ids": list(chunk_ids)}
+        if pages_done is not None:
+            self.files[file_path]["pages_done"] = pages_done
+
+    def forget(self, file_path):
+        """Drop a file from the manifest."""
+        self.files.pop(file_path, None)
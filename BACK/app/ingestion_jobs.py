@@ -0,0 +1,122 @@
+# app/ingestion_jobs.py
+
+"""
+Background ingestion queue for uploaded documents.
+
+`/upload` only writes files to disk and enqueues a job; a single worker thread runs
+jobs one after another, in submission order, so concurrent uploads and deletions never
+race on the shared FAISS index. Each job exposes its status and per-stage progress through
+`/jobs/{id}`.
+"""
+
+import queue
+import threading
+import time
+import traceback
+import uuid
+from collections import OrderedDict
+from app import config
+from app.utils.logger import logger, request_id_var
+from app.utils.progress import IngestionProgress
+
+
+class IngestionJob:
+    """
+    A batch of files to index, with its lifecycle and progress.
+
+    `action` is "index" (the default), "delete" (remove `file_paths` and their vectors) or
+    "drop" (remove a whole `collection` and its shard).
+    """
+
+    def __init__(self, file_paths, action="index", collection=None):
+        self.id = uuid.uuid4().hex
+        self.file_paths = list(file_paths)
+        self.action = action
+        self.collection = collection
+        self.status = "queued"
+        self.progress = IngestionProgress()
+        self.result = None
+        self.error = None
+        self.created_at = time.time()
+        self.request_id = request_id_var.get()  # Request that submitted the job, for its log lines
+        self.started_at = None
+        self.finished_at = None
+
+    def to_dict(self):
+        """Public representation returned by `/jobs/{id}`."""
+        return {
+            "id": self.id,
+            "status": self.status,
+            "action": self.action,
+            "collection": self.collection,
+            "files": self.file_paths,
+            "progress": self.progress.snapshot(),
+            "result": self.result,
+            "error": self.error,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+
+
+class IngestionQueue:
+    """FIFO queue of ingestion jobs processed by one worker thread."""
+
+    def __init__(self, run_job, max_finished_jobs=None):
+        self._run_job = run_job
+        self._max_finished_jobs = max_finished_jobs or config.MAX_FINISHED_JOBS
+        self._queue = queue.Queue()
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+        self._worker = None
+
+    def submit(self, file_paths, action="index", collection=None):
+        """Enqueue a job for `file_paths` and return it immediately."""
+        job = IngestionJob(file_paths, action, collection)
+        with self._lock:
+            self._jobs[job.id] = job
+            self._prune()
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._work, name="ingestion-worker", daemon=True)
+                self._worker.start()
+        self._queue.put(job)
+        return job
+
+    def get(self, job_id):
+        """Return a job by ID, or None."""
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def list(self):
+        """Return all known jobs, oldest first."""
+        with self._lock:
+            return list(self._jobs.values())
+
+    def pending_count(self):
+        """Return the number of queued or running jobs."""
+        with self._lock:
+            return sum(1 for job in self._jobs.values() if job.status in ("queued", "running"))
+
+    def _prune(self):
+        """Forget the oldest finished jobs beyond the retention limit."""
+        finished = [job_id for job_id, job in self._jobs.items() if job.status in ("succeeded", "failed")]
+        for job_id in finished[:max(0, len(finished) - self._max_finished_jobs)]:
+            del self._jobs[job_id]
+
+    def _work(self):
+        while True:
+            job = self._queue.get()
+            job.status = "running"
+            job.started_at = time.time()
+            request_id_var.set(job.request_id)
+            try:
+                job.result = self._run_job(job)
+                job.status = "succeeded"
+            except Exception as e:
+                job.status = "failed"
+                job.error = str(e)
+                logger.error(f"Ingestion job {job.id} failed: {e}")
+                logger.error("Traceback:\n%s", traceback.format_exc())
+            finally:
+                job.finished_at = time.time()
+                self._queue.task_done()
@@ -0,0 +1,259 @@
+# app/llm_client.py
+
+"""
+Pooled, load-balanced client for one or more Ollama backends.
+
+Backends are configured with `RAG_LLM_BACKENDS`, a comma-separated list of
+`url[=model][@max_concurrency]` entries, e.g.
+    http://gpu1:11434=llama3.2@4,http://gpu2:11434=llama3.2:3b@2
+Each backend keeps a pool of keep-alive HTTP connections. Requests go to the healthy
+backend with the lowest in-flight/capacity ratio, never above its concurrency cap.
+Failed requests fail over to the other backends. A backend is only taken out of rotation
+after `LLM_EJECT_AFTER` consecutive connection failures (a slow generation timing out or a
+5xx answer says nothing about the host being down), and a background health check
+(`GET /api/tags`) brings it back. When no backend is healthy, requests are rejected at once.
+"""
+
+import asyncio
+import json
+import os
+import time
+import httpx
+from app import config
+from app.utils.concurrency import ServiceOverloaded
+from app.utils.logger import logger
+
+
+class LLMError(Exception):
+    """Raised when a backend rejects a request (4xx) or every attempt failed."""
+
+
+class LLMBackend:
+    """One Ollama server, its model, concurrency cap and live state."""
+
+    def __init__(self, url, model=None, max_concurrency=None):
+        self.url = url.rstrip("/")
+        self.model = model
+        self.max_concurrency = max_concurrency or config.LLM_MAX_CONCURRENCY
+        self.in_flight = 0
+        self.healthy = True
+        self.requests = 0
+        self.failures = 0
+        self.consecutive_failures = 0
+        self.client = httpx.AsyncClient(
+            base_url=self.url,
+            timeout=httpx.Timeout(config.LLM_TIMEOUT, connect=5.0),
+            limits=httpx.Limits(max_connections=self.max_concurrency, max_keepalive_connections=self.max_concurrency),
+        )
+
+    @property
+    def load(self):
+        return self.in_flight / self.max_concurrency
+
+    def stats(self):
+        return {"url": self.url, "model": self.model, "healthy": self.healthy, "in_flight": self.in_flight,
+                "max_concurrency": self.max_concurrency, "requests": self.requests, "failures": self.failures}
+
+
+def parse_backends(spec, default_model=None):
+    """Parse `url[=model][@max_concurrency]` entries separated by commas."""
+    backends = []
+    for entry in filter(None, (part.strip() for part in spec.split(","))):
+        max_concurrency = None
+        if "@" in entry.rsplit("/", 1)[-1]:
+            entry, max_concurrency = entry.rsplit("@", 1)
+            max_concurrency = int(max_concurrency)
+        url, _, model = entry.partition("=")
+        backends.append(LLMBackend(url, model or default_model, max_concurrency))
+    return backends
+
+
+class Lease:
+    """A reserved generation slot on a backend."""
+
+    def __init__(self, backend):
+        self.backend = backend
+
+
+class LLMPool:
+    """Least-loaded routing with per-backend caps, a bounded waiting queue and failover."""
+
+    def __init__(self, backends, max_queue=None, retries=None, health_interval=None):
+        self.backends = backends
+        self.max_queue = config.LLM_MAX_QUEUE if max_queue is None else max_queue
+        self.retries = config.LLM_RETRIES if retries is None else retries
+        self.health_interval = health_interval or config.LLM_HEALTH_INTERVAL
+        self.waiting = 0
+        self._condition = None
+        self._health_task = None
+
+    def _start(self):
+        """Create loop-bound primitives and the health check on first use."""
+        if self._condition is None:
+            self._condition = asyncio.Condition()
+        if self._health_task is None or self._health_task.done():
+            self._health_task = asyncio.ensure_future(self._health_loop())
+
+    def _pick(self, exclude=()):
+        candidates = [backend for backend in self.backends
+                      if backend.healthy and backend.in_flight < backend.max_concurrency and backend not in exclude]
+        return min(candidates, key=lambda backend: backend.load, default=None)
+
+    def _check_available(self, exclude):
+        if not any(backend.healthy for backend in self.backends if backend not in exclude):
+            raise ServiceOverloaded("No healthy LLM backend.")
+
+    async def acquire(self, exclude=()):
+        """Reserve a slot on the least-loaded healthy backend, waiting if all are busy (not if all are down)."""
+        self._start()
+        deadline = time.monotonic() + config.LLM_TIMEOUT
+        async with self._condition:
+            self._check_available(exclude)
+            backend = self._pick(exclude)
+            if backend is None and self.waiting >= self.max_queue:
+                raise ServiceOverloaded(f"llm queue is full ({self.waiting} waiting).")
+            self.waiting += 1
+            try:
+                while backend is None:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise ServiceOverloaded("No LLM backend available.")
+                    try:
+                        await asyncio.wait_for(self._condition.wait(), timeout=remaining)
+                    except asyncio.TimeoutError:
+                        pass
+                    self._check_available(exclude)
+                    backend = self._pick(exclude)
+            finally:
+                self.waiting -= 1
+            backend.in_flight += 1
+            backend.requests += 1
+            return Lease(backend)
+
+    async def release(self, lease):
+        """Give the slot of a lease back."""
+        async with self._condition:
+            lease.backend.in_flight -= 1
+            self._condition.notify_all()
+
+    @staticmethod
+    def _connection_failure(error):
+        """Whether an error says the backend is unreachable (not merely slow or failing this request)."""
+        return isinstance(error, httpx.TransportError) and not isinstance(error, httpx.ReadTimeout)
+
+    async def _record_failure(self, backend, error):
+        """Count a failed request; take the backend out of rotation after `LLM_EJECT_AFTER` connection failures in a row."""
+        backend.failures += 1
+        if not self._connection_failure(error):
+            logger.warning(f"LLM backend {backend.url} failed a request: {error}")
+            return
+        backend.consecutive_failures += 1
+        if backend.consecutive_failures >= config.LLM_EJECT_AFTER and backend.healthy:
+            logger.warning(f"LLM backend {backend.url} failed {backend.consecutive_failures} times in a row, "
+                           f"taking it out of rotation: {error}")
+            backend.healthy = False
+
+    @staticmethod
+    def _record_success(backend):
+        backend.consecutive_failures = 0
+
+    def _payload(self, lease, messages, model, stream):
+        return {"model": lease.backend.model or model, "messages": messages, "stream": stream}
+
+    @staticmethod
+    def _retryable(e):
+        return isinstance(e, httpx.TransportError) or (
+            isinstance(e, httpx.HTTPStatusError) and e.response.status_code >= 500)
+
+    async def _failover(self, lease, error, tried):
+        """
+        Reserve another backend, then release the failed lease; raise if attempts are exhausted.
+
+        The failed lease is only released once its replacement is acquired: when this raises,
+        it is still held and the caller releases it, so every lease is released exactly once.
+        """
+        await self._record_failure(lease.backend, error)
+        tried.append(lease.backend)
+        if len(tried) > self.retries or not any(
+                backend.healthy for backend in self.backends if backend not in tried):
+            raise LLMError(f"All LLM attempts failed: {error}")
+        replacement = await self.acquire(exclude=tried)
+        await self.release(lease)
+        return replacement
+
+    async def chat(self, messages, model):
+        """Non-streaming chat completion; returns Ollama's response JSON."""
+        lease = await self.acquire()
+        tried = []
+        try:
+            while True:
+                try:
+                    response = await lease.backend.client.post("/api/chat", json=self._payload(lease, messages, model, False))
+                    response.raise_for_status()
+                    self._record_success(lease.backend)
+                    return response.json()
+                except (httpx.TransportError, httpx.HTTPStatusError) as e:
+                    if not self._retryable(e):
+                        raise LLMError(f"{lease.backend.url} rejected the request: {e}")
+                    lease = await self._failover(lease, e, tried)
+        finally:
+            await self.release(lease)
+
+    async def stream_chat(self, lease, messages, model):
+        """
+        Yield Ollama's streamed response parts using a reserved `lease`.
+
+        Fails over to another backend only before the first part was produced; the lease
+        may point to a different backend afterwards and is released by the caller.
+        """
+        tried = []
+        while True:
+            produced = False
+            try:
+                async with lease.backend.client.stream(
+                    "POST", "/api/chat", json=self._payload(lease, messages, model, True)
+                ) as response:
+                    response.raise_for_status()
+                    self._record_success(lease.backend)
+                    async for line in response.aiter_lines():
+                        if line.strip():
+                            produced = True
+                            yield json.loads(line)
+                return
+            except (httpx.TransportError, httpx.HTTPStatusError) as e:
+                if produced or not self._retryable(e):
+                    raise LLMError(f"{lease.backend.url} failed while streaming: {e}")
+                # The failed slot is released; the caller releases the lease object it holds, now on the new backend
+                lease.backend = (await self._failover(lease, e, tried)).backend
+
+    async def _health_loop(self):
+        """Periodically probe every backend, put recovered ones back in rotation and count failed probes."""
+        while True:
+            await asyncio.sleep(self.health_interval)
+            for backend in self.backends:
+                try:
+                    response = await backend.client.get("/api/tags", timeout=2.0)
+                    healthy = response.status_code == 200
+                except httpx.HTTPError:
+                    healthy = False
+                if healthy:
+                    if not backend.healthy:
+                        logger.info(f"LLM backend {backend.url} is healthy again.")
+                    backend.consecutive_failures = 0
+                    backend.healthy = True
+                else:
+                    # Like failed requests, one failed probe alone does not take a backend out of rotation
+                    backend.consecutive_failures += 1
+                    if backend.consecutive_failures >= config.LLM_EJECT_AFTER:
+                        backend.healthy = False
+            async with self._condition:
+                self._condition.notify_all()
+
+    def stats(self):
+        return {"waiting": self.waiting, "backends": [backend.stats() for backend in self.backends]}
+
+
+def create_pool(default_model=None):
+    """Build the pool from `RAG_LLM_BACKENDS`, or a single backend on `RAG_LLM_HOST` / `OLLAMA_HOST`."""
+    spec = config.LLM_BACKENDS or config.LLM_HOST or os.environ.get("OLLAMA_HOST") or "http://localhost:11434"
+    return LLMPool(parse_backends(spec, default_model))
@@ -2,9 +2,15 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from app.routes import basic_routes, ask_route
-from app.documentary_researcher import initialize_embeddings, load_faiss_index, process_and_index_documents
-from app.utils.logger import logger, log_task
+from app import config
+from app.documentary_researcher import initialize_embeddings, warm_up
+from app.readiness import readiness
+from app.search_client import SearchClient
+from app.sharded_index import ShardedIndex, list_collections, load_shard, migrate_legacy_index, sync_collection
+from app.utils.metrics import InFlightMiddleware
+from app.utils.logger import RequestIdMiddleware, logger, log_task
 import os
+import threading
 
 # Set up the environment
 os.environ['TF_ENABLE_ONEDNN_OPTS'] = '0'
@@ -21,49 +27,105 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(InFlightMiddleware)
+app.add_middleware(RequestIdMiddleware)
 
 # Initialize embeddings and FAISS index
 embeddings = None
 faiss_index = None
 
-@app.on_event("startup")
-async def startup_event():
-    global embeddings, faiss_index
+def publish_services():
+    """Hand the loaded embeddings and faiss_index over to the routes."""
+    basic_routes.embeddings = embeddings
+    basic_routes.faiss_index = faiss_index
+    ask_route.embeddings = embeddings
+    ask_route.faiss_index = faiss_index
+
 
-    with log_task("Initializing embeddings"):
-        embeddings = initialize_embeddings()
+def load_index():
+    """Load every index shard and bring it in line with its collection's upload folder."""
+    global faiss_index
+
+    os.makedirs(config.UPLOAD_FOLDER, exist_ok=True)
+    migrate_legacy_index()
+    faiss_index = ShardedIndex(embeddings)
+    for collection in list_collections():
+        try:
+            faiss_index = faiss_index.with_shard(collection, load_shard(collection, embeddings))
+        except FileNotFoundError:
+            logger.warning(f"FAISS shard '{collection}' not found. Attempting to create a new one.")
+
+        # Only index the difference between the collection's upload folder and its manifest
+        try:
+            faiss_index, summary = sync_collection(faiss_index, collection, embeddings, remove_missing=True)
+            logger.info(
+                f"[{collection}] Indexed {len(summary['indexed_files'])} file(s), "
+                f"removed {len(summary['removed_files'])}, skipped {len(summary['unchanged_files'])} unchanged."
+            )
+        except Exception as e:
+            logger.error(f"Failed to synchronize FAISS shard '{collection}': {e}")
+
+    if not faiss_index:
+        logger.warning("No documents found to create FAISS index. Please upload documents.")
+
+
+def load_services():
+    """Load models and index in the background, recording each step in `readiness`."""
+    global embeddings
 
     try:
-        with log_task("Loading FAISS index"):
-            faiss_index = load_faiss_index(embeddings)
-    except FileNotFoundError:
-        logger.warning("FAISS index not found. Attempting to create a new index.")
-        UPLOAD_FOLDER = 'uploads'
-        os.makedirs(UPLOAD_FOLDER, exist_ok=True)
-        documents_to_index = [
-            os.path.join(UPLOAD_FOLDER, file)
-            for file in os.listdir(UPLOAD_FOLDER)
-            if file.endswith('.pdf')
-        ]
-
-        if documents_to_index:
+        with readiness.track("embeddings"), log_task("Initializing embeddings"):
+            embeddings = initialize_embeddings()
+        publish_services()
+
+        # Publish before the index is marked done: ingestion jobs waiting on it must see the loaded shards
+        with readiness.track("index"):
             try:
-                with log_task("Creating FAISS index from documents"):
-                    num_documents, num_segments = process_and_index_documents(
-                        documents_to_index, embeddings, faiss_index=None
-                    )
-                with log_task("Reloading FAISS index"):
-                    faiss_index = load_faiss_index(embeddings)
-            except Exception as e:
-                logger.error(f"Failed to create FAISS index: {e}")
+                load_index()
+            finally:
+                publish_services()
+
+        if config.WARMUP:
+            with readiness.track("warmup"), log_task("Warming up retrieval"):
+                warm_up(embeddings, faiss_index)
         else:
-            logger.warning("No documents found to create FAISS index. Please upload documents.")
-    
-    # Set the initialized embeddings and faiss_index for the routes
-    basic_routes.embeddings = embeddings
-    basic_routes.faiss_index = faiss_index
-    ask_route.embeddings = embeddings
-    ask_route.faiss_index = faiss_index
+            readiness.skip("warmup", "disabled")
+    except Exception as e:
+        logger.error(f"Service start-up failed: {e}")
+        for name in ("index", "warmup"):
+            if readiness.components[name].state == "pending":
+                readiness.skip(name, "a previous component failed")
+
+
+def connect_services():
+    """Use the shared search service (`app/search_service.py`) instead of loading models and index here."""
+    global embeddings, faiss_index
+
+    try:
+        with readiness.track("embeddings"), log_task(f"Connecting to the search service at {config.SEARCH_SERVICE_SOCKET}"):
+            client = SearchClient()
+            client.start()
+        # Uploads go to the service's ingestion queue, even while it is still loading
+        basic_routes.ingestion_queue = client.ingestion_queue
+        ask_route.search_client = client
+        with readiness.track("index"):
+            client.wait_until_ready()
+            embeddings, faiss_index = client.embeddings, client.index
+            publish_services()
+        readiness.skip("warmup", "done by the search service")
+    except Exception as e:
+        logger.error(f"Service start-up failed: {e}")
+        for name in ("index", "warmup"):
+            if readiness.components[name].state == "pending":
+                readiness.skip(name, "a previous component failed")
+
+
+@app.on_event("startup")
+async def startup_event():
+    # Accept traffic right away; /status reports progress while models and index load
+    loader = connect_services if config.SEARCH_SERVICE_SOCKET else load_services
+    threading.Thread(target=loader, name="startup-loader", daemon=True).start()
+
 
 # Include the routers
 app.include_router(basic_routes.router)
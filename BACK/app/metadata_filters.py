@@ -0,0 +1,182 @@
+# app/metadata_filters.py
+
+"""
+Metadata filters (sources, page range, chunk type) pushed down into the FAISS search.
+
+Every store keeps compact filter columns aligned with its vector positions: a source code
+(int32, into the list of source paths), the page number (int32) and the chunk type (int8,
+text or table), taken from the metadata attached at extraction. They are appended to as
+chunks are indexed, compacted with the vectors on deletion and saved next to the index
+(`filters.npz`), so nothing is read from the docstore at query time.
+
+A filter becomes a bitmap over positions with a few vectorized comparisons (cached per
+filter), handed to FAISS as an `IDSelectorBitmap`: the search only considers matching
+vectors and still returns a full top-k, instead of filtering (and losing) results afterwards.
+"""
+
+import os
+import threading
+from collections import OrderedDict
+import faiss
+import numpy as np
+
+FILTERS_FILE = "filters.npz"
+CHUNK_TYPES = ["text", "table"]
+MAX_CACHED_BITMAPS = 64
+
+
+class MetadataFilter:
+    """Restriction of a search to some sources (paths or file names), an inclusive page range and/or chunk types."""
+
+    def __init__(self, sources=None, pages=None, types=None):
+        self.sources = tuple(sorted(set(sources))) if sources else None
+        self.pages = None
+        if pages:
+            if len(pages) != 2 or pages[0] > pages[1]:
+                raise ValueError("pages must be a [first, last] range.")
+            self.pages = (int(pages[0]), int(pages[1]))
+        self.types = tuple(sorted(set(types))) if types else None
+        unknown = set(self.types or ()) - set(CHUNK_TYPES)
+        if unknown:
+            raise ValueError(f"Unknown chunk type(s): {', '.join(sorted(unknown))} "
+                             f"(expected {' or '.join(CHUNK_TYPES)}).")
+
+    def key(self):
+        return (self.sources, self.pages, self.types)
+
+    def __bool__(self):
+        return any(value is not None for value in self.key())
+
+    def __eq__(self, other):
+        return isinstance(other, MetadataFilter) and self.key() == other.key()
+
+    def __hash__(self):
+        return hash(self.key())
+
+    def __repr__(self):
+        return f"MetadataFilter(sources={self.sources}, pages={self.pages}, types={self.types})"
+
+    def to_dict(self):
+        return {"sources": self.sources, "pages": self.pages, "types": self.types}
+
+
+def page_number(page):
+    return page if isinstance(page, int) else -1
+
+
+class FilterColumns:
+    """Source code, page and chunk type of every vector of a store, by position."""
+
+    def __init__(self, sources=(), source_codes=(), pages=(), types=()):
+        self.sources = list(sources)
+        self.source_codes = np.asarray(source_codes, dtype=np.int32)
+        self.pages = np.asarray(pages, dtype=np.int32)
+        self.types = np.asarray(types, dtype=np.int8)
+        self._codes = {source: code for code, source in enumerate(self.sources)}
+        self._bitmaps = OrderedDict()  # MetadataFilter -> (bitmap, matches)
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.pages)
+
+    def append(self, metadatas):
+        """Add the columns of newly indexed chunks, in position order."""
+        codes, pages, types = [], [], []
+        for metadata in metadatas:
+            source = metadata.get("source")
+            if source not in self._codes:
+                self._codes[source] = len(self.sources)
+                self.sources.append(source)
+            codes.append(self._codes[source])
+            pages.append(page_number(metadata.get("page")))
+            chunk_type = metadata.get("type", "text")
+            types.append(CHUNK_TYPES.index(chunk_type) if chunk_type in CHUNK_TYPES else 0)
+        self.source_codes = np.concatenate([self.source_codes, np.asarray(codes, dtype=np.int32)])
+        self.pages = np.concatenate([self.pages, np.asarray(pages, dtype=np.int32)])
+        self.types = np.concatenate([self.types, np.asarray(types, dtype=np.int8)])
+        self._clear_bitmaps()
+
+    def keep(self, positions):
+        """Keep only the rows at `positions`, in that order (after vectors were deleted)."""
+        positions = np.asarray(positions, dtype=np.int64)
+        self.source_codes = self.source_codes[positions]
+        self.pages = self.pages[positions]
+        self.types = self.types[positions]
+        self._clear_bitmaps()
+
+    def _clear_bitmaps(self):
+        with self._lock:
+            self._bitmaps.clear()
+
+    def bitmap(self, metadata_filter):
+        """Return (bitmap of matching positions packed for `IDSelectorBitmap`, number of matches)."""
+        with self._lock:
+            cached = self._bitmaps.get(metadata_filter)
+            if cached is not None:
+                self._bitmaps.move_to_end(metadata_filter)
+                return cached
+
+        mask = np.ones(len(self), dtype=bool)
+        if metadata_filter.sources is not None:
+            wanted = set(metadata_filter.sources)
+            codes = [code for code, source in enumerate(self.sources)
+                     if source in wanted or os.path.basename(source or "") in wanted]
+            mask &= np.isin(self.source_codes, codes)
+        if metadata_filter.pages is not None:
+            first, last = metadata_filter.pages
+            mask &= (self.pages >= first) & (self.pages <= last)
+        if metadata_filter.types is not None:
+            mask &= np.isin(self.types, [CHUNK_TYPES.index(chunk_type) for chunk_type in metadata_filter.types])
+        result = (np.packbits(mask, bitorder="little"), int(mask.sum()))
+
+        with self._lock:
+            self._bitmaps[metadata_filter] = result
+            while len(self._bitmaps) > MAX_CACHED_BITMAPS:
+                self._bitmaps.popitem(last=False)
+        return result
+
+    def save(self, index_dir):
+        np.savez(os.path.join(index_dir, FILTERS_FILE), sources=np.array(self.sources, dtype=str),
+                 source_codes=self.source_codes, pages=self.pages, types=self.types)
+
+    @classmethod
+    def load(cls, index_dir):
+        """Load the columns saved with an index, or return None for indexes saved without them."""
+        path = os.path.join(index_dir, FILTERS_FILE)
+        if not os.path.exists(path):
+            return None
+        with np.load(path) as data:
+            return cls(data["sources"].tolist(), data["source_codes"], data["pages"], data["types"])
+
+
+def store_columns(vector_store):
+    """The filter columns of a store, rebuilt from its docstore if it was saved without them."""
+    columns = getattr(vector_store, "filter_columns", None)
+    if columns is None or len(columns) != vector_store.index.ntotal:
+        columns = FilterColumns()
+        columns.append(vector_store.docstore.search(chunk_id).metadata
+                       for _, chunk_id in sorted(vector_store.index_to_docstore_id.items()))
+        vector_store.filter_columns = columns
+    return columns
+
+
+def search_parameters(index, selector):
+    """FAISS search parameters restricted to `selector`, keeping the index's query-time knobs."""
+    ivf = faiss.try_extract_index_ivf(index)
+    if ivf is not None:
+        return faiss.SearchParametersIVF(sel=selector, nprobe=ivf.nprobe)
+    hnsw_index = faiss.downcast_index(index)
+    if isinstance(hnsw_index, faiss.IndexHNSW):
+        return faiss.SearchParametersHNSW(sel=selector, efSearch=hnsw_index.hnsw.efSearch)
+    return faiss.SearchParameters(sel=selector)
+
+
+def filtered_search(vector_store, vectors, k, metadata_filter):
+    """Search `vectors` among the vectors of a store matching `metadata_filter`; returns (distances, positions)."""
+    bitmap, matches = store_columns(vector_store).bitmap(metadata_filter)
+    if matches == 0:
+        return (np.full((len(vectors), k), np.inf, dtype=np.float32),
+                np.full((len(vectors), k), -1, dtype=np.int64))
+    selector = faiss.IDSelectorBitmap(vector_store.index.ntotal, faiss.swig_ptr(bitmap))
+    # `bitmap` and `selector` stay referenced until the search returns
+    return vector_store.index.search(vectors, k, params=search_parameters(vector_store.index, selector))
@@ -0,0 +1,275 @@
+# app/pdf_extraction.py
+
+"""
+PDF text and table extraction for the indexing pipeline.
+
+Pages are turned into `Document` objects carrying `source`, `page` and, for tables,
+`type` metadata. Extraction can run serially or be fanned out over a process pool
+by (file, page range); both paths return the same Documents in the same order, and
+both can be consumed page by page (`iter_page_documents`) with bounded memory.
+
+Pages without ruling lines skip pdfplumber's table finder (its default strategy only
+builds tables from lines and rectangle edges), and every extracted page is stored in a
+persistent cache keyed by the PDF's content hash (`app/extraction_cache.py`), so a
+document is never parsed twice.
+
+This module deliberately avoids importing spaCy or the embedding stack so that
+pool workers start quickly.
+"""
+
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import groupby, islice
+import pdfplumber
+from langchain.schema import Document
+from app import config
+from app.extraction_cache import ExtractionCache
+from app.index_manifest import file_content_hash
+from app.utils import metrics
+from app.utils.logger import logger
+
+page_extraction_seconds = metrics.histogram(
+    "rag_pdf_page_extraction_seconds", "Time to extract the text of one PDF page.")
+table_extraction_seconds = metrics.histogram(
+    "rag_pdf_table_extraction_seconds", "Time to extract the tables of one PDF page.")
+pages_extracted = metrics.counter("rag_pdf_pages_extracted", "PDF pages extracted.", ["cache"])
+table_checks_skipped = metrics.counter(
+    "rag_pdf_table_extraction_skipped", "Pages whose table extraction was skipped by the ruling-line pre-check.")
+
+extraction_cache = ExtractionCache(config.EXTRACTION_CACHE_DIR)
+
+
+def clean_text(text):
+    """Clean extracted text by normalizing spaces, removing headers/footers, and fixing line breaks."""
+    text = " ".join(text.split())  # Normalize spaces
+    text = text.replace("\n\n", "\n").replace("\n", " ").strip()  # Normalize line breaks
+    return text
+
+
+def tag_sections(content, page_number, file_path):
+    """Tag and label content for better granularity during indexing."""
+    return f"[Page {page_number} - Source: {os.path.basename(file_path)}]\n{content}"
+
+
+def observe_page_timings(timings, file_path=None):
+    """Record the per-page timings measured by `iter_pdf_pages` in the metrics, logging slow pages."""
+    for timing in timings:
+        if timing["cached"]:
+            pages_extracted.inc(cache="hit")
+            continue
+        pages_extracted.inc(cache="miss")
+        page_extraction_seconds.observe(timing["text_seconds"])
+        table_extraction_seconds.observe(timing["table_seconds"])
+        if timing["tables_skipped"]:
+            table_checks_skipped.inc()
+        duration = timing["text_seconds"] + timing["table_seconds"]
+        if duration >= config.SLOW_PAGE_SECONDS:
+            logger.warning(f"Slow page {timing['page']} of {os.path.basename(file_path or '?')}: "
+                           f"{timing['text_seconds']:.2f}s text, {timing['table_seconds']:.2f}s tables.")
+
+
+def has_table_edges(page):
+    """
+    Cheap pre-check for table structure: pdfplumber's default ("lines") strategy builds
+    tables from ruling lines and rectangle edges, so at least two horizontal and two
+    vertical edges are needed for a single cell.
+    """
+    return len(page.horizontal_edges) >= 2 and len(page.vertical_edges) >= 2
+
+
+def extract_page_content(page):
+    """Return (clean text, table rows, timing) of a pdfplumber page."""
+    start_time = time.perf_counter()
+    text = page.extract_text() or ""
+    text_done = time.perf_counter()
+    tables_skipped = config.TABLE_PRECHECK and not has_table_edges(page)
+    tables = [] if tables_skipped else page.extract_tables()
+    timing = {
+        "page": page.page_number,
+        "text_seconds": text_done - start_time,
+        "table_seconds": time.perf_counter() - text_done,
+        "tables_skipped": tables_skipped,
+        "cached": False,
+    }
+    return clean_text(text), tables, timing
+
+
+def page_documents(text, tables, page_number, file_path):
+    """Build the text Document and the table Documents of a page."""
+    tagged_content = tag_sections(text, page_number=page_number, file_path=file_path)
+
+    # Append text content as a Document object
+    documents = [Document(
+        page_content=tagged_content,
+        metadata={"source": file_path, "page": page_number}
+    )]
+
+    # Append tables as markdown-style text as a Document object
+    for table in tables:
+        table_md = "\n".join([" | ".join(map(str, row)) for row in table])
+        documents.append(Document(
+            page_content=table_md,
+            metadata={"source": file_path, "page": page_number, "type": "table"}
+        ))
+    return documents
+
+
+def count_pages(file_path, content_hash=None, use_cache=None):
+    """Return the number of pages of a PDF file, from the extraction cache when known."""
+    use_cache = config.EXTRACTION_CACHE_ENABLED if use_cache is None else use_cache
+    if use_cache:
+        content_hash = content_hash or file_content_hash(file_path)
+        num_pages = extraction_cache.num_pages(content_hash)
+        if num_pages is not None:
+            return num_pages
+    with pdfplumber.open(file_path) as pdf:
+        num_pages = len(pdf.pages)
+    if use_cache:
+        extraction_cache.set_num_pages(content_hash, num_pages)
+    return num_pages
+
+
+def iter_pdf_pages(file_path, start=0, end=None, content_hash=None, use_cache=None, timings=None):
+    """
+    Yield the Documents of pages [start, end) (0-based) of a PDF, one list per page.
+
+    Cached pages are rebuilt without opening the PDF; other pages are extracted, cached and
+    released once extracted. Page timings are appended to `timings` if given (pool workers
+    hand them back to the parent process), otherwise recorded in the metrics directly.
+    """
+    use_cache = config.EXTRACTION_CACHE_ENABLED if use_cache is None else use_cache
+    if use_cache:
+        content_hash = content_hash or file_content_hash(file_path)
+    end = count_pages(file_path, content_hash, use_cache) if end is None else end
+    pdf = None
+    try:
+        for i in range(start, end):
+            cached = extraction_cache.get(content_hash, i + 1) if use_cache else None
+            if cached is not None:
+                text, tables = cached
+                timing = {"page": i + 1, "cached": True}
+            else:
+                pdf = pdf or pdfplumber.open(file_path)
+                page = pdf.pages[i]
+                text, tables, timing = extract_page_content(page)
+                page.close()  # Drop pdfplumber's cached layout objects for the page
+                if use_cache:
+                    extraction_cache.put(content_hash, i + 1, text, tables, timing)
+            if timings is None:
+                observe_page_timings([timing], file_path)
+            else:
+                timings.append(timing)
+            yield page_documents(text, tables, i + 1, file_path)
+    finally:
+        if pdf is not None:
+            pdf.close()
+
+
+def extract_text_from_pdf(file_path):
+    """Extract text and tables from a PDF file using pdfplumber."""
+    return [doc for documents in iter_pdf_pages(file_path) for doc in documents]
+
+
+def extract_page_range(file_path, start, end, content_hash=None, use_cache=None, timings=None):
+    """Extract pages [start, end) (0-based) of a PDF."""
+    return [doc for documents in iter_pdf_pages(file_path, start, end, content_hash, use_cache, timings)
+            for doc in documents]
+
+
+def extract_page_range_task(file_path, start, end, content_hash, use_cache):
+    """Process pool task: extract a page range and return (documents, page timings)."""
+    timings = []
+    return extract_page_range(file_path, start, end, content_hash, use_cache, timings), timings
+
+
+def page_timings(file_path):
+    """
+    Per-page extraction timing of a PDF (text and table seconds, whether the table finder
+    was skipped), as measured when each page was first extracted. Extracts uncached pages.
+    """
+    content_hash = file_content_hash(file_path)
+    for _ in iter_pdf_pages(file_path, content_hash=content_hash, use_cache=True):
+        pass
+    return extraction_cache.page_timings(content_hash)
+
+
+def plan_page_ranges(file_paths, pages_per_task, start_pages=None, content_hashes=None, use_cache=None):
+    """Split files into (file_path, start, end) tasks, in file then page order, skipping `start_pages`."""
+    start_pages = start_pages or {}
+    content_hashes = content_hashes or {}
+    tasks = []
+    for file_path in file_paths:
+        num_pages = count_pages(file_path, content_hashes.get(file_path), use_cache)
+        for start in range(start_pages.get(file_path, 0), num_pages, pages_per_task):
+            tasks.append((file_path, start, min(start + pages_per_task, num_pages)))
+    return tasks
+
+
+def group_by_page(documents):
+    """Split the Documents of one file, in page order, into one list per page."""
+    return [list(page_documents) for _, page_documents in groupby(documents, key=lambda doc: doc.metadata["page"])]
+
+
+def iter_page_documents(file_paths, workers=None, parallel=None, pages_per_task=None, start_pages=None,
+                        content_hashes=None, use_cache=None):
+    """
+    Yield one list of Documents per page (its text, then its tables), in file then page order.
+
+    Only a bounded number of pages is held in memory: serial reads release each page once it
+    is extracted, and the process pool has at most two page ranges per worker in flight.
+    `start_pages` maps file paths to a number of leading pages to skip (resumed ingestion);
+    `content_hashes` maps file paths to already computed content hashes.
+    """
+    workers = config.EXTRACTION_WORKERS if workers is None else workers
+    parallel = config.PARALLEL_EXTRACTION if parallel is None else parallel
+    pages_per_task = pages_per_task or config.EXTRACTION_PAGES_PER_TASK
+    use_cache = config.EXTRACTION_CACHE_ENABLED if use_cache is None else use_cache
+    start_pages = start_pages or {}
+    content_hashes = dict(content_hashes or {})
+    if use_cache:
+        for file_path in file_paths:
+            content_hashes.setdefault(file_path, file_content_hash(file_path))
+
+    if not parallel or workers <= 1:
+        for file_path in file_paths:
+            yield from iter_pdf_pages(file_path, start_pages.get(file_path, 0),
+                                      content_hash=content_hashes.get(file_path), use_cache=use_cache)
+        return
+
+    tasks = plan_page_ranges(file_paths, pages_per_task, start_pages, content_hashes, use_cache)
+    if len(tasks) <= 1:
+        for file_path, start, end in tasks:
+            yield from iter_pdf_pages(file_path, start, end, content_hashes.get(file_path), use_cache)
+        return
+
+    with ProcessPoolExecutor(max_workers=min(workers, len(tasks))) as pool:
+        def submit(task):
+            file_path, start, end = task
+            return file_path, pool.submit(extract_page_range_task, file_path, start, end,
+                                          content_hashes.get(file_path), use_cache)
+
+        # Results are consumed in submission order, which keeps the output deterministic
+        remaining = iter(tasks)
+        in_flight = deque(submit(task) for task in islice(remaining, 2 * workers))
+        while in_flight:
+            file_path, future = in_flight.popleft()
+            documents, timings = future.result()
+            for task in islice(remaining, 1):
+                in_flight.append(submit(task))
+            observe_page_timings(timings, file_path)
+            yield from group_by_page(documents)
+
+
+def extract_documents(file_paths, workers=None, parallel=None, pages_per_task=None, use_cache=None):
+    """
+    Extract Documents from several PDFs, in file order then page order.
+
+    When parallel extraction is enabled and more than one worker is configured, page
+    ranges are processed by a process pool; otherwise files are read serially.
+    """
+    documents = []
+    for page_docs in iter_page_documents(file_paths, workers, parallel, pages_per_task, use_cache=use_cache):
+        documents.extend(page_docs)
+    return documents
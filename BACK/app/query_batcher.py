@@ -0,0 +1,92 @@
+# app/query_batcher.py
+
+"""
+Micro-batching of query embeddings and FAISS searches across concurrent `/ask` requests.
+
+Questions arriving within a short window (or until the batch is full) are embedded in
+one model call and searched with one batched FAISS query per shard on the retrieval
+executor. Each caller then receives its own top-k results.
+"""
+
+import asyncio
+import time
+from app import config
+from app.documentary_researcher import format_dense_results, search_sharded
+from app.utils.logger import request_id_var
+
+
+class QueryBatcher:
+    """Collect concurrent questions into batched retrievals."""
+
+    def __init__(self, executor, window_ms=None, max_batch_size=None, k=None):
+        self.executor = executor
+        self.window = (config.QUERY_BATCH_WINDOW_MS if window_ms is None else window_ms) / 1000
+        self.max_batch_size = max_batch_size or config.QUERY_BATCH_MAX_SIZE
+        self.k = k or config.RETRIEVAL_K
+        self.batches = 0
+        self.questions = 0
+        self._pending = {}  # (id(faiss_index), collections, filter) -> (faiss_index, collections, filter, [(question, future, request ID)])
+        self._timers = {}
+        self._tasks = set()
+
+    async def retrieve(self, question, faiss_index, collections=None, metadata_filter=None):
+        """Return (dense_results, retrieval_duration) for one question, like `retrieve_context`."""
+        start_time = time.time()
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+
+        # Batches never mix indexes, so a swapped index is only searched by new requests,
+        # nor collection or metadata filters, so every question of a batch searches the same vectors
+        collections = tuple(sorted(set(collections))) if collections else None
+        metadata_filter = metadata_filter or None
+        key = (id(faiss_index), collections, metadata_filter)
+        if key not in self._pending:
+            self._pending[key] = (faiss_index, collections, metadata_filter, [])
+            self._timers[key] = loop.call_later(self.window, self._flush, key)
+        batch = self._pending[key][3]
+        batch.append((question, future, request_id_var.get()))
+        if len(batch) >= self.max_batch_size:
+            self._flush(key)
+
+        docs_and_scores = await future
+        return format_dense_results(docs_and_scores), time.time() - start_time
+
+    def _flush(self, key):
+        """Send the pending batch of an index to the retrieval executor."""
+        timer = self._timers.pop(key, None)
+        if timer is not None:
+            timer.cancel()
+        if key not in self._pending:
+            return
+        faiss_index, collections, metadata_filter, batch = self._pending.pop(key)
+        task = asyncio.ensure_future(self._run(faiss_index, collections, metadata_filter, batch))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, faiss_index, collections, metadata_filter, batch):
+        questions = [question for question, _, _ in batch]
+        # Log the batch's search under the IDs of every request it serves (this task has its own context)
+        request_ids = [request_id for _, _, request_id in batch if request_id]
+        request_id_var.set(",".join(dict.fromkeys(request_ids)) or None)
+        try:
+            results = await self.executor.run(search_sharded, questions, faiss_index, self.k, collections,
+                                              metadata_filter)
+        except Exception as e:
+            for _, future, _ in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        self.batches += 1
+        self.questions += len(questions)
+        for (_, future, _), docs_and_scores in zip(batch, results):
+            if not future.done():
+                future.set_result(docs_and_scores)
+
+    def stats(self):
+        """Return the number of batches run and the mean batch size."""
+        return {
+            "batches": self.batches,
+            "questions": self.questions,
+            "mean_batch_size": self.questions / self.batches if self.batches else 0.0,
+        }
@@ -1,39 +1,109 @@
 from pydantic import BaseModel
+from app import config
+from app.llm_client import LLMError, create_pool
+from app.utils import metrics
 from app.utils.logger import logger
+import random
 import time
-import ollama
 
-def print_conversation(conversation):
-    """Print the conversation in a custom format."""
-    for msg in conversation:
-        print(f"{msg['role']} : {msg['content']}")
+# Pooled, load-balanced Ollama backends with admission control for concurrent generations
+llm_pool = create_pool()
 
+generation_seconds = metrics.histogram(
+    "rag_llm_generation_seconds", "LLM generation time, including waiting for a backend.", ["mode"])
+time_to_first_token_seconds = metrics.histogram(
+    "rag_llm_time_to_first_token_seconds", "Time from the streamed request to its first token.")
+generated_tokens = metrics.counter("rag_llm_generated_tokens", "Tokens generated by the LLM (Ollama eval_count).")
+generation_errors = metrics.counter("rag_llm_errors", "Failed LLM generations.", ["mode"])
+metrics.gauge("rag_llm_requests_in_flight", "LLM generations currently running.",
+              function=lambda: sum(backend.in_flight for backend in llm_pool.backends))
+metrics.gauge("rag_llm_requests_waiting", "Requests waiting for an LLM backend.", function=lambda: llm_pool.waiting)
 
+def truncate(text, max_chars):
+    """Cut `text` to `max_chars` characters, saying how much was left out."""
+    if max_chars <= 0 or len(text) <= max_chars:
+        return text
+    return f"{text[:max_chars]}... [{len(text) - max_chars} more chars]"
 
 
-def generate_response(conversation, model_name):
-    """Generate a response from the LLM using the conversation as input."""
-    # Verify that `conversation` is in the correct format
+def log_conversation(conversation, label):
+    """
+    Log a sample (`PROMPT_LOG_SAMPLE_RATE`) of the conversations sent to the LLM, each
+    message truncated to `PROMPT_LOG_MAX_CHARS`, through the non-blocking logger.
+    """
+    if config.PROMPT_LOG_SAMPLE_RATE < 1 and random.random() >= config.PROMPT_LOG_SAMPLE_RATE:
+        return
+    lines = [f"{msg['role']} : {truncate(msg['content'], config.PROMPT_LOG_MAX_CHARS)}" for msg in conversation]
+    logger.info(f"{label}:\n" + "\n".join(lines), extra={
+        "num_messages": len(conversation),
+        "prompt_chars": sum(len(msg["content"]) for msg in conversation),
+    })
+
+
+def validate_conversation(conversation):
+    """Verify that `conversation` is a list of dictionaries with `role` and `content` fields."""
     if not isinstance(conversation, list) or not all(
         isinstance(msg, dict) and 'role' in msg and 'content' in msg
         for msg in conversation
     ):
         logger.error("Invalid format for `conversation`: Expected list of dictionaries with `role` and `content` fields.")
-        raise ValueError("Invalid format for `conversation` passed to ollama.chat")
+        raise ValueError("Invalid format for `conversation` passed to the LLM")
+
 
-    # Log the conversation structure in a concise format using pprint
-    logger.info("Sending conversation to ollama.chat:")
-    print_conversation(conversation)
+async def generate_response_async(conversation, model_name):
+    """
+    Generate a response through the LLM pool without blocking the event loop.
+
+    Each backend runs at most its own concurrency cap of generations; beyond `LLM_MAX_QUEUE`
+    waiting callers, `ServiceOverloaded` is raised.
+    """
+    validate_conversation(conversation)
+
+    log_conversation(conversation, "Sending conversation to the LLM pool")
 
-    # Proceed to call ollama.chat
     try:
         start_time = time.time()
-        response = ollama.chat(model=model_name, messages=conversation)
+        response = await llm_pool.chat(conversation, model_name)
         generation_duration = time.time() - start_time
+        generation_seconds.observe(generation_duration, mode="blocking")
+        generated_tokens.inc(response.get("eval_count") or 0)
         response_text = response.get("message", {}).get("content", "")
         return response_text, generation_duration
-    except ollama._types.ResponseError as e:
-        logger.error(f"ResponseError from ollama.chat: {e}")
+    except LLMError as e:
+        generation_errors.inc(mode="blocking")
+        logger.error(f"LLMError from the LLM pool: {e}")
+        raise
+
+
+async def stream_response(conversation, model_name, lease, stats=None):
+    """
+    Yield response tokens from the LLM pool as the model produces them.
+
+    The caller is responsible for acquiring `lease` from `llm_pool` and releasing it. If `stats`
+    is given, it is filled with the number of streamed chunks and Ollama's final counters
+    (e.g. `eval_count`).
+    """
+    validate_conversation(conversation)
+
+    log_conversation(conversation, "Streaming conversation from the LLM pool")
+
+    stats = stats if stats is not None else {}
+    stats["num_chunks"] = 0
+    start_time = time.time()
+    try:
+        async for part in llm_pool.stream_chat(lease, conversation, model_name):
+            content = part.get("message", {}).get("content", "")
+            if content:
+                if stats["num_chunks"] == 0:
+                    time_to_first_token_seconds.observe(time.time() - start_time)
+                stats["num_chunks"] += 1
+                yield content
+            if part.get("done"):
+                stats["eval_count"] = part.get("eval_count")
+                stats["eval_duration"] = part.get("eval_duration")
+        generation_seconds.observe(time.time() - start_time, mode="stream")
+        generated_tokens.inc(stats.get("eval_count") or stats["num_chunks"])
+    except LLMError as e:
+        generation_errors.inc(mode="stream")
+        logger.error(f"LLMError from the LLM pool: {e}")
         raise
-    except Exception as e:
-        logger.error(f"Unexpected error during ollama.chat: {e}")
\ No newline at end of file
@@ -0,0 +1,89 @@
+# app/readiness.py
+
+"""
+Readiness state machine for the background start-up of the service.
+
+Each component (embeddings, index, warm-up) goes through
+`pending -> loading -> ready | failed | skipped`, with its load duration recorded.
+The service is `ready` once every component is ready or skipped.
+"""
+
+import threading
+import time
+from contextlib import contextmanager
+
+COMPONENTS = ["embeddings", "index", "warmup"]
+DONE_STATES = ("ready", "failed", "skipped")
+
+
+class Component:
+    """Load state of one start-up component."""
+
+    def __init__(self, name):
+        self.name = name
+        self.state = "pending"
+        self.started_at = None
+        self.duration = None
+        self.error = None
+        self.done = threading.Event()
+
+    def to_dict(self):
+        duration = self.duration
+        if self.state == "loading":
+            duration = time.time() - self.started_at
+        return {"state": self.state, "load_duration": duration, "error": self.error}
+
+
+class Readiness:
+    """Registry of start-up components and their states."""
+
+    def __init__(self, names=COMPONENTS):
+        self.components = {name: Component(name) for name in names}
+
+    @contextmanager
+    def track(self, name):
+        """Mark a component as loading for the duration of the block, then ready or failed."""
+        component = self.components[name]
+        component.state = "loading"
+        component.started_at = time.time()
+        try:
+            yield component
+            component.state = "ready"
+        except Exception as e:
+            component.state = "failed"
+            component.error = str(e)
+            raise
+        finally:
+            component.duration = time.time() - component.started_at
+            component.done.set()
+
+    def skip(self, name, reason=None):
+        """Mark a component as not needed."""
+        component = self.components[name]
+        component.state = "skipped"
+        component.error = reason
+        component.done.set()
+
+    def wait(self, name, timeout=None):
+        """Block until a component has finished loading (whatever the outcome)."""
+        return self.components[name].done.wait(timeout)
+
+    def is_ready(self):
+        return all(component.state in ("ready", "skipped") for component in self.components.values())
+
+    def state(self):
+        states = [component.state for component in self.components.values()]
+        if "failed" in states:
+            return "failed"
+        if self.is_ready():
+            return "ready"
+        return "starting"
+
+    def status(self):
+        return {
+            "state": self.state(),
+            "components": {name: component.to_dict() for name, component in self.components.items()},
+        }
+
+
+readiness = Readiness()
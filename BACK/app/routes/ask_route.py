@@ -1,9 +1,20 @@
 # app/routes/ask_route.py
 from fastapi import APIRouter, HTTPException
+from fastapi.responses import StreamingResponse
+from starlette.background import BackgroundTask
 from pydantic import BaseModel
-from app.question_handler import generate_response
+from app import caches, config
+from app.question_handler import generate_response_async, stream_response, llm_pool
+from app.utils import metrics
+from app.utils.concurrency import BoundedExecutor, ServiceOverloaded
 from app.utils.logger import logger
+from app.context_builder import compact_history, count_conversation_tokens, count_tokens, select_chunks
 from app.documentary_researcher import retrieve_context
+from app.metadata_filters import MetadataFilter
+from app.query_batcher import QueryBatcher
+from app.readiness import readiness
+import json
+import time
 import traceback
 
 # Initialize router
@@ -15,6 +26,19 @@ MODEL_NAME = "llama3.2"
 # Declare embeddings and faiss_index as global variables
 embeddings = None
 faiss_index = None
+search_client = None  # Set when retrieval is delegated to the shared search service
+
+# Query embedding and FAISS search are CPU-bound: run them on a bounded thread pool,
+# batching the questions of concurrent requests together when enabled
+retrieval_executor = BoundedExecutor("retrieval", config.RETRIEVAL_WORKERS, config.RETRIEVAL_MAX_QUEUE)
+query_batcher = QueryBatcher(retrieval_executor)
+
+retrieval_seconds = metrics.histogram(
+    "rag_retrieval_seconds", "Retrieval time per question, including queueing and batching.", ["cache"])
+prompt_build_seconds = metrics.histogram(
+    "rag_prompt_build_seconds", "Time to build the LLM conversation, excluding retrieval.")
+metrics.gauge("rag_index_vectors", "Vectors in the loaded FAISS index, over all shards.",
+              function=lambda: faiss_index.ntotal if faiss_index is not None else 0)
 
 # Define a simple system prompt
 SYSTEM_PROMPT = "Vous êtes Amélie, une assistante virtuelle pour répondre aux questions générales et aux recherches documentaires."
@@ -46,7 +70,6 @@ DOCUMENTARY_PROMPT_TEMPLATE = (
     
     "Si les extraits ne répondent pas complètement à la question, indiquez 'Je ne sais pas'. Utilisez un ton formel.\n\n"
     
-    "**Question** : {question}\n\n"
     "**Extraits disponibles (non visible par l'utilisateur)** :\n"
     "{citations}\n\n"
     "**Question** : {question}\n\n"
@@ -62,6 +85,10 @@ class QuestionRequest(BaseModel):
     question: str
     requiresDocumentSearch: bool  # Indicates if document retrieval is needed
     history: list[Message]  # Full chat history with role and content fields only
+    collections: list[str] | None = None  # Search only these collections (default: all of them)
+    sources: list[str] | None = None  # Search only these documents (paths or file names)
+    pages: list[int] | None = None  # Search only this [first, last] page range
+    type: str | None = None  # Search only "text" or "table" chunks
 
 def format_citations(retrieved_context):
     """Generate citations from retrieved context directly in ask_route."""
@@ -73,53 +100,293 @@ def format_citations(retrieved_context):
         citation_texts.append(citation)
     return "\n\n".join(citation_texts)
 
-@router.post("/ask")
-async def ask(question: QuestionRequest):
+def ensure_initialized():
+    """Raise a 503 while the service is starting, or a 500 if embeddings or the FAISS index are missing."""
+    if readiness.state() == "starting":
+        raise HTTPException(status_code=503, detail="Service is starting, please retry shortly.",
+                            headers={"Retry-After": "5"})
     if not embeddings or not faiss_index:
         logger.error("Embeddings and FAISS index are not initialized.")
         logger.error(f"Embeddings: {embeddings}")
         logger.error(f"faiss_index: {faiss_index}")
         raise HTTPException(status_code=500, detail="Embeddings and FAISS index are not initialized.")
 
+
+def check_collections(question):
+    """Raise a 404 if the question is restricted to collections that have no shard."""
+    unknown = [name for name in question.collections or [] if faiss_index.get(name) is None]
+    if unknown:
+        raise HTTPException(status_code=404, detail=f"Unknown collection(s): {', '.join(unknown)}")
+
+
+def question_filter(question):
+    """The metadata filter of a question (None without one); raise a 400 if it is invalid."""
     try:
-        # Construct the initial system prompt
-        conversation = [{"role": "system", "content": SYSTEM_PROMPT}]
-
-        # Add conversation history with explicit roles for previous messages
-        for msg in question.history:
-            conversation.append({"role": msg.role, "content": msg.content})
-
-        # Determine if a documentary prompt and context are required
-        context_text = ""  # Initialize as empty; only add if document search is needed
-        if question.requiresDocumentSearch:
-            # Retrieve context from the documents
-            retrieved_context, retrieval_duration = retrieve_context(question.question, faiss_index)
-            context_text = format_citations(retrieved_context)
-
-            # Format the documentary prompt with the question and citations
-            documentary_prompt = DOCUMENTARY_PROMPT_TEMPLATE.format(
-                question=question.question,
-                citations=context_text
-            )
-            conversation.append({"role": "user", "content": documentary_prompt})
-        else:
-            # Add the user's question directly for general inquiries
-            conversation.append({"role": "user", "content": question.question})
+        metadata_filter = MetadataFilter(question.sources, question.pages, [question.type] if question.type else None)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return metadata_filter or None
+
+
+def is_first_question(question):
+    """True if the user has not asked anything yet in this conversation (only the greeting precedes)."""
+    return not any(msg.role == "user" for msg in question.history)
+
+
+async def retrieve_with_cache(question_text, collections=None, metadata_filter=None):
+    """Retrieve context for a question, serving repeated questions from the retrieval cache."""
+    if search_client is not None:
+        # The search service caches and batches the questions of every worker
+        retrieved_context, retrieval_duration, cache_hit = await retrieval_executor.run(
+            search_client.retrieve, question_text, collections, metadata_filter
+        )
+        retrieval_seconds.observe(retrieval_duration, cache="hit" if cache_hit else "miss")
+        return retrieved_context, retrieval_duration, cache_hit
+
+    version = caches.index_version
+    cached = caches.retrieval_cache.lookup(question_text, collections, metadata_filter)
+    if cached is not None:
+        retrieval_seconds.observe(0.0, cache="hit")
+        return cached[0], 0.0, True
+
+    if config.QUERY_BATCHING:
+        retrieved_context, retrieval_duration = await query_batcher.retrieve(
+            question_text, faiss_index, collections, metadata_filter
+        )
+    else:
+        retrieved_context, retrieval_duration = await retrieval_executor.run(
+            retrieve_context, question_text, faiss_index, collections, metadata_filter
+        )
+    retrieval_seconds.observe(retrieval_duration, cache="miss")
+    caches.retrieval_cache.store(question_text, retrieved_context, retrieval_duration, version,
+                                 collections, metadata_filter)
+    return retrieved_context, retrieval_duration, False
+
+
+async def build_conversation(question, metadata_filter=None):
+    """
+    Build the conversation sent to the LLM, retrieving documentary context if required
+    (restricted to the question's collections and to `metadata_filter`).
+
+    Returns a dict with the `conversation`, the `documentary_prompt`, the cited `retrieved_context`,
+    the `retrieval_time`, whether retrieval was served from cache (`retrieval_cache_hit`) and the
+    estimated `prompt_tokens` before and after packing; documentary fields are empty/None for
+    general questions.
+    """
+    start_time = time.perf_counter()
+
+    # Construct the initial system prompt
+    conversation = [{"role": "system", "content": SYSTEM_PROMPT}]
+
+    # Add conversation history with explicit roles for previous messages, within the history budget
+    history = [{"role": msg.role, "content": msg.content} for msg in question.history]
+    conversation.extend(compact_history(history))
+    tokens_before = count_tokens(SYSTEM_PROMPT) + count_conversation_tokens(history)
+
+    # Determine if a documentary prompt and context are required
+    if not question.requiresDocumentSearch:
+        # Add the user's question directly for general inquiries
+        conversation.append({"role": "user", "content": question.question})
+        prompt_build_seconds.observe(time.perf_counter() - start_time)
+        return {"conversation": conversation, "documentary_prompt": "", "retrieved_context": [],
+                "retrieval_time": None, "retrieval_cache_hit": False,
+                "prompt_tokens": {"before_packing": tokens_before + count_tokens(question.question),
+                                  "after_packing": count_conversation_tokens(conversation)}}
+
+    # Retrieve context from the documents, then keep the best distinct chunks within the budget
+    retrieved_context, retrieval_duration, cache_hit = await retrieve_with_cache(
+        question.question, question.collections, metadata_filter
+    )
+    selected_context = select_chunks(retrieved_context)
+    context_text = format_citations(selected_context)
+
+    # Format the documentary prompt with the question and citations
+    documentary_prompt = DOCUMENTARY_PROMPT_TEMPLATE.format(
+        question=question.question,
+        citations=context_text
+    )
+    conversation.append({"role": "user", "content": documentary_prompt})
+    unpacked_prompt = DOCUMENTARY_PROMPT_TEMPLATE.format(
+        question=question.question,
+        citations=format_citations(retrieved_context)
+    )
+    prompt_build_seconds.observe(max(0.0, time.perf_counter() - start_time - retrieval_duration))
+    return {"conversation": conversation, "documentary_prompt": documentary_prompt,
+            "retrieved_context": selected_context, "retrieval_time": retrieval_duration,
+            "retrieval_cache_hit": cache_hit,
+            "prompt_tokens": {"before_packing": tokens_before + count_tokens(unpacked_prompt),
+                              "after_packing": count_conversation_tokens(conversation),
+                              "chunks_retrieved": len(retrieved_context),
+                              "chunks_kept": len(selected_context)}}
+
+
+def cache_timings(retrieval_hit, answer_hit=False, answer_similarity=None):
+    """Cache outcome of this request plus hit rates and time saved so far."""
+    return {
+        "retrieval_hit": retrieval_hit,
+        "answer_hit": answer_hit,
+        "answer_similarity": answer_similarity,
+        "retrieval": caches.retrieval_cache.stats(),
+        "answer": caches.answer_cache.stats() if config.ANSWER_CACHE_ENABLED else None,
+    }
+
+
+def overloaded_error(e):
+    """Translate a full queue into a 503 asking the client to retry."""
+    logger.warning(f"Rejecting question, service overloaded: {e}")
+    return HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "1"})
+
+
+@router.post("/ask")
+async def ask(question: QuestionRequest):
+    ensure_initialized()
+    check_collections(question)
+    metadata_filter = question_filter(question)
+
+    try:
+        # Serve near-identical documentary questions from the semantic answer cache
+        question_vector, answer_similarity = None, None
+        version = caches.index_version
+        if (config.ANSWER_CACHE_ENABLED and question.requiresDocumentSearch and is_first_question(question)
+                and not question.collections and metadata_filter is None):
+            question_vector = await retrieval_executor.run(faiss_index.embeddings.embed_query, question.question)
+            entry, answer_similarity = caches.answer_cache.lookup(question_vector)
+            if entry is not None:
+                return {
+                    "context": entry["context"],
+                    "answer": entry["answer"],
+                    "retrieval_time": 0.0,
+                    "generation_time": 0.0,
+                    "total_time": 0.0,
+                    "prompt_tokens": entry["prompt_tokens"],
+                    "cache": cache_timings(False, True, answer_similarity)
+                }
+
+        prompt = await build_conversation(question, metadata_filter)
+        retrieval_duration = prompt["retrieval_time"]
 
         # Generate response with conversation context
-        response_text, generation_duration = generate_response(conversation, MODEL_NAME)
+        response_text, generation_duration = await generate_response_async(prompt["conversation"], MODEL_NAME)
 
         # Prepare the response data with optional context (for front end only)
         response_data = {
-            "context": documentary_prompt.strip() if question.requiresDocumentSearch else "",
+            "context": prompt["documentary_prompt"].strip(),
             "answer": response_text.strip(),
-            "retrieval_time": retrieval_duration if question.requiresDocumentSearch else None,
+            "retrieval_time": retrieval_duration,
             "generation_time": generation_duration,
-            "total_time": (retrieval_duration if question.requiresDocumentSearch else 0) + generation_duration
+            "total_time": (retrieval_duration or 0) + generation_duration,
+            "prompt_tokens": prompt["prompt_tokens"],
+            "cache": cache_timings(prompt["retrieval_cache_hit"], False, answer_similarity)
         }
 
+        logger.info("Answered question", extra={
+            "endpoint": "/ask",
+            "timings": {"retrieval": retrieval_duration, "generation": generation_duration,
+                        "total": response_data["total_time"]},
+            "prompt_tokens": prompt["prompt_tokens"]["after_packing"],
+            "retrieval_cache_hit": prompt["retrieval_cache_hit"],
+        })
+        if question_vector is not None:
+            caches.answer_cache.store(
+                question_vector, response_data["answer"], response_data["context"],
+                response_data["total_time"], version, response_data["prompt_tokens"]
+            )
         return response_data
+    except ServiceOverloaded as e:
+        raise overloaded_error(e)
     except Exception as e:
         logger.error(f"Failed to generate response: {e}")
         logger.error("Traceback:\n%s", traceback.format_exc())
         raise HTTPException(status_code=500, detail="Failed to generate response.")
+
+
+def ndjson_frame(frame):
+    """Serialize one frame of the streaming response."""
+    return json.dumps(frame, ensure_ascii=False) + "\n"
+
+
+@router.post("/ask/stream")
+async def ask_stream(question: QuestionRequest):
+    """
+    Streaming variant of `/ask`, answered as NDJSON frames:
+
+    - {"type": "context", ...}: documentary prompt and retrieved sources, sent first
+    - {"type": "token", "content": ...}: tokens as the model produces them
+    - {"type": "timings", ...}: retrieval time, time-to-first-token, tokens/sec and total time
+    - {"type": "error", "detail": ...}: sent instead of the remaining frames if generation fails
+    """
+    ensure_initialized()
+    check_collections(question)
+    metadata_filter = question_filter(question)
+    start_time = time.time()
+
+    try:
+        prompt = await build_conversation(question, metadata_filter)
+        # Reserve a generation slot before answering so overload is still reported as a 503
+        lease = await llm_pool.acquire()
+    except ServiceOverloaded as e:
+        raise overloaded_error(e)
+    except Exception as e:
+        logger.error(f"Failed to prepare streaming response: {e}")
+        logger.error("Traceback:\n%s", traceback.format_exc())
+        raise HTTPException(status_code=500, detail="Failed to generate response.")
+
+    released = False
+
+    async def release_lease():
+        """Give the generation slot back once, whichever of the body or the background task gets here first."""
+        nonlocal released
+        if not released:
+            released = True
+            await llm_pool.release(lease)
+
+    async def frames():
+        try:
+            yield ndjson_frame({
+                "type": "context",
+                "context": prompt["documentary_prompt"].strip(),
+                "sources": [doc["metadata"] for doc in prompt["retrieved_context"]],
+                "retrieval_time": prompt["retrieval_time"],
+            })
+
+            generation_start = time.time()
+            first_token_time = None
+            stats = {}
+            async for token in stream_response(prompt["conversation"], MODEL_NAME, lease, stats):
+                if first_token_time is None:
+                    first_token_time = time.time()
+                yield ndjson_frame({"type": "token", "content": token})
+
+            end_time = time.time()
+            generation_duration = end_time - generation_start
+            decode_duration = end_time - (first_token_time or end_time)
+            num_tokens = stats.get("eval_count") or stats.get("num_chunks", 0)
+            timings = {
+                "retrieval_time": prompt["retrieval_time"],
+                "time_to_first_token": (first_token_time - start_time) if first_token_time else None,
+                "generation_time": generation_duration,
+                "num_tokens": num_tokens,
+                "tokens_per_second": num_tokens / decode_duration if decode_duration > 0 else None,
+                "total_time": end_time - start_time,
+            }
+            yield ndjson_frame({
+                "type": "timings",
+                **timings,
+                "prompt_tokens": prompt["prompt_tokens"],
+                "cache": cache_timings(prompt["retrieval_cache_hit"]),
+            })
+            logger.info("Streamed answer", extra={
+                "endpoint": "/ask/stream",
+                "timings": timings,
+                "prompt_tokens": prompt["prompt_tokens"]["after_packing"],
+                "retrieval_cache_hit": prompt["retrieval_cache_hit"],
+            })
+        except Exception as e:
+            logger.error(f"Failed to stream response: {e}")
+            logger.error("Traceback:\n%s", traceback.format_exc())
+            yield ndjson_frame({"type": "error", "detail": "Failed to generate response."})
+        finally:
+            await release_lease()
+
+    # The background task also runs when the client disconnects before the body is iterated
+    return StreamingResponse(frames(), media_type="application/x-ndjson", background=BackgroundTask(release_lease))
@@ -1,14 +1,25 @@
 # app/routes/basic_routes.py
 import os
-from fastapi import APIRouter, HTTPException, UploadFile
-from app.documentary_researcher import process_and_index_documents
+import shutil
+from fastapi import APIRouter, Form, HTTPException, UploadFile
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import PlainTextResponse
+from app import caches, config
+from app.embedding_cache import CachedEmbeddings
+from app.ingestion_jobs import IngestionQueue
+from app.question_handler import llm_pool
+from app.readiness import readiness
+from app.sharded_index import (ShardedIndex, collection_files, drop_collection, group_by_collection, list_collections,
+                               sync_collection, upload_collection, upload_dir, validate_collection)
+from app.utils import metrics
+from app.routes import ask_route
 from app.utils.logger import logger
 
 # Initialize router
 router = APIRouter()
 
 # Configuration
-UPLOAD_FOLDER = 'uploads'
+UPLOAD_FOLDER = config.UPLOAD_FOLDER
 ALLOWED_EXTENSIONS = {'pdf'}
 
 # Ensure upload folder exists
@@ -22,37 +33,163 @@ faiss_index = None
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
+# Routes calling `ingestion_queue` are plain functions (run on the thread pool) or hand the
+# call to it: with the search service, the queue is remote and every call is a blocking round-trip
+
 @router.get("/status")
-async def status():
+def status():
     return {
+        **readiness.status(),
         "embeddings_loaded": embeddings is not None,
-        "index_loaded": faiss_index is not None
+        "index_loaded": bool(faiss_index),
+        "index_version": caches.index_version,
+        "collections": faiss_index.stats() if faiss_index is not None else {},
+        "embedding_cache": embeddings.stats() if isinstance(embeddings, CachedEmbeddings) else None,
+        "llm": llm_pool.stats(),
+        "ingestion_jobs_pending": ingestion_queue.pending_count()
+    }
+
+@router.get("/metrics", response_class=PlainTextResponse)
+async def prometheus_metrics():
+    """Expose latency histograms, counters and gauges in the Prometheus text format."""
+    return PlainTextResponse(metrics.registry.render(), media_type="text/plain; version=0.0.4")
+
+def save_upload(file, file_path):
+    """Copy an uploaded file to disk in chunks, then move it into place (blocking: run it on the thread pool)."""
+    tmp_path = f"{file_path}.part"
+    file.file.seek(0)
+    with open(tmp_path, "wb") as f:
+        shutil.copyfileobj(file.file, f, config.UPLOAD_CHUNK_SIZE)
+    os.replace(tmp_path, file_path)
+
+
+def run_ingestion_job(job):
+    """Apply a job to the shards of the collections it touches and publish the updated index to the routes."""
+    global faiss_index
+    # Start-up synchronizes the index with the upload folder first; never race with it
+    readiness.wait("index")
+    if embeddings is None:
+        raise RuntimeError("Embeddings failed to load; cannot index documents.")
+    if faiss_index is None:
+        faiss_index = ShardedIndex(embeddings)
+
+    result = {}
+    try:
+        if job.action == "drop":
+            faiss_index, removed_files = drop_collection(faiss_index, job.collection)
+            result[job.collection] = {"removed_files": removed_files}
+        else:
+            for collection, file_paths in group_by_collection(job.file_paths).items():
+                if job.action == "delete":
+                    for file_path in file_paths:
+                        if os.path.exists(file_path):
+                            os.remove(file_path)
+                    # Only the vectors of the removed files go; the rest of the shard is kept as is
+                    faiss_index, summary = sync_collection(faiss_index, collection, embeddings,
+                                                           remove_missing=True, progress=job.progress)
+                else:
+                    faiss_index, summary = sync_collection(faiss_index, collection, embeddings, file_paths,
+                                                           progress=job.progress)
+                result[collection] = summary
+    finally:
+        # Publish the shards updated so far, even if a later collection failed: requests
+        # already searching keep the ShardedIndex they started with
+        ask_route.faiss_index = faiss_index
+        if any(summary.get("indexed_files") or summary.get("removed_files") for summary in result.values()):
+            # Cached retrievals and answers were computed on the previous index
+            caches.bump_index_version()
+    return result
+
+
+# Ingestion jobs run one at a time, in upload order, on a background thread
+ingestion_queue = IngestionQueue(run_ingestion_job)
+
+
+def queued_job(job, message):
+    logger.info(f"Queued {job.action} job {job.id} for {len(job.file_paths)} file(s).")
+    return {
+        "message": message,
+        "job_id": job.id,
+        "files": job.file_paths
     }
 
-@router.post("/upload")
-async def upload(files: list[UploadFile]):
+
+@router.post("/upload", status_code=202)
+async def upload(files: list[UploadFile], collection: str | None = Form(None)):
     uploaded_files = []
 
-    # Save and process each file
+    # Check every file and its collection before writing anything
+    collections = []
     for file in files:
-        if allowed_file(file.filename):
-            file_path = os.path.join(UPLOAD_FOLDER, file.filename)
-            with open(file_path, "wb") as f:
-                f.write(file.file.read())
-            uploaded_files.append(file_path)
-        else:
+        if not allowed_file(file.filename):
             raise HTTPException(status_code=400, detail=f"File not allowed: {file.filename}")
+        try:
+            collections.append(upload_collection(file.filename, collection))
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
 
-    # Process and index documents
+    # Save each file in its collection's folder, then hand indexing over to the ingestion worker
+    for file, file_collection in zip(files, collections):
+        folder = upload_dir(file_collection)
+        os.makedirs(folder, exist_ok=True)
+        file_path = os.path.join(folder, os.path.basename(file.filename))
+        # Large uploads must not hold the event loop (and every /ask stream) while they are written
+        await run_in_threadpool(save_upload, file, file_path)
+        uploaded_files.append(file_path)
+
+    job = await run_in_threadpool(ingestion_queue.submit, uploaded_files)
+    return {**queued_job(job, "Documents uploaded, indexing queued."), "collections": sorted(set(collections))}
+
+
+def checked_collection(collection):
+    """Validate a collection name from the URL and make sure it exists."""
     try:
-        num_documents, num_segments = process_and_index_documents(
-            uploaded_files, embeddings, faiss_index
-        )
-        return {
-            "message": "Documents uploaded and indexed successfully.",
-            "num_documents": num_documents,
-            "num_segments": num_segments
+        validate_collection(collection)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if collection not in list_collections():
+        raise HTTPException(status_code=404, detail=f"Unknown collection: {collection}")
+    return collection
+
+
+@router.get("/collections")
+async def list_documents():
+    """Documents, live snapshot version and indexed vectors of each collection."""
+    shards = faiss_index.stats() if faiss_index is not None else {}
+    return {
+        collection: {
+            "documents": [os.path.basename(file_path) for file_path in collection_files(collection)],
+            **shards.get(collection, {"version": None, "vectors": 0}),
         }
-    except Exception as e:
-        logger.error(f"Error processing documents: {e}")
-        raise HTTPException(status_code=500, detail="Failed to process documents.")
+        for collection in list_collections()
+    }
+
+
+@router.delete("/documents/{collection}/{filename}", status_code=202)
+def delete_document(collection: str, filename: str):
+    """Remove a document and its vectors; only its collection's shard is rewritten."""
+    file_path = os.path.join(upload_dir(checked_collection(collection)), os.path.basename(filename))
+    if not os.path.exists(file_path):
+        raise HTTPException(status_code=404, detail=f"Unknown document: {filename}")
+    job = ingestion_queue.submit([file_path], action="delete")
+    return queued_job(job, "Document deletion queued.")
+
+
+@router.delete("/collections/{collection}", status_code=202)
+def delete_collection(collection: str):
+    """Remove every document of a collection and drop its shard; other shards are untouched."""
+    job = ingestion_queue.submit([], action="drop", collection=checked_collection(collection))
+    return queued_job(job, "Collection deletion queued.")
+
+
+@router.get("/jobs")
+def list_jobs():
+    return [job.to_dict() for job in ingestion_queue.list()]
+
+
+@router.get("/jobs/{job_id}")
+def get_job(job_id: str):
+    job = ingestion_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Unknown job: {job_id}")
+    return job.to_dict()
@@ -0,0 +1,211 @@
+# app/search_client.py
+
+"""
+Client of the shared search service (`app/search_service.py`), used by the API workers
+when `SEARCH_SERVICE_SOCKET` is set.
+
+Requests are blocking calls over the Unix socket, one JSON object per line; each thread
+keeps its own connection, so the retrieval threads of a worker query the service
+concurrently. A background thread subscribes to the service's index events and mirrors
+its index state in `RemoteIndex`, adopting every new index version (which drops this
+worker's answer cache) as soon as it is published.
+"""
+
+import json
+import socket
+import threading
+import time
+from app import caches, config
+from app.utils.concurrency import ServiceOverloaded
+from app.utils.logger import logger, request_id_var
+
+
+class SearchServiceError(Exception):
+    """Raised when the search service cannot be reached or fails a request."""
+
+
+class RemoteEmbeddings:
+    """Embeddings computed by the search service."""
+
+    def __init__(self, client):
+        self.client = client
+
+    def embed_query(self, text):
+        return self.client.call("embed_query", text=text)
+
+
+class RemoteIndex:
+    """The service's index as last published: collections, snapshot versions and vector counts."""
+
+    def __init__(self, embeddings):
+        self.embeddings = embeddings
+        self.shards = {}
+        self.index_version = None
+
+    def update(self, state):
+        self.shards = dict(state.get("collections", {}))
+        self.index_version = state.get("index_version")
+
+    def __len__(self):
+        return len(self.shards)
+
+    def collections(self):
+        return sorted(self.shards)
+
+    def get(self, collection):
+        return self.shards.get(collection)
+
+    @property
+    def ntotal(self):
+        return sum(shard["vectors"] for shard in self.shards.values())
+
+    def stats(self):
+        return dict(self.shards)
+
+
+class RemoteJob:
+    """An ingestion job of the service, as returned by its queue."""
+
+    def __init__(self, data):
+        self.data = data
+        self.id = data["id"]
+        self.action = data["action"]
+        self.status = data["status"]
+        self.file_paths = data["files"]
+
+    def to_dict(self):
+        return self.data
+
+
+class RemoteIngestionQueue:
+    """Same interface as `IngestionQueue`, backed by the service's queue."""
+
+    def __init__(self, client):
+        self.client = client
+
+    def submit(self, file_paths, action="index", collection=None):
+        return RemoteJob(self.client.call("submit", file_paths=list(file_paths), action=action,
+                                          collection=collection))
+
+    def get(self, job_id):
+        data = self.client.call("job", job_id=job_id)
+        return RemoteJob(data) if data is not None else None
+
+    def list(self):
+        return [RemoteJob(data) for data in self.client.call("jobs")]
+
+    def pending_count(self):
+        return self.client.call("pending_count")
+
+
+class SearchClient:
+    """Connection to the search service, with the remote embeddings, index and ingestion queue it serves."""
+
+    def __init__(self, path=None, timeout=None):
+        self.path = path or config.SEARCH_SERVICE_SOCKET
+        self.timeout = timeout or config.SEARCH_SERVICE_TIMEOUT
+        self.embeddings = RemoteEmbeddings(self)
+        self.index = RemoteIndex(self.embeddings)
+        self.ingestion_queue = RemoteIngestionQueue(self)
+        self._local = threading.local()
+        self._listener = None
+
+    def _connect(self, timeout):
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(timeout)
+        try:
+            sock.connect(self.path)
+        except OSError:
+            sock.close()
+            raise
+        return sock.makefile("rwb")
+
+    def call(self, op, **params):
+        """Send one request on this thread's connection and return its result."""
+        # The service logs its work for the request under the caller's request ID
+        request = (json.dumps({"op": op, "request_id": request_id_var.get(), **params},
+                              ensure_ascii=False) + "\n").encode("utf-8")
+        stream = getattr(self._local, "stream", None)
+        reused = stream is not None
+        try:
+            if stream is None:
+                stream = self._local.stream = self._connect(self.timeout)
+            stream.write(request)
+            stream.flush()
+            line = stream.readline()
+            if not line:
+                raise ConnectionResetError("Search service closed the connection.")
+        except TimeoutError as e:
+            self._close_stream()
+            raise SearchServiceError(f"Search service did not answer '{op}' within {self.timeout}s.") from e
+        except OSError as e:
+            self._close_stream()
+            if reused:
+                # The service restarted since this connection was opened: retry once on a new one
+                return self.call(op, **params)
+            raise SearchServiceError(f"Search service unreachable at {self.path}: {e}") from e
+
+        response = json.loads(line)
+        if "error" in response:
+            if response.get("type") == "ServiceOverloaded":
+                raise ServiceOverloaded(response["error"])
+            raise SearchServiceError(response["error"])
+        return response["result"]
+
+    def _close_stream(self):
+        stream = getattr(self._local, "stream", None)
+        self._local.stream = None
+        if stream is not None:
+            try:
+                stream.close()
+            except OSError:
+                pass
+
+    def retrieve(self, question, collections=None, metadata_filter=None):
+        """Return (retrieved_context, retrieval_duration, cache_hit), as computed and cached by the service."""
+        result = self.call("retrieve", question=question, collections=collections,
+                           filter=metadata_filter.to_dict() if metadata_filter else None)
+        return result["context"], result["duration"], result["cache_hit"]
+
+    def wait_until_ready(self, poll_interval=1.0):
+        """Block until the service has loaded its models and index; return its status."""
+        warned = False
+        while True:
+            try:
+                status = self.call("status")
+            except SearchServiceError as e:
+                if not warned:
+                    logger.warning(f"Waiting for the search service: {e}")
+                    warned = True
+                status = {"state": "starting"}
+            if status["state"] != "starting":
+                self._apply(status)
+                if status["state"] == "failed":
+                    raise SearchServiceError("Search service failed to start.")
+                return status
+            time.sleep(poll_interval)
+
+    def start(self):
+        """Subscribe to index events in a background thread."""
+        if self._listener is None:
+            self._listener = threading.Thread(target=self._listen, name="search-service-events", daemon=True)
+            self._listener.start()
+
+    def _listen(self):
+        while True:
+            try:
+                stream = self._connect(None)
+                stream.write(b'{"op": "subscribe"}\n')
+                stream.flush()
+                for line in stream:
+                    self._apply(json.loads(line))
+                logger.warning("Search service closed the event stream; reconnecting.")
+            except OSError as e:
+                logger.debug(f"Search service event stream unavailable: {e}")
+            time.sleep(1)
+
+    def _apply(self, state):
+        """Mirror the index state published by the service."""
+        self.index.update(state)
+        if state.get("index_version") is not None:
+            caches.set_index_version(state["index_version"])
@@ -0,0 +1,150 @@
+# app/search_service.py
+
+"""
+Local embedding and search service shared by the API workers of a machine.
+
+Every uvicorn worker would otherwise load its own embedding model, spaCy pipeline and copy
+of the index. Instead, start this process once, then the workers with the same socket
+(both from the BACK directory, with the same settings):
+
+    RAG_SEARCH_SERVICE_SOCKET=/tmp/rag-search.sock RAG_INDEX_MMAP=true python -m app.search_service
+    RAG_SEARCH_SERVICE_SOCKET=/tmp/rag-search.sock uvicorn app.main:app --workers 4
+
+The service loads the models and the index shards (memory-mapped with `INDEX_MMAP`) and
+runs the ingestion queue. Workers (`app/search_client.py`) send it one JSON object per line
+and get one back:
+
+    {"op": "retrieve", "question": ..., "collections": [...], "filter": {...}} -> {"result": ...} or {"error": ..., "type": ...}
+
+Questions from all workers share the service's retrieval cache and `QueryBatcher`, so
+concurrent questions are embedded and searched together whichever worker received them.
+Connections that sent {"op": "subscribe"} receive the index state right away, then again
+after every index change, so every worker switches to the new version at once.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import threading
+import traceback
+from app import caches, config
+from app import main as app_main
+from app.metadata_filters import MetadataFilter
+from app.readiness import readiness
+from app.routes import ask_route, basic_routes
+from app.utils.concurrency import ServiceOverloaded
+from app.utils.logger import logger, request_id_var
+
+
+class SearchService:
+    """Unix socket server answering the API workers."""
+
+    def __init__(self, path):
+        self.path = path
+        self.subscribers = set()
+        self.loop = None
+
+    def index_state(self):
+        """Readiness, index version and shards, as mirrored by the workers."""
+        faiss_index = ask_route.faiss_index
+        return {
+            **readiness.status(),
+            "index_version": caches.index_version,
+            "collections": faiss_index.stats() if faiss_index is not None else {},
+        }
+
+    async def dispatch(self, request):
+        op = request.get("op")
+        if op == "status":
+            return self.index_state()
+        if op == "retrieve":
+            if not ask_route.faiss_index:
+                raise RuntimeError("FAISS index is not loaded.")
+            metadata_filter = MetadataFilter(**request["filter"]) if request.get("filter") else None
+            context, duration, cache_hit = await ask_route.retrieve_with_cache(
+                request["question"], request.get("collections"), metadata_filter)
+            return {"context": context, "duration": duration, "cache_hit": cache_hit}
+        if op == "embed_query":
+            vector = await ask_route.retrieval_executor.run(ask_route.embeddings.embed_query, request["text"])
+            return [float(value) for value in vector]
+        if op == "submit":
+            job = basic_routes.ingestion_queue.submit(request["file_paths"], request.get("action", "index"),
+                                                      request.get("collection"))
+            logger.info(f"Queued {job.action} job {job.id} for {len(job.file_paths)} file(s).")
+            return job.to_dict()
+        if op == "job":
+            job = basic_routes.ingestion_queue.get(request["job_id"])
+            return job.to_dict() if job is not None else None
+        if op == "jobs":
+            return [job.to_dict() for job in basic_routes.ingestion_queue.list()]
+        if op == "pending_count":
+            return basic_routes.ingestion_queue.pending_count()
+        raise ValueError(f"Unknown operation: {op}")
+
+    async def handle(self, reader, writer):
+        """Answer the requests of one connection, in order."""
+        try:
+            while line := await reader.readline():
+                request = json.loads(line)
+                request_id_var.set(request.get("request_id"))
+                if request.get("op") == "subscribe":
+                    self.subscribers.add(writer)
+                    response = {"event": "index", **self.index_state()}
+                else:
+                    try:
+                        response = {"result": await self.dispatch(request)}
+                    except ServiceOverloaded as e:
+                        response = {"error": str(e), "type": "ServiceOverloaded"}
+                    except Exception as e:
+                        logger.error(f"Search service request '{request.get('op')}' failed: {e}")
+                        logger.error("Traceback:\n%s", traceback.format_exc())
+                        response = {"error": str(e), "type": type(e).__name__}
+                writer.write((json.dumps(response, ensure_ascii=False) + "\n").encode("utf-8"))
+                await writer.drain()
+        except (ConnectionError, json.JSONDecodeError) as e:
+            logger.debug(f"Dropping search service connection: {e}")
+        finally:
+            self.subscribers.discard(writer)
+            writer.close()
+
+    def publish(self):
+        """Send the current index state to every subscribed worker."""
+        event = (json.dumps({"event": "index", **self.index_state()}, ensure_ascii=False) + "\n").encode("utf-8")
+        for writer in list(self.subscribers):
+            # Events are small: leave flow control to the connection's own `drain` in `handle`
+            if writer.is_closing():
+                self.subscribers.discard(writer)
+            else:
+                writer.write(event)
+
+    def publish_threadsafe(self, *_):
+        """Schedule `publish` from another thread (ingestion worker, start-up loader)."""
+        self.loop.call_soon_threadsafe(self.publish)
+
+    def load_services(self):
+        app_main.load_services()
+        self.publish_threadsafe()
+
+    async def serve(self):
+        self.loop = asyncio.get_running_loop()
+        if os.path.exists(self.path):
+            os.remove(self.path)  # Left by a previous run
+        server = await asyncio.start_unix_server(self.handle, path=self.path, limit=1 << 24)
+        caches.index_listeners.append(self.publish_threadsafe)
+        # Accept connections right away; workers wait for the `ready` state
+        threading.Thread(target=self.load_services, name="startup-loader", daemon=True).start()
+        logger.info(f"Search service listening on {self.path}")
+        async with server:
+            await server.serve_forever()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve embeddings, search and ingestion to the API workers.")
+    parser.add_argument("--socket", default=config.SEARCH_SERVICE_SOCKET or "rag-search.sock")
+    args = parser.parse_args()
+    asyncio.run(SearchService(args.socket).serve())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,345 @@
+# app/sharded_index.py
+
+"""
+Sharded FAISS index: one store per collection of documents.
+
+Each collection has its own upload folder and its own index directory:
+
+- documents: `UPLOAD_FOLDER/<collection>/*.pdf` (the default collection uses `UPLOAD_FOLDER` itself)
+- shard: `INDEX_DIR/<collection>/`, holding immutable snapshots `v000001/`, `v000002/`, ... (FAISS
+  file, SQLite docstore and ingestion manifest) and a `CURRENT` file naming the live one
+
+A published snapshot is never modified. Ingestion copies the current snapshot to
+`<shard>/.staging/`, updates that copy (checkpoints included), then renames it to the next
+version and atomically replaces `CURRENT`. A crash at any point leaves the previous snapshot
+live; an interrupted staging copy is picked up again by the next update of the shard.
+Searches already running on the previous store finish on it without any lock, and the last
+`INDEX_KEEP_VERSIONS` snapshots are kept on disk for them.
+
+Ingesting or deleting documents only rewrites the shards involved. With `SHARD_BY=file`,
+every PDF uploaded without an explicit collection gets a collection of its own, so deleting
+it drops its whole shard. Questions are searched on every shard, or on the requested
+collections, in parallel (`search_sharded` in `app/documentary_researcher.py`).
+
+A `ShardedIndex` is never modified in place either: `with_shard` returns a new one, which
+the ingestion worker then publishes to the routes with a single assignment.
+"""
+
+import os
+import re
+import shutil
+from app import config
+from app.documentary_researcher import load_faiss_index, sync_index
+from app.index_manifest import MANIFEST_FILE, IndexManifest, file_content_hash
+from app.sqlite_docstore import DOCSTORE_FILE, SQLiteDocstore, copy_sqlite_file
+from app.utils.logger import logger, log_task
+
+COLLECTION_NAME = re.compile(r"^[A-Za-z0-9][A-Za-z0-9_.-]{0,63}$")
+VERSION_NAME = re.compile(r"^v(\d{6,})$")
+CURRENT_FILE = "CURRENT"
+STAGING_DIR = ".staging"
+
+
+class ShardedIndex:
+    """Immutable mapping of collection name -> FAISS store, all sharing one embedding model."""
+
+    def __init__(self, embeddings, shards=None):
+        self.embeddings = embeddings
+        self.shards = dict(shards or {})
+
+    def __len__(self):
+        # An index without shards is falsy, like a missing index
+        return len(self.shards)
+
+    def collections(self):
+        return sorted(self.shards)
+
+    def get(self, collection):
+        """Return the store of a collection, or None."""
+        return self.shards.get(collection)
+
+    def select(self, collections=None):
+        """(name, store) pairs to search: every shard, or only the existing ones among `collections`."""
+        names = self.collections() if collections is None else dict.fromkeys(collections)
+        return [(name, self.shards[name]) for name in names if name in self.shards]
+
+    def with_shard(self, collection, faiss_index):
+        """Return a new ShardedIndex where `collection` maps to `faiss_index` (None removes the shard)."""
+        shards = dict(self.shards)
+        if faiss_index is None:
+            shards.pop(collection, None)
+        else:
+            shards[collection] = faiss_index
+        return ShardedIndex(self.embeddings, shards)
+
+    @property
+    def ntotal(self):
+        return sum(faiss_index.index.ntotal for faiss_index in self.shards.values())
+
+    def stats(self):
+        """Snapshot version and vectors of each collection."""
+        return {
+            name: {"version": getattr(self.shards[name], "snapshot_version", None),
+                   "vectors": self.shards[name].index.ntotal}
+            for name in self.collections()
+        }
+
+
+def validate_collection(collection):
+    """Return `collection` if it is a valid collection name, else raise ValueError."""
+    if not COLLECTION_NAME.match(collection or ""):
+        raise ValueError(f"Invalid collection name: {collection!r} (letters, digits, '_', '-' and '.', 64 max)")
+    return collection
+
+
+def upload_collection(filename, collection=None):
+    """Collection an uploaded file goes to: the requested one, else the default one or, with `SHARD_BY=file`, its own."""
+    if collection:
+        return validate_collection(collection)
+    if config.SHARD_BY == "file":
+        name = re.sub(r"[^A-Za-z0-9_.-]+", "-", os.path.splitext(os.path.basename(filename))[0])
+        return name.strip("-._")[:64] or config.DEFAULT_COLLECTION
+    return config.DEFAULT_COLLECTION
+
+
+def upload_dir(collection):
+    if collection == config.DEFAULT_COLLECTION:
+        return config.UPLOAD_FOLDER
+    return os.path.join(config.UPLOAD_FOLDER, collection)
+
+
+def shard_dir(collection):
+    return os.path.join(config.INDEX_DIR, collection)
+
+
+def collection_of(file_path):
+    """Collection of an uploaded file, from the folder it is stored in."""
+    folder = os.path.dirname(os.path.abspath(file_path))
+    if folder == os.path.abspath(config.UPLOAD_FOLDER):
+        return config.DEFAULT_COLLECTION
+    return os.path.basename(folder)
+
+
+def group_by_collection(file_paths):
+    """Group file paths by collection, keeping their order."""
+    groups = {}
+    for file_path in file_paths:
+        groups.setdefault(collection_of(file_path), []).append(file_path)
+    return groups
+
+
+def collection_files(collection):
+    """PDFs of a collection's upload folder, sorted by name."""
+    folder = upload_dir(collection)
+    if not os.path.isdir(folder):
+        return []
+    return [os.path.join(folder, file) for file in sorted(os.listdir(folder)) if file.endswith('.pdf')]
+
+
+def list_collections():
+    """Names of the collections having an upload folder or a shard on disk."""
+    names = {config.DEFAULT_COLLECTION}
+    for root in (config.UPLOAD_FOLDER, config.INDEX_DIR):
+        if os.path.isdir(root):
+            names.update(entry.name for entry in os.scandir(root)
+                         if entry.is_dir() and COLLECTION_NAME.match(entry.name))
+    return sorted(names)
+
+
+def version_dir(collection, version):
+    return os.path.join(shard_dir(collection), f"v{version:06d}")
+
+
+def staging_dir(collection):
+    return os.path.join(shard_dir(collection), STAGING_DIR)
+
+
+def list_versions(collection):
+    """Snapshot versions on disk for a collection, oldest first."""
+    if not os.path.isdir(shard_dir(collection)):
+        return []
+    return sorted(int(match.group(1)) for match in map(VERSION_NAME.match, os.listdir(shard_dir(collection)))
+                  if match)
+
+
+def current_version(collection):
+    """Version of the live snapshot of a collection, or None."""
+    try:
+        with open(os.path.join(shard_dir(collection), CURRENT_FILE), "r", encoding="utf-8") as f:
+            match = VERSION_NAME.match(f.read().strip())
+    except FileNotFoundError:
+        return None
+    return int(match.group(1)) if match else None
+
+
+def write_current(collection, version):
+    """Point `CURRENT` at a snapshot, atomically."""
+    path = os.path.join(shard_dir(collection), CURRENT_FILE)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(os.path.basename(version_dir(collection, version)))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def migrate_unversioned(source_dir, collection):
+    """Move an index saved directly in `source_dir` into the first snapshot of `collection`."""
+    if not os.path.exists(os.path.join(source_dir, "index.faiss")) or current_version(collection) is not None:
+        return
+    target = version_dir(collection, 1)
+    os.makedirs(target, exist_ok=True)
+    for entry in os.scandir(source_dir):
+        if entry.is_file():
+            os.replace(entry.path, os.path.join(target, entry.name))
+    write_current(collection, 1)
+    logger.info(f"Moved the existing FAISS index into the first snapshot of shard '{collection}'.")
+
+
+def migrate_legacy_index():
+    """Turn indexes saved before snapshots (in `INDEX_DIR` itself or in a shard directory) into snapshots."""
+    migrate_unversioned(config.INDEX_DIR, config.DEFAULT_COLLECTION)
+    for collection in list_collections():
+        migrate_unversioned(shard_dir(collection), collection)
+
+
+def copy_snapshot(source_dir, target_dir):
+    """Copy a snapshot; the manifest goes last, so a manifest in `target_dir` means the copy is complete."""
+    os.makedirs(target_dir)
+    for name in sorted(os.listdir(source_dir), key=lambda name: name == MANIFEST_FILE):
+        if name == DOCSTORE_FILE:
+            copy_sqlite_file(os.path.join(source_dir, name), os.path.join(target_dir, name))
+        elif not name.startswith(DOCSTORE_FILE):  # -wal and -shm files are folded in by the backup
+            shutil.copy2(os.path.join(source_dir, name), os.path.join(target_dir, name))
+
+
+def stage_snapshot(collection, embeddings):
+    """
+    Return a private copy of a collection's store to update, or None for a shard built from scratch.
+
+    A staging copy left by an interrupted update is reused as is: its manifest describes what
+    it holds, so the update resumes after its last checkpoint. A live snapshot without a
+    manifest (migrated from an older version) is not copied: like `load_shard`, the shard is
+    rebuilt, since its vectors cannot be matched to the files they came from.
+    """
+    staging = staging_dir(collection)
+    if os.path.exists(os.path.join(staging, MANIFEST_FILE)):
+        logger.info(f"Resuming the interrupted update of shard '{collection}'.")
+        return load_faiss_index(embeddings, staging)
+    shutil.rmtree(staging, ignore_errors=True)
+    version = current_version(collection)
+    if version is None:
+        return None
+    if not os.path.exists(os.path.join(version_dir(collection, version), MANIFEST_FILE)):
+        logger.warning(f"Snapshot {version} of shard '{collection}' has no ingestion manifest. Rebuilding the shard.")
+        return None
+    with log_task(f"Copying snapshot {version} of shard '{collection}'"):
+        copy_snapshot(version_dir(collection, version), staging)
+    return load_faiss_index(embeddings, staging)
+
+
+def publish_snapshot(collection, faiss_index):
+    """Rename the staging copy to the next version, point `CURRENT` at it and retire old snapshots."""
+    sqlite_docstore = isinstance(faiss_index.docstore, SQLiteDocstore)
+    if sqlite_docstore:
+        faiss_index.docstore.connection.close()
+    version = max(list_versions(collection) + [current_version(collection) or 0]) + 1
+    target = version_dir(collection, version)
+    os.rename(staging_dir(collection), target)
+    write_current(collection, version)
+    if sqlite_docstore:
+        faiss_index.docstore.connection.reopen(os.path.join(target, DOCSTORE_FILE))
+    faiss_index.snapshot_version = version
+    retire_snapshots(collection, version)
+    return version
+
+
+def retire_snapshots(collection, current):
+    """Delete the snapshots older than the last `INDEX_KEEP_VERSIONS`, and any left newer than `current`."""
+    keep = max(1, config.INDEX_KEEP_VERSIONS)
+    for version in list_versions(collection):
+        if version > current or version <= current - keep:
+            shutil.rmtree(version_dir(collection, version), ignore_errors=True)
+
+
+def load_shard(collection, embeddings):
+    """Load the live snapshot of a collection, or return None if there is none or it has no manifest (it is then rebuilt)."""
+    version = current_version(collection)
+    if version is None:
+        return None
+    index_dir = version_dir(collection, version)
+    with log_task(f"Loading FAISS shard '{collection}' (snapshot {version})"):
+        faiss_index = load_faiss_index(embeddings, index_dir, mmap=config.INDEX_MMAP)
+    if IndexManifest.load(index_dir) is None:
+        logger.warning(f"Shard '{collection}' has no ingestion manifest. Rebuilding it from uploaded documents.")
+        return None
+    faiss_index.snapshot_version = version
+    return faiss_index
+
+
+def load_shards(embeddings):
+    """Load every shard on disk as they are, without synchronizing them with the upload folders."""
+    migrate_legacy_index()
+    sharded_index = ShardedIndex(embeddings)
+    for collection in list_collections():
+        faiss_index = load_shard(collection, embeddings)
+        if faiss_index is not None:
+            sharded_index = sharded_index.with_shard(collection, faiss_index)
+    return sharded_index
+
+
+def sync_collection(sharded_index, collection, embeddings, file_paths=None, remove_missing=False, progress=None):
+    """
+    Bring one collection's shard in line with `file_paths` (default: its whole upload folder).
+
+    The live store is left untouched: changes are made on a staging copy of its snapshot,
+    published as a new snapshot. Returns the new ShardedIndex and the `sync_index` summary.
+    """
+    if file_paths is None:
+        file_paths = collection_files(collection)
+    # Hashed once, for the check below and for `sync_index`
+    content_hashes = {file_path: file_content_hash(file_path) for file_path in file_paths}
+    live_index = sharded_index.get(collection)
+    if live_index is not None and not os.path.exists(staging_dir(collection)):
+        # Nothing to copy when the live snapshot is already up to date
+        manifest = IndexManifest.load(version_dir(collection, live_index.snapshot_version))
+        to_index, to_remove, unchanged = manifest.plan(file_paths, remove_missing=remove_missing,
+                                                       content_hashes=content_hashes)
+        if not to_index and not to_remove:
+            return sharded_index, {"num_documents": 0, "num_segments": 0, "indexed_files": [],
+                                   "removed_files": [], "unchanged_files": unchanged}
+
+    faiss_index, summary = sync_index(
+        file_paths, embeddings, stage_snapshot(collection, embeddings), remove_missing=remove_missing,
+        progress=progress, index_dir=staging_dir(collection), content_hashes=content_hashes
+    )
+    if faiss_index is None:
+        # The shard is empty: searches still running on it keep reading its open files
+        shutil.rmtree(shard_dir(collection), ignore_errors=True)
+    elif os.path.exists(staging_dir(collection)):
+        version = publish_snapshot(collection, faiss_index)
+        logger.info(f"Published snapshot {version} of shard '{collection}'.")
+        if config.INDEX_MMAP:
+            # Serve the published snapshot from its memory-mapped file rather than the copy built in RAM
+            if isinstance(faiss_index.docstore, SQLiteDocstore):
+                faiss_index.docstore.connection.close()
+            faiss_index = load_shard(collection, embeddings)
+    return sharded_index.with_shard(collection, faiss_index), summary
+
+
+def drop_collection(sharded_index, collection):
+    """
+    Delete a collection's documents and shard without touching the other shards.
+
+    Returns the new ShardedIndex and the removed files.
+    """
+    removed_files = collection_files(collection)
+    if collection == config.DEFAULT_COLLECTION:
+        for file_path in removed_files:
+            os.remove(file_path)
+    else:
+        shutil.rmtree(upload_dir(collection), ignore_errors=True)
+    # Searches already running on the shard keep reading its open (now unlinked) files
+    shutil.rmtree(shard_dir(collection), ignore_errors=True)
+    logger.info(f"Dropped collection '{collection}' ({len(removed_files)} document(s)).")
+    return sharded_index.with_shard(collection, None), removed_files
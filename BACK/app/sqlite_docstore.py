@@ -0,0 +1,222 @@
+# app/sqlite_docstore.py
+
+"""
+Pickle-free, on-disk docstore for the FAISS vector store.
+
+Chunk texts and metadata live in a local SQLite file (`docstore.sqlite`) next to the
+FAISS index, together with the vector position -> chunk ID mapping. The database is
+opened lazily on first access and only the rows actually requested are read, so
+startup time and resident memory do not grow with the corpus.
+
+Convert an existing pickled index directory with:
+    python -m app.sqlite_docstore faiss_index
+"""
+
+import json
+import os
+import sqlite3
+import sys
+import threading
+from collections.abc import MutableMapping
+from langchain.schema import Document
+from langchain_community.docstore.base import AddableMixin, Docstore
+
+DOCSTORE_FILE = "docstore.sqlite"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS chunks (id TEXT PRIMARY KEY, page_content TEXT NOT NULL, metadata TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS positions (position INTEGER PRIMARY KEY, id TEXT NOT NULL);
+"""
+
+
+class SQLiteConnection:
+    """A lazily opened SQLite connection shared by the docstore and the ID map."""
+
+    def __init__(self, path):
+        self.path = path
+        self._connection = None
+        self.lock = threading.RLock()
+
+    def get(self):
+        with self.lock:
+            if self._connection is None:
+                self._connection = sqlite3.connect(self.path, check_same_thread=False)
+                self._connection.execute("PRAGMA journal_mode=WAL")
+                self._connection.executescript(SCHEMA)
+            return self._connection
+
+    def close(self):
+        with self.lock:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
+
+    def reopen(self, path):
+        """Close the connection and reopen the database at `path` (after its directory was renamed)."""
+        with self.lock:
+            self.close()
+            self.path = path
+            self.get()
+
+
+class SQLiteDocstore(Docstore, AddableMixin):
+    """LangChain docstore reading and writing chunks in SQLite."""
+
+    def __init__(self, connection):
+        self.connection = connection
+
+    def add(self, texts):
+        """Add Documents keyed by chunk ID; IDs must not already exist."""
+        rows = [(chunk_id, doc.page_content, json.dumps(doc.metadata)) for chunk_id, doc in texts.items()]
+        with self.connection.lock:
+            db = self.connection.get()
+            try:
+                with db:
+                    db.executemany("INSERT INTO chunks (id, page_content, metadata) VALUES (?, ?, ?)", rows)
+            except sqlite3.IntegrityError as e:
+                raise ValueError(f"Tried to add ids that already exist: {e}")
+
+    def delete(self, ids):
+        with self.connection.lock:
+            db = self.connection.get()
+            with db:
+                db.executemany("DELETE FROM chunks WHERE id = ?", [(chunk_id,) for chunk_id in ids])
+
+    def search(self, search):
+        """Return the Document stored under an ID, or a not-found message like InMemoryDocstore."""
+        with self.connection.lock:
+            row = self.connection.get().execute(
+                "SELECT page_content, metadata FROM chunks WHERE id = ?", (search,)
+            ).fetchone()
+        if row is None:
+            return f"ID {search} not found."
+        return Document(page_content=row[0], metadata=json.loads(row[1]))
+
+    def __len__(self):
+        with self.connection.lock:
+            return self.connection.get().execute("SELECT COUNT(*) FROM chunks").fetchone()[0]
+
+
+class SQLiteIdMap(MutableMapping):
+    """`index_to_docstore_id` mapping (vector position -> chunk ID) stored in SQLite."""
+
+    def __init__(self, connection):
+        self.connection = connection
+
+    def __getitem__(self, position):
+        with self.connection.lock:
+            row = self.connection.get().execute(
+                "SELECT id FROM positions WHERE position = ?", (int(position),)
+            ).fetchone()
+        if row is None:
+            raise KeyError(position)
+        return row[0]
+
+    def __setitem__(self, position, chunk_id):
+        self.update({position: chunk_id})
+
+    def __delitem__(self, position):
+        with self.connection.lock:
+            db = self.connection.get()
+            with db:
+                db.execute("DELETE FROM positions WHERE position = ?", (int(position),))
+
+    def __iter__(self):
+        with self.connection.lock:
+            rows = self.connection.get().execute("SELECT position FROM positions ORDER BY position").fetchall()
+        return iter(row[0] for row in rows)
+
+    def __len__(self):
+        with self.connection.lock:
+            return self.connection.get().execute("SELECT COUNT(*) FROM positions").fetchone()[0]
+
+    def items(self):
+        with self.connection.lock:
+            return self.connection.get().execute("SELECT position, id FROM positions ORDER BY position").fetchall()
+
+    def update(self, mapping=(), **kwargs):
+        """Insert many positions in one transaction."""
+        rows = [(int(position), chunk_id) for position, chunk_id in dict(mapping, **kwargs).items()]
+        with self.connection.lock:
+            db = self.connection.get()
+            with db:
+                db.executemany("INSERT OR REPLACE INTO positions (position, id) VALUES (?, ?)", rows)
+
+    def replace(self, mapping):
+        """Replace the whole mapping in one transaction (after vectors were removed)."""
+        with self.connection.lock:
+            db = self.connection.get()
+            with db:
+                db.execute("DELETE FROM positions")
+                db.executemany("INSERT INTO positions (position, id) VALUES (?, ?)",
+                               [(int(position), chunk_id) for position, chunk_id in mapping.items()])
+
+    def truncate(self, size):
+        """
+        Drop positions >= `size` and their chunks, returning how many were dropped.
+
+        Chunks are written to SQLite as they are added, while the FAISS file is only written
+        on save: after a crash, rows past the saved index's `ntotal` have no vector.
+        """
+        with self.connection.lock:
+            db = self.connection.get()
+            with db:
+                db.execute("DELETE FROM chunks WHERE id IN (SELECT id FROM positions WHERE position >= ?)", (size,))
+                return db.execute("DELETE FROM positions WHERE position >= ?", (size,)).rowcount
+
+
+def open_sqlite_store(index_dir, fresh=False):
+    """Return (docstore, index_to_docstore_id) backed by `docstore.sqlite` in `index_dir`."""
+    os.makedirs(index_dir, exist_ok=True)
+    path = os.path.join(index_dir, DOCSTORE_FILE)
+    if fresh:
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(path + suffix):
+                os.remove(path + suffix)
+    connection = SQLiteConnection(path)
+    return SQLiteDocstore(connection), SQLiteIdMap(connection)
+
+
+def copy_sqlite_file(source_path, target_path):
+    """Copy a SQLite database with the backup API, so pages still in its WAL are included."""
+    source = sqlite3.connect(source_path)
+    target = sqlite3.connect(target_path)
+    try:
+        source.backup(target)
+    finally:
+        source.close()
+        target.close()
+
+
+def convert_pickle_index(index_dir):
+    """Convert a `save_local` index directory (index.pkl) to the SQLite docstore format."""
+    import pickle
+    from app.vector_index import INDEX_PARAMS_FILE
+
+    pickle_path = os.path.join(index_dir, "index.pkl")
+    with open(pickle_path, "rb") as f:
+        docstore, index_to_docstore_id = pickle.load(f)
+
+    tmp_dir = os.path.join(index_dir, ".convert")
+    docstore_out, id_map_out = open_sqlite_store(tmp_dir, fresh=True)
+    docstore_out.add({chunk_id: docstore.search(chunk_id) for chunk_id in index_to_docstore_id.values()})
+    id_map_out.update(index_to_docstore_id)
+    docstore_out.connection.close()
+    os.replace(os.path.join(tmp_dir, DOCSTORE_FILE), os.path.join(index_dir, DOCSTORE_FILE))
+    os.rmdir(tmp_dir)
+
+    params_path = os.path.join(index_dir, INDEX_PARAMS_FILE)
+    params = {}
+    if os.path.exists(params_path):
+        with open(params_path, "r", encoding="utf-8") as f:
+            params = json.load(f)
+    params["docstore"] = "sqlite"
+    with open(params_path, "w", encoding="utf-8") as f:
+        json.dump(params, f)
+    os.remove(pickle_path)
+    return len(index_to_docstore_id)
+
+
+if __name__ == "__main__":
+    target = sys.argv[1] if len(sys.argv) > 1 else "faiss_index"
+    print(f"Converted {convert_pickle_index(target)} chunks in {target} to {DOCSTORE_FILE}.")
@@ -0,0 +1,72 @@
+# app/utils/concurrency.py
+"""Bounded concurrency primitives used to keep blocking work off the event loop."""
+
+import asyncio
+import contextvars
+import functools
+from concurrent.futures import ThreadPoolExecutor
+
+
+class ServiceOverloaded(Exception):
+    """Raised when a bounded stage has no room left in its waiting queue."""
+
+
+class ConcurrencyLimiter:
+    """
+    Async context manager allowing `max_concurrency` holders at once and at most
+    `max_queue` waiters; further callers are rejected with `ServiceOverloaded`.
+    """
+
+    def __init__(self, name, max_concurrency, max_queue):
+        self.name = name
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.in_flight = 0
+        self.waiting = 0
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def acquire(self):
+        """Wait for a slot, or raise `ServiceOverloaded` if too many callers are already waiting."""
+        if self._semaphore.locked() and self.waiting >= self.max_queue:
+            raise ServiceOverloaded(f"{self.name} queue is full ({self.waiting} waiting).")
+        self.waiting += 1
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self.waiting -= 1
+        self.in_flight += 1
+
+    def release(self):
+        """Give a slot back."""
+        self.in_flight -= 1
+        self._semaphore.release()
+
+    async def __aenter__(self):
+        await self.acquire()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        self.release()
+
+    def stats(self):
+        """Return current load of the limiter."""
+        return {"in_flight": self.in_flight, "waiting": self.waiting,
+                "max_concurrency": self.max_concurrency, "max_queue": self.max_queue}
+
+
+class BoundedExecutor:
+    """Thread pool whose admission is guarded by a `ConcurrencyLimiter`."""
+
+    def __init__(self, name, max_workers, max_queue):
+        self.limiter = ConcurrencyLimiter(name, max_workers, max_queue)
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=name)
+
+    async def run(self, func, *args, **kwargs):
+        """Run a blocking function in the pool without blocking the event loop, in the caller's context (request ID)."""
+        async with self.limiter:
+            loop = asyncio.get_running_loop()
+            context = contextvars.copy_context()
+            return await loop.run_in_executor(self._pool, functools.partial(context.run, func, *args, **kwargs))
+
+    def shutdown(self):
+        self._pool.shutdown(wait=False)
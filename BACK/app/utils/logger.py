@@ -1,23 +1,107 @@
 # app/utils/logger.py
+"""
+Application logger.
+
+Records are put on a bounded in-memory queue by the calling thread and written by a
+background listener thread, so logging never does I/O on the request path (records are
+dropped, and counted, if the queue is full). Output is either:
+
+- `console`: colored lines with a spinner for long-running tasks, for interactive runs;
+- `json`: one JSON object per line with the request ID and any structured fields passed
+  through `extra` (e.g. stage timings), for production.
+
+`RAG_LOG_FORMAT=auto` picks `console` when stdout is a terminal and `json` otherwise.
+"""
+
+import atexit
+import contextvars
+import json
 import logging
+import queue
 import sys
 import threading
 import time
+import uuid
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
 from colorama import Fore, Style, init as colorama_init
 from contextlib import contextmanager
+from app import config
 
 # Initialize colorama for colored output
 colorama_init()
 
+# ID of the HTTP request being handled, attached to every record logged while handling it
+request_id_var = contextvars.ContextVar("request_id", default=None)
+
+# Attributes every LogRecord has; anything else was passed through `extra`
+STANDARD_ATTRIBUTES = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime", "end"}
+
+
+def log_format():
+    if config.LOG_FORMAT == "auto":
+        return "console" if sys.stdout.isatty() else "json"
+    return config.LOG_FORMAT
+
+
 def create_custom_logger():
-    custom_logger = logging.Logger("fastapi_app", level=logging.INFO)
+    custom_logger = logging.Logger("fastapi_app", level=config.LOG_LEVEL)
 
-    handler = SpinnerLogHandler()
-    handler.setFormatter(logging.Formatter("%(message)s"))
+    if log_format() == "json":
+        output_handler = logging.StreamHandler(sys.stdout)
+        output_handler.setFormatter(JsonFormatter())
+    else:
+        output_handler = SpinnerLogHandler()
+        output_handler.setFormatter(logging.Formatter("%(message)s"))
+
+    handler = NonBlockingQueueHandler(queue.Queue(maxsize=config.LOG_QUEUE_SIZE))
+    handler.addFilter(RequestIdFilter())
     custom_logger.addHandler(handler)
 
+    listener = QueueListener(handler.queue, output_handler, respect_handler_level=True)
+    listener.start()
+    atexit.register(listener.stop)  # Flush queued records on exit
     return custom_logger
 
+
+class RequestIdFilter(logging.Filter):
+    """Stamp records with the current request ID before they leave the calling thread."""
+
+    def filter(self, record):
+        record.request_id = request_id_var.get()
+        return True
+
+
+class NonBlockingQueueHandler(QueueHandler):
+    """Queue handler that drops records instead of blocking or writing errors when the queue is full."""
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class JsonFormatter(logging.Formatter):
+    """Format records as single-line JSON objects."""
+
+    def format(self, record):
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "level": record.levelname.lower(),
+            "message": record.getMessage(),
+            "request_id": getattr(record, "request_id", None),
+            "thread": record.threadName,
+        }
+        entry.update({key: value for key, value in vars(record).items()
+                      if key not in STANDARD_ATTRIBUTES and key not in entry})
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
 class SpinnerLogHandler(logging.StreamHandler):
     """Custom log handler with spinner animation and emoji on completion."""
     
@@ -36,16 +120,19 @@ class SpinnerLogHandler(logging.StreamHandler):
         level_name = f"{log_color}{record.levelname.upper()}{Style.RESET_ALL}:"
         formatted_level = f"{level_name:<18}"
 
+        # Only one spinner at a time: stop the current one before printing anything else
+        self._stop_spinner.set()
+        if self._spinner_thread:
+            self._spinner_thread.join()
+            self._spinner_thread = None
+
         # Display spinner when task starts
         if message.endswith("..."):
             full_message = f"{formatted_level} {message}"
             self._stop_spinner.clear()
-            self._spinner_thread = threading.Thread(target=self._animate_spinner, args=(full_message,))
+            self._spinner_thread = threading.Thread(target=self._animate_spinner, args=(full_message,), daemon=True)
             self._spinner_thread.start()
         else:
-            self._stop_spinner.set()
-            if self._spinner_thread:
-                self._spinner_thread.join()
             sys.stdout.write(f"\r{formatted_level} {message} ✅\n")
             sys.stdout.flush()
 
@@ -72,9 +159,35 @@ logger = create_custom_logger()
 @contextmanager
 def log_task(message):
     logger.info(f"{message}...", extra={"end": ""})
+    start_time = time.perf_counter()
     try:
         yield
-        logger.info(message)
+        logger.info(message, extra={"duration": round(time.perf_counter() - start_time, 4)})
     except Exception:
-        logger.error(message)
+        logger.error(message, extra={"duration": round(time.perf_counter() - start_time, 4)})
         raise
+
+
+class RequestIdMiddleware:
+    """ASGI middleware giving each HTTP request an ID (`X-Request-ID`, generated if absent) for the logs."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        headers = dict(scope.get("headers") or [])
+        request_id = headers.get(b"x-request-id", b"").decode("latin-1") or uuid.uuid4().hex[:16]
+        token = request_id_var.set(request_id)
+
+        async def send_with_request_id(message):
+            if message["type"] == "http.response.start":
+                message["headers"] = list(message.get("headers", [])) + [(b"x-request-id", request_id.encode("latin-1"))]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_request_id)
+        finally:
+            request_id_var.reset(token)
@@ -0,0 +1,71 @@
+# app/utils/progress.py
+"""Thread-safe progress counters for ingestion runs."""
+
+import threading
+import time
+
+
+class IngestionProgress:
+    """
+    Track the current stage and per-stage counters of an ingestion run.
+
+    Counters (e.g. `pages_extracted`, `chunks_split`, `vectors_embedded`) are updated from
+    the ingestion thread and read from request handlers through `snapshot()`.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.stage = None
+        self.counters = {}
+        self.totals = {}
+        self._stage_started = {}
+        self._stage_durations = {}
+
+    def set_stage(self, stage):
+        """
+        Enter a new stage, closing the timing of the previous one.
+
+        Stages may be entered several times (pipelined ingestion alternates between them);
+        their durations add up.
+        """
+        now = time.time()
+        with self._lock:
+            if self.stage is not None:
+                self._stage_durations[self.stage] = (
+                    self._stage_durations.get(self.stage, 0.0) + now - self._stage_started[self.stage]
+                )
+            self.stage = stage
+            self._stage_started[stage] = now
+
+    def set_total(self, counter, total):
+        """Declare the expected final value of a counter."""
+        with self._lock:
+            self.totals[counter] = total
+
+    def add(self, counter, amount=1):
+        """Increase a counter."""
+        with self._lock:
+            self.counters[counter] = self.counters.get(counter, 0) + amount
+
+    def finish(self):
+        """Close the timing of the last stage."""
+        self.set_stage(None)
+
+    def snapshot(self):
+        """Return counters, totals, stage durations and throughput (items/second per counter)."""
+        now = time.time()
+        with self._lock:
+            durations = dict(self._stage_durations)
+            if self.stage is not None:
+                durations[self.stage] = durations.get(self.stage, 0.0) + now - self._stage_started[self.stage]
+            elapsed = sum(durations.values())
+            return {
+                "stage": self.stage,
+                "counters": dict(self.counters),
+                "totals": dict(self.totals),
+                "stage_durations": durations,
+                "throughput": {
+                    counter: value / elapsed if elapsed > 0 else None
+                    for counter, value in self.counters.items()
+                },
+            }
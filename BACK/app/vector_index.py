@@ -0,0 +1,232 @@
+# app/vector_index.py
+
+"""
+Construction, persistence and tuning of the FAISS index behind the vector store.
+
+Supported index types (`RAG_INDEX_TYPE`):
+- "flat":  exact search (`IndexFlatL2`), the historical default.
+- "ivf":   inverted lists over exact vectors (`IVF{nlist},Flat`), tuned with `nprobe`.
+- "hnsw":  graph index (`HNSW{M}`), tuned with `efSearch`.
+- "ivfpq": inverted lists over product-quantized vectors (`IVF{nlist},PQ{m}`).
+- "ivfsq": inverted lists over 8-bit scalar-quantized vectors (`IVF{nlist},SQ8`).
+
+Trained types are trained on a random sample of the first vectors indexed. The chosen
+factory string and the docstore format (`sqlite` or `pickle`) are saved in
+`index_params.json` next to the index, the metadata filter columns (see
+`app/metadata_filters.py`) in `filters.npz`.
+"""
+
+import json
+import math
+import os
+import faiss
+import numpy as np
+from langchain_community.docstore.in_memory import InMemoryDocstore
+from langchain_community.vectorstores import FAISS
+from app import config
+from app.metadata_filters import FilterColumns
+from app.sqlite_docstore import SQLiteDocstore, SQLiteIdMap, open_sqlite_store
+from app.utils.logger import logger
+
+INDEX_PARAMS_FILE = "index_params.json"
+
+# Fewer vectors than this and a trained index is not worth it (or cannot be trained)
+MIN_VECTORS_TO_TRAIN = {"ivf": 1_000, "hnsw": 0, "ivfpq": 10_000, "ivfsq": 1_000}
+
+
+def choose_nlist(num_vectors):
+    """Number of inverted lists: the configured value, or ~4*sqrt(n) with >= 39 points per list."""
+    if config.INDEX_NLIST:
+        return config.INDEX_NLIST
+    return max(1, min(int(4 * math.sqrt(num_vectors)), num_vectors // 39))
+
+
+def factory_string(index_type, num_vectors):
+    """FAISS index factory description for an index type and a training set size."""
+    if index_type == "flat" or num_vectors < MIN_VECTORS_TO_TRAIN.get(index_type, 0):
+        return "Flat"
+    if index_type == "ivf":
+        return f"IVF{choose_nlist(num_vectors)},Flat"
+    if index_type == "hnsw":
+        return f"HNSW{config.INDEX_HNSW_M}"
+    if index_type == "ivfpq":
+        return f"IVF{choose_nlist(num_vectors)},PQ{config.INDEX_PQ_M}"
+    if index_type == "ivfsq":
+        return f"IVF{choose_nlist(num_vectors)},SQ8"
+    raise ValueError(f"Unknown index type: {index_type}")
+
+
+def needs_training(index_type=None):
+    """Whether an index type is trained, so its first vectors should be buffered to train it well."""
+    return MIN_VECTORS_TO_TRAIN.get(index_type or config.INDEX_TYPE, 0) > 0
+
+
+def apply_search_params(index, nprobe=None, ef_search=None):
+    """Set query-time knobs (`nprobe` for IVF, `efSearch` for HNSW) on a FAISS index."""
+    nprobe = nprobe or config.SEARCH_NPROBE
+    ef_search = ef_search or config.SEARCH_EF
+    ivf = faiss.try_extract_index_ivf(index)
+    if ivf is not None:
+        ivf.nprobe = min(nprobe, ivf.nlist)
+    hnsw_index = faiss.downcast_index(index)
+    if isinstance(hnsw_index, faiss.IndexHNSW):
+        hnsw_index.hnsw.efSearch = ef_search
+
+
+def build_faiss_index(vectors, index_type=None):
+    """Create an empty FAISS index for `vectors`' dimension, trained on a sample of them if needed."""
+    index_type = index_type or config.INDEX_TYPE
+    vectors = np.asarray(vectors, dtype=np.float32)
+    spec = factory_string(index_type, len(vectors))
+    if spec == "Flat" and index_type != "flat":
+        logger.warning(f"Only {len(vectors)} vectors: using an exact index instead of '{index_type}'.")
+
+    index = faiss.index_factory(vectors.shape[1], spec, faiss.METRIC_L2)
+    if isinstance(faiss.downcast_index(index), faiss.IndexHNSW):
+        faiss.downcast_index(index).hnsw.efConstruction = config.INDEX_EF_CONSTRUCTION
+    if not index.is_trained:
+        sample_size = min(len(vectors), config.INDEX_TRAIN_SAMPLE)
+        sample = vectors[np.random.default_rng(0).choice(len(vectors), sample_size, replace=False)]
+        index.train(sample)
+    apply_search_params(index)
+    return index, spec
+
+
+def create_vector_store(text_embeddings, embeddings, metadatas, ids, index_type=None, index_dir=None):
+    """
+    Build a LangChain FAISS store over a (possibly approximate) FAISS index.
+
+    With the SQLite docstore format, chunks are written to a fresh `docstore.sqlite` in
+    `index_dir`; otherwise they are kept in memory and pickled on save.
+    """
+    index, spec = build_faiss_index([vector for _, vector in text_embeddings], index_type)
+    if config.DOCSTORE_FORMAT == "sqlite":
+        docstore, index_to_docstore_id = open_sqlite_store(index_dir or config.INDEX_DIR, fresh=True)
+    else:
+        docstore, index_to_docstore_id = InMemoryDocstore(), {}
+    vector_store = FAISS(
+        embedding_function=embeddings,
+        index=index,
+        docstore=docstore,
+        index_to_docstore_id=index_to_docstore_id,
+    )
+    vector_store.add_embeddings(text_embeddings, metadatas=metadatas, ids=ids)
+    vector_store.index_spec = spec
+    vector_store.filter_columns = FilterColumns()
+    vector_store.filter_columns.append(metadatas)
+    return vector_store
+
+
+def add_to_vector_store(vector_store, text_embeddings, metadatas, ids):
+    """Add embedded chunks to a store, keeping its metadata filter columns aligned."""
+    vector_store.add_embeddings(text_embeddings, metadatas=metadatas, ids=ids)
+    columns = getattr(vector_store, "filter_columns", None)
+    if columns is not None:
+        columns.append(metadatas)
+
+
+def index_spec(vector_store):
+    """Factory string of a store's index, falling back to "Flat" for legacy indexes."""
+    return getattr(vector_store, "index_spec", None) or "Flat"
+
+
+def delete_vectors(vector_store, ids):
+    """
+    Delete vectors and their chunks by docstore ID, keeping positions contiguous.
+
+    Exact indexes remove the rows in place. IVF lists keep the original IDs of the
+    remaining vectors and HNSW graphs cannot remove at all, so approximate indexes are
+    refilled from the reconstructed remaining vectors (the trained quantizers are kept).
+    """
+    removed = set(ids)
+    if not removed:
+        return
+    id_map = vector_store.index_to_docstore_id
+    entries = sorted(id_map.items())
+    removed_positions = [position for position, chunk_id in entries if chunk_id in removed]
+    kept = [(position, chunk_id) for position, chunk_id in entries if chunk_id not in removed]
+    if not removed_positions:
+        return
+
+    index = vector_store.index
+    if index_spec(vector_store) == "Flat":
+        index.remove_ids(np.array(removed_positions, dtype=np.int64))
+    else:
+        ivf = faiss.try_extract_index_ivf(index)
+        if ivf is not None:
+            ivf.make_direct_map()
+        vectors = np.vstack([index.reconstruct(int(position)) for position, _ in kept]) if kept else None
+        index.reset()
+        if ivf is not None:
+            ivf.set_direct_map_type(faiss.DirectMap.NoMap)
+        if vectors is not None:
+            index.add(vectors)
+
+    vector_store.docstore.delete([chunk_id for _, chunk_id in entries if chunk_id in removed])
+    new_map = {new_position: chunk_id for new_position, (_, chunk_id) in enumerate(kept)}
+    columns = getattr(vector_store, "filter_columns", None)
+    if columns is not None:
+        columns.keep([position for position, _ in kept])
+    if isinstance(id_map, SQLiteIdMap):
+        id_map.replace(new_map)
+    else:
+        vector_store.index_to_docstore_id = new_map
+
+
+def read_index_params(index_dir):
+    """Return the build description saved next to an index (empty for legacy indexes)."""
+    path = os.path.join(index_dir, INDEX_PARAMS_FILE)
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_vector_store(vector_store, index_dir):
+    """
+    Save the FAISS index and its build description.
+
+    Stores backed by SQLite only need the FAISS file written (chunks are already on disk);
+    in-memory docstores go through LangChain's pickle-based `save_local`.
+    """
+    os.makedirs(index_dir, exist_ok=True)
+    docstore_format = "sqlite" if isinstance(vector_store.docstore, SQLiteDocstore) else "pickle"
+    if docstore_format == "sqlite":
+        faiss.write_index(vector_store.index, os.path.join(index_dir, "index.faiss"))
+    else:
+        vector_store.save_local(index_dir)
+    columns = getattr(vector_store, "filter_columns", None)
+    if columns is not None:
+        columns.save(index_dir)
+    with open(os.path.join(index_dir, INDEX_PARAMS_FILE), "w", encoding="utf-8") as f:
+        json.dump({"factory": index_spec(vector_store), "docstore": docstore_format}, f)
+
+
+def load_vector_store(index_dir, embeddings, mmap=False):
+    """
+    Load a saved store, opening SQLite docstores lazily, and apply query-time parameters.
+
+    With `mmap`, the FAISS file of a SQLite-backed store is memory-mapped read-only rather
+    than read into RAM: IVF inverted lists always, flat codes when FAISS supports it. The
+    store must then never be modified.
+    """
+    params = read_index_params(index_dir)
+    if params.get("docstore") == "sqlite":
+        docstore, index_to_docstore_id = open_sqlite_store(index_dir)
+        flags = faiss.IO_FLAG_MMAP | getattr(faiss, "IO_FLAG_MMAP_IFC", 0) | faiss.IO_FLAG_READ_ONLY if mmap else 0
+        index = faiss.read_index(os.path.join(index_dir, "index.faiss"), flags)
+        dropped = index_to_docstore_id.truncate(index.ntotal)
+        if dropped:
+            logger.warning(f"Dropped {dropped} chunk(s) added after the last index save.")
+        vector_store = FAISS(
+            embedding_function=embeddings,
+            index=index,
+            docstore=docstore,
+            index_to_docstore_id=index_to_docstore_id,
+        )
+    else:
+        vector_store = FAISS.load_local(index_dir, embeddings, allow_dangerous_deserialization=True)
+    vector_store.index_spec = params.get("factory", "Flat")
+    vector_store.filter_columns = FilterColumns.load(index_dir)
+    apply_search_params(vector_store.index)
+    return vector_store
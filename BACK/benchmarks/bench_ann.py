@@ -0,0 +1,89 @@
+# benchmarks/bench_ann.py
+
+"""
+Recall/latency/memory benchmark of the supported FAISS index types against the exact baseline.
+
+Vectors come from the live snapshot of the default collection's shard or, with `--synthetic N`, from N random
+unit vectors. Queries are perturbed copies of indexed vectors. Run from the BACK directory:
+    python -m benchmarks.bench_ann --synthetic 200000 --nprobe 8 16 32 --ef 32 64 128
+"""
+
+import argparse
+import time
+import faiss
+import numpy as np
+from app import config
+from app.vector_index import apply_search_params, build_faiss_index
+
+
+def load_vectors(synthetic, dim):
+    """Vectors of the current index, or random unit vectors."""
+    if synthetic:
+        vectors = np.random.default_rng(0).standard_normal((synthetic, dim)).astype(np.float32)
+        faiss.normalize_L2(vectors)
+        return vectors
+    from app.documentary_researcher import initialize_embeddings
+    from app.sharded_index import load_shard
+    index = load_shard(config.DEFAULT_COLLECTION, initialize_embeddings()).index
+    return index.reconstruct_n(0, index.ntotal)
+
+
+def recall_at_k(found, truth, k):
+    """Mean fraction of the true top-k found in the approximate top-k."""
+    return float(np.mean([len(set(f[:k]) & set(t[:k])) / k for f, t in zip(found, truth)]))
+
+
+def measure(index, queries, k):
+    """Return (positions, mean latency per query in ms) for one-at-a-time searches."""
+    positions = []
+    start_time = time.perf_counter()
+    for query in queries:
+        positions.append(index.search(query[None, :], k)[1][0])
+    return np.array(positions), (time.perf_counter() - start_time) / len(queries) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--synthetic", type=int, default=0, help="Use N random vectors instead of the index")
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--types", nargs="+", default=["ivf", "hnsw", "ivfpq", "ivfsq"])
+    parser.add_argument("--nprobe", nargs="+", type=int, default=[8, 16, 32])
+    parser.add_argument("--ef", nargs="+", type=int, default=[32, 64, 128])
+    args = parser.parse_args()
+
+    vectors = load_vectors(args.synthetic, args.dim)
+    rng = np.random.default_rng(1)
+    queries = vectors[rng.choice(len(vectors), min(args.queries, len(vectors)), replace=False)]
+    queries = queries + rng.normal(0, 0.01, queries.shape).astype(np.float32)
+    print(f"{len(vectors)} vectors of dimension {vectors.shape[1]}, {len(queries)} queries")
+
+    flat, _ = build_faiss_index(vectors, "flat")
+    flat.add(vectors)
+    truth, flat_latency = measure(flat, queries, args.k)
+    print(f"{'config':<28} {'build (s)':>9} {'recall@' + str(args.k):>9} {'ms/query':>9} {'MB':>8}")
+    print(f"{'Flat':<28} {0:>9.1f} {1:>9.3f} {flat_latency:>9.3f} {faiss.serialize_index(flat).nbytes / 1e6:>8.1f}")
+
+    for index_type in args.types:
+        start_time = time.perf_counter()
+        index, spec = build_faiss_index(vectors, index_type)
+        index.add(vectors)
+        build_duration = time.perf_counter() - start_time
+        memory = faiss.serialize_index(index).nbytes / 1e6
+        knobs = [("efSearch", ef, dict(ef_search=ef)) for ef in args.ef] if index_type == "hnsw" else \
+            [("nprobe", nprobe, dict(nprobe=nprobe)) for nprobe in args.nprobe]
+        if spec == "Flat":
+            knobs = [("-", "-", {})]
+        for name, value, params in knobs:
+            apply_search_params(index, **params)
+            found, latency = measure(index, queries, args.k)
+            label = f"{spec} {name}={value}"
+            print(f"{label:<28} {build_duration:>9.1f} {recall_at_k(found, truth, args.k):>9.3f} "
+                  f"{latency:>9.3f} {memory:>8.1f}")
+
+    print(f"(defaults: RAG_SEARCH_NPROBE={config.SEARCH_NPROBE}, RAG_SEARCH_EF={config.SEARCH_EF})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+# benchmarks/bench_ask_load.py
+
+"""
+Load test for `/ask`: fire concurrent questions and report throughput per concurrency level.
+
+Start the mock LLM and the API first (see `benchmarks/mock_llm.py`), then run
+(from the BACK directory):
+    python -m benchmarks.bench_ask_load --url http://localhost:5000 --concurrency 1 4 16 --requests 64
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+import httpx
+
+QUESTIONS = [
+    "Quel est le chiffre d'affaires du groupe ?",
+    "Quels sont les principaux risques identifiés ?",
+    "Quelle est la stratégie pour les véhicules électriques ?",
+    "Combien de salariés compte l'entreprise ?",
+]
+
+
+async def ask(client, url, question, document_search, stream=False):
+    """Send one question and return (status code, latency, time to first token)."""
+    payload = {"question": question, "requiresDocumentSearch": document_search, "history": []}
+    start_time = time.perf_counter()
+    if not stream:
+        response = await client.post(f"{url}/ask", json=payload)
+        return response.status_code, time.perf_counter() - start_time, None
+
+    first_token = None
+    async with client.stream("POST", f"{url}/ask/stream", json=payload) as response:
+        async for line in response.aiter_lines():
+            if first_token is None and '"type": "token"' in line:
+                first_token = time.perf_counter() - start_time
+    return response.status_code, time.perf_counter() - start_time, first_token
+
+
+async def run_level(url, concurrency, num_requests, document_search, stream):
+    """Run `num_requests` questions with at most `concurrency` in flight and return the level's stats."""
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def bounded(client, i):
+        async with semaphore:
+            return await ask(client, url, QUESTIONS[i % len(QUESTIONS)], document_search, stream)
+
+    async with httpx.AsyncClient(timeout=None) as client:
+        start_time = time.perf_counter()
+        results = await asyncio.gather(*(bounded(client, i) for i in range(num_requests)))
+        duration = time.perf_counter() - start_time
+
+    latencies = [latency for status, latency, _ in results if status == 200]
+    first_tokens = [ttft for status, _, ttft in results if status == 200 and ttft is not None]
+    rejected = sum(1 for status, _, _ in results if status == 503)
+    p50 = statistics.median(latencies) if latencies else float("nan")
+    ttft_p50 = statistics.median(first_tokens) if first_tokens else float("nan")
+    print(f"{concurrency:>11} {len(latencies) / duration:>8.2f} {p50:>8.2f} {ttft_p50:>10.2f} {rejected:>8}")
+    return {
+        "concurrency": concurrency,
+        "requests": num_requests,
+        "succeeded": len(latencies),
+        "rejected": rejected,
+        "requests_per_second": len(latencies) / duration,
+        "latency_p50": statistics.median(latencies) if latencies else None,
+        "latency_p95": percentile(latencies, 95),
+        "time_to_first_token_p50": statistics.median(first_tokens) if first_tokens else None,
+    }
+
+
+def percentile(values, q):
+    """Nearest-rank percentile of `values`, or None if empty."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, round(q / 100 * len(ordered)) - 1))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://localhost:5000")
+    parser.add_argument("--concurrency", nargs="+", type=int, default=[1, 4, 16])
+    parser.add_argument("--requests", type=int, default=64)
+    parser.add_argument("--no-document-search", action="store_true")
+    parser.add_argument("--stream", action="store_true", help="Use /ask/stream and report time to first token")
+    args = parser.parse_args()
+
+    print(f"{'concurrency':>11} {'req/s':>8} {'p50 (s)':>8} {'ttft (s)':>10} {'503s':>8}")
+    for concurrency in args.concurrency:
+        asyncio.run(run_level(args.url, concurrency, args.requests, not args.no_document_search, args.stream))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+# benchmarks/bench_docstore.py
+
+"""
+Measure index load time, resident memory and first-query latency of a saved index.
+
+Each load runs in a fresh subprocess so memory figures are not polluted by earlier runs.
+Compare a pickled and a converted copy of the same shard snapshot (from the BACK directory):
+    cp -r faiss_index/default/v000001 /tmp/index_pickle && cp -r faiss_index/default/v000001 /tmp/index_sqlite
+    python -m app.sqlite_docstore /tmp/index_sqlite
+    python -m benchmarks.bench_docstore /tmp/index_pickle /tmp/index_sqlite
+"""
+
+import argparse
+import json
+import subprocess
+import sys
+
+PROBE = """
+import json, resource, sys, time
+from app.documentary_researcher import initialize_embeddings, search_sharded
+from app.sharded_index import ShardedIndex
+from app.vector_index import load_vector_store
+embeddings = initialize_embeddings()
+before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+start = time.perf_counter()
+store = load_vector_store(sys.argv[1], embeddings)
+load = time.perf_counter() - start
+after_load = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+start = time.perf_counter()
+search_sharded(["Quel est le chiffre d'affaires ?"], ShardedIndex(embeddings, {"default": store}))
+query = time.perf_counter() - start
+print(json.dumps({"vectors": store.index.ntotal, "load_s": load, "query_s": query,
+                  "rss_delta_mb": (after_load - before) / 1024}))
+"""
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("index_dirs", nargs="+", help="Saved index directories to compare")
+    args = parser.parse_args()
+
+    print(f"{'index':<30} {'vectors':>9} {'load (s)':>9} {'+RSS (MB)':>10} {'1st query (s)':>14}")
+    for index_dir in args.index_dirs:
+        output = subprocess.run([sys.executable, "-c", PROBE, index_dir], capture_output=True, text=True, check=True)
+        result = json.loads(output.stdout.strip().splitlines()[-1])
+        print(f"{index_dir:<30} {result['vectors']:>9} {result['load_s']:>9.2f} "
+              f"{result['rss_delta_mb']:>10.1f} {result['query_s']:>14.3f}")
+
+
+if __name__ == "__main__":
+    main()
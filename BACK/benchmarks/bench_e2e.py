@@ -0,0 +1,243 @@
+# benchmarks/bench_e2e.py
+
+"""
+End-to-end benchmark: synthetic French corpus -> ingestion -> index load -> `/ask` under load.
+
+Runs offline on a CPU-only machine (the embedding and spaCy models must already be
+installed/cached). The LLM is replaced by `benchmarks/mock_llm.py` with a fixed latency,
+so the numbers measure this service rather than the model. Results are written as JSON;
+two result files can be compared with `--compare`.
+
+Usage (from the BACK directory):
+    python -m benchmarks.bench_e2e --documents 4 --pages 25 --output results.json
+    python -m benchmarks.bench_e2e --compare baseline.json results.json
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timezone
+from http.server import ThreadingHTTPServer
+from benchmarks.synthetic_pdf import generate_corpus
+
+BACK_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def configure_environment(work_dir, embedding_cache):
+    """Point the app at `work_dir` and force offline, CPU-only execution. Must run before importing `app`."""
+    environment = {
+        "RAG_UPLOAD_FOLDER": os.path.join(work_dir, "uploads"),
+        "RAG_INDEX_DIR": os.path.join(work_dir, "faiss_index"),
+        "RAG_EMBEDDING_CACHE_DIR": os.path.join(work_dir, "embedding_cache"),
+        "RAG_EXTRACTION_CACHE_DIR": os.path.join(work_dir, "extraction_cache"),
+        "RAG_EMBEDDING_CACHE_ENABLED": "1" if embedding_cache else "0",
+        "HF_HUB_OFFLINE": "1",
+        "TRANSFORMERS_OFFLINE": "1",
+        "CUDA_VISIBLE_DEVICES": "",
+    }
+    os.environ.update(environment)
+    os.environ.pop("RAG_LLM_BACKENDS", None)
+    return environment
+
+
+def environment_info():
+    """Machine, interpreter, revision and effective settings, to tell runs apart."""
+    from app import config
+
+    try:
+        revision = subprocess.run(["git", "rev-parse", "HEAD"], cwd=BACK_DIR, capture_output=True,
+                                  text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        revision = None
+    settings = {name: value for name, value in vars(config).items()
+                if name.isupper() and isinstance(value, (str, int, float, bool, type(None)))}
+    return {
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "git_revision": revision,
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "config": settings,
+    }
+
+
+def bench_ingestion(file_paths):
+    """Time model loading, each ingestion stage and loading the saved index."""
+    from app import config
+    from app.documentary_researcher import initialize_embeddings
+    from app.sharded_index import ShardedIndex, load_shard, sync_collection
+    from app.sqlite_docstore import SQLiteDocstore
+    from app.utils.progress import IngestionProgress
+
+    start_time = time.perf_counter()
+    embeddings = initialize_embeddings()
+    embeddings_load = time.perf_counter() - start_time
+
+    progress = IngestionProgress()
+    start_time = time.perf_counter()
+    sharded_index, summary = sync_collection(ShardedIndex(embeddings), config.DEFAULT_COLLECTION, embeddings,
+                                             file_paths, progress=progress)
+    ingestion_total = time.perf_counter() - start_time
+    faiss_index = sharded_index.get(config.DEFAULT_COLLECTION)
+    snapshot = progress.snapshot()
+    if isinstance(faiss_index.docstore, SQLiteDocstore):
+        faiss_index.docstore.connection.close()
+
+    start_time = time.perf_counter()
+    faiss_index = load_shard(config.DEFAULT_COLLECTION, embeddings)
+    index_load = time.perf_counter() - start_time
+
+    results = {
+        "embeddings_load_seconds": embeddings_load,
+        "total_seconds": ingestion_total,
+        "stage_seconds": snapshot["stage_durations"],
+        "counters": snapshot["counters"],
+        "documents": summary["num_documents"],
+        "segments": summary["num_segments"],
+        "vectors": faiss_index.index.ntotal,
+        "index_load_seconds": index_load,
+    }
+    print(f"ingestion: {ingestion_total:.2f}s "
+          + " ".join(f"{stage}={duration:.2f}s" for stage, duration in snapshot["stage_durations"].items()))
+    print(f"index load: {index_load:.2f}s ({results['vectors']} vectors)")
+    return results
+
+
+def start_mock_llm(port, latency):
+    """Serve the stub Ollama API from a daemon thread."""
+    from benchmarks.mock_llm import ANSWER, make_handler
+
+    server = ThreadingHTTPServer(("127.0.0.1", port), make_handler(latency, ANSWER))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def wait_until_ready(url, timeout):
+    """Poll `/status` until the service leaves the starting state; return the seconds it took."""
+    import httpx
+
+    start_time = time.perf_counter()
+    while time.perf_counter() - start_time < timeout:
+        try:
+            state = httpx.get(f"{url}/status", timeout=1).json()["state"]
+            if state == "ready":
+                return time.perf_counter() - start_time
+            if state == "failed":
+                raise RuntimeError("Service failed to start.")
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    raise TimeoutError(f"Service not ready after {timeout}s.")
+
+
+def bench_ask(args):
+    """Start the API against the stub LLM and run `/ask` at each concurrency level."""
+    from benchmarks.bench_ask_load import run_level
+
+    mock_llm = start_mock_llm(args.llm_port, args.llm_latency)
+    url = f"http://127.0.0.1:{args.port}"
+    env = dict(os.environ, RAG_LLM_HOST=f"http://127.0.0.1:{args.llm_port}")
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(args.port)],
+        cwd=BACK_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        startup = wait_until_ready(url, args.timeout)
+        print(f"service ready in {startup:.2f}s")
+        print(f"{'concurrency':>11} {'req/s':>8} {'p50 (s)':>8} {'ttft (s)':>10} {'503s':>8}")
+        levels = [asyncio.run(run_level(url, concurrency, args.requests, True, args.stream))
+                  for concurrency in args.concurrency]
+    finally:
+        server.terminate()
+        server.wait()
+        mock_llm.shutdown()
+    return {"startup_seconds": startup, "llm_latency": args.llm_latency, "stream": args.stream, "levels": levels}
+
+
+def flatten(results, prefix=""):
+    """Flatten nested results to {"a.b.c": number}; `/ask` levels are keyed by concurrency."""
+    flat = {}
+    for key, value in results.items():
+        name = f"{prefix}{key}"
+        if isinstance(value, dict):
+            flat.update(flatten(value, f"{name}."))
+        elif key == "levels":
+            for level in value:
+                metrics = {k: v for k, v in level.items() if k != "concurrency"}
+                flat.update(flatten(metrics, f"{name}.c{level['concurrency']}."))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            flat[name] = value
+    return flat
+
+
+def compare(baseline_path, current_path):
+    """Print every metric present in both result files with its relative change."""
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = flatten({k: v for k, v in json.load(f).items() if k != "environment"})
+    with open(current_path, encoding="utf-8") as f:
+        current = flatten({k: v for k, v in json.load(f).items() if k != "environment"})
+    print(f"{'metric':<48} {'baseline':>12} {'current':>12} {'change':>8}")
+    for name in sorted(baseline.keys() & current.keys()):
+        before, after = baseline[name], current[name]
+        change = f"{(after - before) / before * 100:+.1f}%" if before else "n/a"
+        print(f"{name:<48} {before:>12.4g} {after:>12.4g} {change:>8}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--compare", nargs=2, metavar=("BASELINE", "CURRENT"), help="Compare two result files and exit.")
+    parser.add_argument("--work-dir", help="Directory for the corpus and index (default: a temporary directory).")
+    parser.add_argument("--documents", type=int, default=4)
+    parser.add_argument("--pages", type=int, default=25, help="Pages per document.")
+    parser.add_argument("--tables-per-page", type=int, default=1)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--embedding-cache", action="store_true", help="Keep the embedding cache enabled.")
+    parser.add_argument("--skip-ask", action="store_true", help="Only benchmark ingestion and index loading.")
+    parser.add_argument("--concurrency", nargs="+", type=int, default=[1, 4, 16])
+    parser.add_argument("--requests", type=int, default=32, help="Questions per concurrency level.")
+    parser.add_argument("--stream", action="store_true", help="Use /ask/stream and report time to first token.")
+    parser.add_argument("--llm-latency", type=float, default=0.5, help="Stub LLM latency in seconds.")
+    parser.add_argument("--port", type=int, default=5056)
+    parser.add_argument("--llm-port", type=int, default=11436)
+    parser.add_argument("--timeout", type=float, default=600, help="Seconds to wait for the service to start.")
+    parser.add_argument("--output", default="e2e_results.json")
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        return
+
+    work_dir = os.path.abspath(args.work_dir or tempfile.mkdtemp(prefix="rag_bench_"))
+    environment = configure_environment(work_dir, args.embedding_cache)
+
+    start_time = time.perf_counter()
+    file_paths = generate_corpus(environment["RAG_UPLOAD_FOLDER"], args.documents, args.pages,
+                                 args.tables_per_page, args.seed)
+    corpus = {
+        "documents": args.documents,
+        "pages_per_document": args.pages,
+        "tables_per_page": args.tables_per_page,
+        "seed": args.seed,
+        "bytes": sum(os.path.getsize(file_path) for file_path in file_paths),
+        "generation_seconds": time.perf_counter() - start_time,
+    }
+    print(f"corpus: {args.documents} document(s) x {args.pages} page(s) in {work_dir}")
+
+    results = {"environment": environment_info(), "corpus": corpus, "ingestion": bench_ingestion(file_paths)}
+    if not args.skip_ask:
+        results["ask"] = bench_ask(args)
+
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2, ensure_ascii=False)
+    print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+# benchmarks/bench_embedding_backends.py
+
+"""
+Compare embedding backends on the chunks of a PDF: load time, throughput, single-query
+latency, resident memory and cosine agreement with the torch backend.
+
+Each backend runs in its own subprocess so import costs and RSS are measured in isolation.
+Export the ONNX models first (`python -m app.embedding_backends export --quantize`), then
+run from the BACK directory:
+    python -m benchmarks.bench_embedding_backends uploads/Export_Portail_Data_RENAULT_Du_07-11-2024.pdf
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import numpy as np
+
+PROBE = """
+import json, resource, sys, time
+import numpy as np
+start = time.perf_counter()
+from app.embedding_backends import create_embedding_model
+model = create_embedding_model(sys.argv[1])
+load = time.perf_counter() - start
+texts = json.load(open(sys.argv[2], encoding="utf-8"))
+model.embed_documents(texts[:8])  # Warm-up
+start = time.perf_counter()
+vectors = np.asarray(model.embed_documents(texts), dtype=np.float32)
+batch = time.perf_counter() - start
+start = time.perf_counter()
+for text in texts[:50]:
+    model.embed_query(text)
+query = (time.perf_counter() - start) / min(50, len(texts))
+np.save(sys.argv[3], vectors)
+print(json.dumps({"load_s": load, "chunks_per_s": len(texts) / batch, "query_ms": query * 1000,
+                  "rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024}))
+"""
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("files", nargs="+", help="PDF files providing the chunks to embed")
+    parser.add_argument("--backends", nargs="+", default=["torch", "onnx", "onnx-int8"])
+    args = parser.parse_args()
+
+    from app.documentary_researcher import semantic_split_documents
+    from app.pdf_extraction import extract_documents
+    texts = [doc.page_content for doc in semantic_split_documents(extract_documents(args.files))]
+    print(f"{len(texts)} chunk(s)")
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        texts_path = os.path.join(tmp_dir, "texts.json")
+        with open(texts_path, "w", encoding="utf-8") as f:
+            json.dump(texts, f)
+
+        reference = None
+        print(f"{'backend':<10} {'load (s)':>9} {'chunks/s':>9} {'query (ms)':>11} {'RSS (MB)':>9} {'cosine':>14}")
+        for backend in args.backends:
+            vectors_path = os.path.join(tmp_dir, f"{backend}.npy")
+            output = subprocess.run([sys.executable, "-c", PROBE, backend, texts_path, vectors_path],
+                                    capture_output=True, text=True, check=True)
+            result = json.loads(output.stdout.strip().splitlines()[-1])
+            vectors = np.load(vectors_path)
+            vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+            if reference is None:
+                reference = vectors
+            cosine = np.sum(vectors * reference, axis=1)
+            print(f"{backend:<10} {result['load_s']:>9.2f} {result['chunks_per_s']:>9.1f} {result['query_ms']:>11.2f} "
+                  f"{result['rss_mb']:>9.0f} {cosine.mean():>7.4f}/{cosine.min():.4f}")
+    print(f"(cosine: mean/min agreement with {args.backends[0]})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,42 @@
+# benchmarks/bench_embedding_cache.py
+
+"""
+Benchmark the persistent embedding cache: embed the chunks of a corpus once with a
+cold cache, then again with a warm one, and report hit/miss counters.
+
+Usage (from the BACK directory):
+    python -m benchmarks.bench_embedding_cache uploads/*.pdf --cache-dir /tmp/embedding_cache
+"""
+
+import argparse
+import shutil
+import time
+from app import config
+from app.documentary_researcher import semantic_split_documents
+from app.embedding_backends import cache_model_name, create_embedding_model
+from app.embedding_cache import CachedEmbeddings
+from app.pdf_extraction import extract_documents
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("files", nargs="+", help="PDF files to embed")
+    parser.add_argument("--cache-dir", default="/tmp/rag_embedding_cache_bench")
+    args = parser.parse_args()
+
+    texts = [doc.page_content for doc in semantic_split_documents(extract_documents(args.files))]
+    print(f"{len(texts)} chunk(s)")
+
+    shutil.rmtree(args.cache_dir, ignore_errors=True)
+    model = create_embedding_model()
+    for run in ("cold", "warm"):
+        # A fresh wrapper per run so the warm run reads everything back from disk
+        cached = CachedEmbeddings(model, cache_model_name(), args.cache_dir, config.EMBEDDING_CACHE_MAX_ENTRIES)
+        start_time = time.perf_counter()
+        cached.embed_documents(texts)
+        duration = time.perf_counter() - start_time
+        print(f"{run:>5}: {duration:.2f}s ({len(texts) / duration:.0f} chunks/s) {cached.stats()}")
+
+
+if __name__ == "__main__":
+    main()
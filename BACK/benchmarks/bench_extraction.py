@@ -0,0 +1,77 @@
+# benchmarks/bench_extraction.py
+
+"""
+Benchmark PDF extraction throughput (pages/second) against the number of workers, with
+the table pre-check disabled, and from the per-page extraction cache; then list the
+slowest pages.
+
+Usage (from the BACK directory):
+    python -m benchmarks.bench_extraction uploads/*.pdf --workers 1 2 4 8 --slowest 10
+"""
+
+import argparse
+import os
+import time
+from app import config
+from app.pdf_extraction import count_pages, extract_documents, page_timings
+
+
+def run(file_paths, worker_counts, pages_per_task):
+    """Time serial and parallel extraction and print pages/second for each worker count."""
+    total_pages = sum(count_pages(file_path, use_cache=False) for file_path in file_paths)
+    print(f"{len(file_paths)} file(s), {total_pages} page(s), {pages_per_task} page(s) per task")
+    print(f"{'run':>14} {'seconds':>10} {'pages/s':>10} {'documents':>10}")
+
+    baseline = None
+
+    def timed(label, **kwargs):
+        nonlocal baseline
+        start_time = time.perf_counter()
+        documents = extract_documents(file_paths, pages_per_task=pages_per_task, **kwargs)
+        duration = time.perf_counter() - start_time
+
+        # Every configuration must produce exactly the serial output
+        signature = [(doc.page_content, doc.metadata) for doc in documents]
+        if baseline is None:
+            baseline = signature
+        elif signature != baseline:
+            raise AssertionError(f"Output of '{label}' differs from the first run.")
+        print(f"{label:>14} {duration:>10.2f} {total_pages / duration:>10.1f} {len(documents):>10}")
+
+    for workers in worker_counts:
+        timed(f"{workers} worker(s)", workers=workers, parallel=workers > 1, use_cache=False)
+
+    config.TABLE_PRECHECK = False
+    try:
+        timed("no pre-check", workers=1, parallel=False, use_cache=False)
+    finally:
+        config.TABLE_PRECHECK = True
+
+    extract_documents(file_paths, workers=1, parallel=False, use_cache=True)  # Fill the cache
+    timed("cached", workers=1, parallel=False, use_cache=True)
+
+
+def print_slowest_pages(file_paths, count):
+    """List the pages that took longest to extract, with the table pre-check outcome."""
+    pages = [(file_path, timing) for file_path in file_paths for timing in page_timings(file_path)]
+    pages.sort(key=lambda item: item[1]["text_seconds"] + item[1]["table_seconds"], reverse=True)
+    print(f"\n{'file':<40} {'page':>5} {'text (s)':>9} {'tables (s)':>10} {'tables':>8}")
+    for file_path, timing in pages[:count]:
+        tables = "skipped" if timing["tables_skipped"] else "parsed"
+        print(f"{os.path.basename(file_path)[:40]:<40} {timing['page']:>5} {timing['text_seconds']:>9.3f} "
+              f"{timing['table_seconds']:>10.3f} {tables:>8}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("files", nargs="+", help="PDF files to extract")
+    parser.add_argument("--workers", nargs="+", type=int, default=[1, 2, 4, 8])
+    parser.add_argument("--pages-per-task", type=int, default=8)
+    parser.add_argument("--slowest", type=int, default=10, help="Number of slowest pages to list.")
+    args = parser.parse_args()
+    run(args.files, args.workers, args.pages_per_task)
+    print_slowest_pages(args.files, args.slowest)
+
+
+if __name__ == "__main__":
+    main()
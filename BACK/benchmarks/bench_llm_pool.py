@@ -0,0 +1,82 @@
+# benchmarks/bench_llm_pool.py
+
+"""
+Benchmark the pooled LLM client against several mock Ollama servers running in-process:
+throughput as backends are added, and failover when one backend goes down mid-run.
+
+Usage (from the BACK directory):
+    python -m benchmarks.bench_llm_pool --backends 1 2 4 --latency 0.5 --requests 64
+"""
+
+import argparse
+import asyncio
+import threading
+import time
+from http.server import ThreadingHTTPServer
+from app.llm_client import LLMPool, parse_backends
+from benchmarks.mock_llm import ANSWER, make_handler
+
+MESSAGES = [{"role": "user", "content": "Quel est le chiffre d'affaires du groupe ?"}]
+
+
+def start_servers(count, first_port, latency):
+    """Start `count` mock servers in daemon threads and return them."""
+    servers = []
+    for port in range(first_port, first_port + count):
+        server = ThreadingHTTPServer(("127.0.0.1", port), make_handler(latency, ANSWER))
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+    return servers
+
+
+async def run(pool, num_requests, on_halfway=None):
+    """Send `num_requests` concurrent chats; return (duration, failures)."""
+    failures = 0
+
+    async def one(i):
+        nonlocal failures
+        if i == num_requests // 2 and on_halfway:
+            on_halfway()
+        try:
+            await pool.chat(MESSAGES, "llama3.2")
+        except Exception:
+            failures += 1
+
+    start_time = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(num_requests)))
+    return time.perf_counter() - start_time, failures
+
+
+async def main_async(args):
+    servers = start_servers(max(args.backends), args.port, args.latency)
+    urls = [f"http://127.0.0.1:{server.server_address[1]}" for server in servers]
+
+    print(f"{'backends':>8} {'req/s':>8} {'failed':>7}")
+    for count in args.backends:
+        spec = ",".join(f"{url}@{args.concurrency}" for url in urls[:count])
+        pool = LLMPool(parse_backends(spec), max_queue=args.requests)
+        duration, failures = await run(pool, args.requests)
+        print(f"{count:>8} {args.requests / duration:>8.2f} {failures:>7}")
+
+    if len(servers) > 1:
+        spec = ",".join(f"{url}@{args.concurrency}" for url in urls)
+        pool = LLMPool(parse_backends(spec), max_queue=args.requests, retries=len(servers))
+        # Stop accepting connections on the first backend halfway through the run
+        duration, failures = await run(pool, args.requests, on_halfway=servers[0].socket.close)
+        print(f"\nFailover with one of {len(servers)} backends down: "
+              f"{args.requests / duration:.2f} req/s, {failures} failed")
+        print(pool.stats())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--backends", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--concurrency", type=int, default=4, help="Max concurrent requests per backend.")
+    parser.add_argument("--latency", type=float, default=0.5)
+    parser.add_argument("--requests", type=int, default=64)
+    parser.add_argument("--port", type=int, default=11450, help="First mock server port.")
+    asyncio.run(main_async(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+# benchmarks/bench_query_batching.py
+
+"""
+Compare batched and unbatched retrieval under concurrent load: p50/p99 latency and QPS.
+
+Runs in-process against the existing shards in `faiss_index/` (from the BACK directory):
+    python -m benchmarks.bench_query_batching --concurrency 1 8 32 --requests 256 --window-ms 5
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+from app import config
+from app.documentary_researcher import initialize_embeddings, retrieve_context
+from app.query_batcher import QueryBatcher
+from app.sharded_index import load_shards
+from app.utils.concurrency import BoundedExecutor
+
+QUESTIONS = [
+    "Quel est le chiffre d'affaires du groupe ?",
+    "Quels sont les principaux risques identifiés ?",
+    "Quelle est la stratégie pour les véhicules électriques ?",
+    "Combien de salariés compte l'entreprise ?",
+    "Quelles sont les émissions de CO2 ?",
+    "Qui préside le conseil d'administration ?",
+]
+
+
+def percentile(values, q):
+    """Nearest-rank percentile."""
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(q / 100 * (len(ordered) - 1))))]
+
+
+async def run(retrieve, concurrency, num_requests):
+    """Issue `num_requests` retrievals with `concurrency` in flight; return latencies and wall time."""
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(i):
+        async with semaphore:
+            start_time = time.perf_counter()
+            await retrieve(QUESTIONS[i % len(QUESTIONS)])
+            return time.perf_counter() - start_time
+
+    start_time = time.perf_counter()
+    latencies = await asyncio.gather(*(one(i) for i in range(num_requests)))
+    return latencies, time.perf_counter() - start_time
+
+
+async def main_async(args):
+    embeddings = initialize_embeddings()
+    faiss_index = load_shards(embeddings)
+    executor = BoundedExecutor("bench", config.RETRIEVAL_WORKERS, args.requests)
+    batcher = QueryBatcher(executor, window_ms=args.window_ms, max_batch_size=args.max_batch_size)
+
+    modes = {
+        "unbatched": lambda question: executor.run(retrieve_context, question, faiss_index),
+        "batched": lambda question: batcher.retrieve(question, faiss_index),
+    }
+    print(f"{'mode':>10} {'concurrency':>11} {'qps':>8} {'p50 (ms)':>9} {'p99 (ms)':>9}")
+    for concurrency in args.concurrency:
+        for mode, retrieve in modes.items():
+            latencies, duration = await run(retrieve, concurrency, args.requests)
+            print(f"{mode:>10} {concurrency:>11} {len(latencies) / duration:>8.1f} "
+                  f"{statistics.median(latencies) * 1000:>9.1f} {percentile(latencies, 99) * 1000:>9.1f}")
+    print(f"batcher: {batcher.stats()}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", nargs="+", type=int, default=[1, 8, 32])
+    parser.add_argument("--requests", type=int, default=256)
+    parser.add_argument("--window-ms", type=int, default=config.QUERY_BATCH_WINDOW_MS)
+    parser.add_argument("--max-batch-size", type=int, default=config.QUERY_BATCH_MAX_SIZE)
+    asyncio.run(main_async(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+# benchmarks/bench_splitting.py
+
+"""
+Benchmark semantic splitting: per-Document `nlp(text)` on the full spaCy pipeline
+versus batched `nlp.pipe` on a trimmed pipeline, and check that chunks are identical.
+
+Usage (from the BACK directory):
+    python -m benchmarks.bench_splitting uploads/*.pdf --segmenter parser --batch-size 64
+"""
+
+import argparse
+import time
+import spacy
+from app import config, documentary_researcher
+from app.documentary_researcher import load_sentence_pipeline, pack_sentences, semantic_split_documents
+from app.pdf_extraction import extract_documents
+
+
+def split_with_full_pipeline(documents):
+    """Reference path: one `nlp(text)` call per Document on the untrimmed model."""
+    full_nlp = spacy.load(config.SPACY_MODEL)
+    chunks = []
+    for doc in documents:
+        sentences = [sent.text for sent in full_nlp(doc.page_content).sents]
+        chunks.extend(pack_sentences(sentences, config.CHUNK_SIZE))
+    return chunks
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("files", nargs="+", help="PDF files to split")
+    parser.add_argument("--segmenter", default=config.SENTENCE_SEGMENTER, choices=["parser", "senter", "sentencizer"])
+    parser.add_argument("--batch-size", type=int, default=config.SPLIT_BATCH_SIZE)
+    parser.add_argument("--n-process", type=int, default=config.SPLIT_N_PROCESS)
+    args = parser.parse_args()
+
+    documents = extract_documents(args.files)
+    print(f"{len(documents)} document(s) to split")
+
+    start_time = time.perf_counter()
+    reference = split_with_full_pipeline(documents)
+    reference_duration = time.perf_counter() - start_time
+    print(f"full pipeline, nlp(text):  {reference_duration:.2f}s, {len(reference)} chunks")
+
+    documentary_researcher.nlp = load_sentence_pipeline(segmenter=args.segmenter)
+    start_time = time.perf_counter()
+    batched = semantic_split_documents(documents, batch_size=args.batch_size, n_process=args.n_process)
+    batched_duration = time.perf_counter() - start_time
+    print(f"{args.segmenter}, nlp.pipe:  {batched_duration:.2f}s, {len(batched)} chunks "
+          f"({reference_duration / batched_duration:.1f}x)")
+
+    identical = [doc.page_content for doc in batched] == reference
+    print(f"chunk boundaries identical: {identical}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+# benchmarks/bench_startup.py
+
+"""
+Measure service start-up: time until the port accepts connections, then until `/status`
+reports each component ready, and the latency of the first `/ask` retrieval.
+
+Usage (from the BACK directory):
+    python -m benchmarks.bench_startup --port 5055
+"""
+
+import argparse
+import subprocess
+import sys
+import time
+import httpx
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=5055)
+    parser.add_argument("--timeout", type=float, default=600)
+    args = parser.parse_args()
+    url = f"http://127.0.0.1:{args.port}"
+
+    start_time = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(args.port)],
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        bound_at, status = None, None
+        while time.perf_counter() - start_time < args.timeout:
+            try:
+                status = httpx.get(f"{url}/status", timeout=1).json()
+                bound_at = bound_at or time.perf_counter() - start_time
+                if status["state"] != "starting":
+                    break
+            except httpx.HTTPError:
+                pass
+            time.sleep(0.1)
+        ready_at = time.perf_counter() - start_time
+
+        print(f"port accepting requests: {bound_at:.2f}s")
+        print(f"service {status['state']}:        {ready_at:.2f}s")
+        for name, component in status["components"].items():
+            duration = component["load_duration"]
+            print(f"  {name:<12} {component['state']:<8} {duration if duration is None else round(duration, 2)}")
+
+        # Retrieval only: the question is sent without waiting for the LLM to answer
+        first_query = time.perf_counter()
+        try:
+            httpx.post(f"{url}/ask", json={"question": "Quel est le chiffre d'affaires ?",
+                                           "requiresDocumentSearch": True, "history": []}, timeout=2)
+        except httpx.HTTPError:
+            pass
+        print(f"first /ask (capped at 2s): {time.perf_counter() - first_query:.2f}s")
+    finally:
+        server.terminate()
+        server.wait()
+
+
+if __name__ == "__main__":
+    main()
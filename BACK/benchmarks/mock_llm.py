@@ -0,0 +1,95 @@
+# benchmarks/mock_llm.py
+
+"""
+Minimal stand-in for the Ollama HTTP API (`POST /api/chat`) with configurable latency.
+Streaming requests receive one NDJSON chunk per word, spread over the latency.
+
+Usage (from the BACK directory):
+    python -m benchmarks.mock_llm --port 11435 --latency 2.0
+    RAG_LLM_HOST=http://localhost:11435 uvicorn app.main:app --port 5000
+"""
+
+import argparse
+import json
+import time
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+ANSWER = "Ceci est une réponse simulée par le serveur de test, sans appel à un vrai modèle."
+
+
+def make_handler(latency, answer):
+    """Build a request handler class answering chat requests after `latency` seconds."""
+
+    class MockOllamaHandler(BaseHTTPRequestHandler):
+        def log_message(self, format, *args):
+            pass
+
+        def _send_json(self, payload):
+            body = json.dumps(payload).encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            # Health checks and `ollama list`
+            self._send_json({"models": [{"name": "llama3.2"}]})
+
+        def _stream(self, request):
+            # HTTP/1.0 without Content-Length: the body ends when the connection closes
+            self.send_response(200)
+            self.send_header("Content-Type", "application/x-ndjson")
+            self.end_headers()
+            words = answer.split(" ")
+            for i, word in enumerate(words):
+                time.sleep(latency / len(words))
+                chunk = {
+                    "model": request.get("model", "mock"),
+                    "created_at": datetime.now(timezone.utc).isoformat(),
+                    "message": {"role": "assistant", "content": word if i == 0 else f" {word}"},
+                    "done": False,
+                }
+                self.wfile.write((json.dumps(chunk) + "\n").encode("utf-8"))
+                self.wfile.flush()
+            final = {"model": request.get("model", "mock"), "created_at": datetime.now(timezone.utc).isoformat(),
+                     "message": {"role": "assistant", "content": ""}, "done": True, "eval_count": len(words)}
+            self.wfile.write((json.dumps(final) + "\n").encode("utf-8"))
+
+        def do_POST(self):
+            request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+            if request.get("stream"):
+                self._stream(request)
+                return
+            time.sleep(latency)
+            self._send_json({
+                "model": request.get("model", "mock"),
+                "created_at": datetime.now(timezone.utc).isoformat(),
+                "message": {"role": "assistant", "content": answer},
+                "done": True,
+            })
+
+    return MockOllamaHandler
+
+
+def serve(port, latency, answer=ANSWER):
+    """Run the mock server until interrupted."""
+    server = ThreadingHTTPServer(("127.0.0.1", port), make_handler(latency, answer))
+    print(f"Mock Ollama listening on http://127.0.0.1:{port} (latency {latency}s)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=11435)
+    parser.add_argument("--latency", type=float, default=2.0, help="Seconds before answering")
+    args = parser.parse_args()
+    serve(args.port, args.latency)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,167 @@
+# benchmarks/synthetic_pdf.py
+
+"""
+Generate a reproducible corpus of synthetic French PDFs with paragraphs and ruled tables.
+
+The PDFs are written directly (Helvetica, WinAnsiEncoding), so no PDF library is needed.
+Tables are drawn with lines, which is what pdfplumber's table detection looks for.
+
+Usage (from the BACK directory):
+    python -m benchmarks.synthetic_pdf /tmp/corpus --documents 4 --pages 25 --tables-per-page 1
+"""
+
+import argparse
+import os
+import random
+
+PAGE_WIDTH, PAGE_HEIGHT = 595, 842  # A4 in points
+MARGIN = 56
+FONT_SIZE = 10
+LEADING = 13
+CHARS_PER_LINE = 95
+
+SUBJECTS = ["Le groupe", "La direction financière", "Le conseil d'administration", "La filiale européenne",
+            "L'activité industrielle", "Le segment des véhicules électriques", "La trésorerie", "Le comité d'audit"]
+VERBS = ["a enregistré", "prévoit", "a confirmé", "anticipe", "a réduit", "a renforcé", "présente", "maintient"]
+OBJECTS = ["une hausse du chiffre d'affaires", "une baisse des coûts de production", "des investissements ciblés",
+           "une marge opérationnelle stable", "des risques de change limités", "une stratégie de désendettement",
+           "une croissance des effectifs", "des engagements environnementaux précis"]
+COMPLEMENTS = ["au cours de l'exercice", "sur le marché français", "malgré un contexte économique difficile",
+               "conformément aux prévisions", "pour la troisième année consécutive", "dans l'ensemble des régions",
+               "à périmètre constant", "selon les normes IFRS"]
+TABLE_HEADERS = ["Indicateur", "2022", "2023", "Variation"]
+TABLE_ROWS = ["Chiffre d'affaires", "Résultat net", "Effectifs", "Investissements", "Dette nette",
+              "Marge brute", "Flux de trésorerie", "Émissions CO2"]
+
+
+def sentence(rng):
+    return f"{rng.choice(SUBJECTS)} {rng.choice(VERBS)} {rng.choice(OBJECTS)} {rng.choice(COMPLEMENTS)}."
+
+
+def paragraph(rng, min_sentences=3, max_sentences=7):
+    return " ".join(sentence(rng) for _ in range(rng.randint(min_sentences, max_sentences)))
+
+
+def wrap(text, width=CHARS_PER_LINE):
+    lines, line = [], ""
+    for word in text.split(" "):
+        if line and len(line) + 1 + len(word) > width:
+            lines.append(line)
+            line = word
+        else:
+            line = f"{line} {word}" if line else word
+    return lines + [line] if line else lines
+
+
+def pdf_string(text):
+    """Encode text as a PDF literal string in WinAnsiEncoding."""
+    raw = text.encode("cp1252", errors="replace")
+    return b"(" + raw.replace(b"\\", b"\\\\").replace(b"(", b"\\(").replace(b")", b"\\)") + b")"
+
+
+def text_op(x, y, text, size=FONT_SIZE):
+    return b"BT /F1 %d Tf %.1f %.1f Td " % (size, x, y) + pdf_string(text) + b" Tj ET\n"
+
+
+def table_ops(rng, top, num_rows):
+    """Draw a ruled table whose top edge is at `top`; return (operators, bottom y)."""
+    col_width = (PAGE_WIDTH - 2 * MARGIN) / len(TABLE_HEADERS)
+    row_height = LEADING + 5
+    bottom = top - row_height * (num_rows + 1)
+    ops = [b"0.5 w\n"]
+    for i in range(num_rows + 2):
+        y = top - i * row_height
+        ops.append(b"%.1f %.1f m %.1f %.1f l S\n" % (MARGIN, y, PAGE_WIDTH - MARGIN, y))
+    for j in range(len(TABLE_HEADERS) + 1):
+        x = MARGIN + j * col_width
+        ops.append(b"%.1f %.1f m %.1f %.1f l S\n" % (x, top, x, bottom))
+
+    rows = [TABLE_HEADERS] + [
+        [label, f"{rng.randint(100, 9999)} M€", f"{rng.randint(100, 9999)} M€", f"{rng.uniform(-20, 20):+.1f} %"]
+        for label in rng.sample(TABLE_ROWS, num_rows)
+    ]
+    for i, row in enumerate(rows):
+        y = top - (i + 1) * row_height + 5
+        for j, cell in enumerate(row):
+            ops.append(text_op(MARGIN + j * col_width + 4, y, cell))
+    return b"".join(ops), bottom
+
+
+def page_content(rng, page_number, tables_per_page):
+    """Build the content stream of one page: a heading, paragraphs and tables."""
+    ops = [text_op(MARGIN, PAGE_HEIGHT - MARGIN, f"Section {page_number} - Rapport annuel", size=14)]
+    y = PAGE_HEIGHT - MARGIN - 2 * LEADING
+    table_slots = set(rng.sample(range(4), min(tables_per_page, 4)))
+    for slot in range(4):
+        if slot in table_slots:
+            num_rows = rng.randint(3, 6)
+            if y - LEADING * (num_rows + 3) < MARGIN:
+                break
+            table, y = table_ops(rng, y, num_rows)
+            ops.append(table)
+            y -= 2 * LEADING
+        for line in wrap(paragraph(rng)):
+            if y < MARGIN:
+                break
+            ops.append(text_op(MARGIN, y, line))
+            y -= LEADING
+        y -= LEADING
+    return b"".join(ops)
+
+
+def write_pdf(path, pages):
+    """Write a PDF whose pages have the given content streams."""
+    num_pages = len(pages)
+    page_ids = [4 + 2 * i for i in range(num_pages)]
+    objects = {
+        1: b"<< /Type /Catalog /Pages 2 0 R >>",
+        2: b"<< /Type /Pages /Kids [" + b" ".join(b"%d 0 R" % i for i in page_ids) + b"] /Count %d >>" % num_pages,
+        3: b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>",
+    }
+    for page_id, content in zip(page_ids, pages):
+        objects[page_id] = (b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 %d %d] " % (PAGE_WIDTH, PAGE_HEIGHT)
+                            + b"/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>" % (page_id + 1))
+        objects[page_id + 1] = b"<< /Length %d >>\nstream\n" % len(content) + content + b"\nendstream"
+
+    out = bytearray(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+    offsets = {}
+    for obj_id in sorted(objects):
+        offsets[obj_id] = len(out)
+        out += b"%d 0 obj\n" % obj_id + objects[obj_id] + b"\nendobj\n"
+    xref_offset = len(out)
+    size = max(objects) + 1
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % size
+    for obj_id in range(1, size):
+        out += b"%010d 00000 n \n" % offsets[obj_id]
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (size, xref_offset)
+    with open(path, "wb") as f:
+        f.write(out)
+
+
+def generate_corpus(output_dir, num_documents=4, num_pages=25, tables_per_page=1, seed=0):
+    """Write `num_documents` PDFs of `num_pages` pages each; return their paths."""
+    os.makedirs(output_dir, exist_ok=True)
+    rng = random.Random(seed)
+    file_paths = []
+    for doc_number in range(num_documents):
+        pages = [page_content(rng, page_number + 1, tables_per_page) for page_number in range(num_pages)]
+        file_path = os.path.join(output_dir, f"rapport_synthetique_{doc_number + 1:03d}.pdf")
+        write_pdf(file_path, pages)
+        file_paths.append(file_path)
+    return file_paths
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("output_dir")
+    parser.add_argument("--documents", type=int, default=4)
+    parser.add_argument("--pages", type=int, default=25, help="Pages per document.")
+    parser.add_argument("--tables-per-page", type=int, default=1)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    file_paths = generate_corpus(args.output_dir, args.documents, args.pages, args.tables_per_page, args.seed)
+    print(f"Wrote {len(file_paths)} PDF(s) of {args.pages} page(s) to {args.output_dir}")
+
+
+if __name__ == "__main__":
+    main()